@@ -0,0 +1,507 @@
+"""Offline throughput benchmark against a local stand-in for the YouTube API.
+
+Starts a local HTTP server that speaks the parts of the YouTube Data API the
+uploader uses (resumable video uploads, playlist inserts, channel/playlist
+listing) with configurable latency, bandwidth, 429/5xx injection and daily
+quota, points youtube_uploader at it through youtube_api_root_url, and drives
+the real pipeline with synthetic recordings. No Google account or quota is
+touched.
+
+    python benchmark_uploader.py --files 20 --size-mb 200 --bandwidth-mbps 100
+    python benchmark_uploader.py --scenario pending --error-rate 0.1
+    python benchmark_uploader.py --scenario watch --upload-workers 2 --save-result base.json
+    python benchmark_uploader.py --scenario watch --upload-workers 2 --baseline base.json
+
+Reports files/hour, bytes/s and peak RSS. With --baseline the run exits
+non-zero when files/hour drops more than --tolerance below the saved result.
+"""
+import argparse
+import http.server
+import itertools
+import json
+import logging
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import youtube_uploader as uploader
+
+QUOTA_COSTS = {"videos.insert": 1600, "playlistItems.insert": 50, "thumbnails.set": 50, "list": 1}
+BOSSES = ["Fyrakk", "Tindral", "Smolderon", "Nymue", "Larodar", "Council", "Igira", "Volcoross", "Gnarlroot"]
+FTYP_BOX = struct.pack(">I4s4sI8s", 24, b"ftyp", b"mp42", 0, b"mp42isom")
+
+class _Throttle:
+    """Shared uplink: every upload draws from the same bytes-per-second budget."""
+
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+        self._lock = threading.Lock()
+        self._next_free = time.monotonic()
+
+    def consume(self, nbytes):
+        if not self.bytes_per_second:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_free)
+            self._next_free = start + nbytes / self.bytes_per_second
+            wait = self._next_free - now
+        if wait > 0:
+            time.sleep(wait)
+
+class FakeYouTube:
+    """State behind the stand-in API: upload sessions, videos, quota, faults."""
+
+    def __init__(self, latency=0.0, bandwidth=None, error_rate=0.0, error_statuses=(429, 500, 503),
+                 quota=10000, seed=0):
+        self.latency = latency
+        self.throttle = _Throttle(bandwidth)
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.quota = quota
+        self.quota_used = 0
+        self.sessions = {}
+        self.videos = []
+        self.bytes_received = 0
+        self.thumbnails = {}
+        self.errors_injected = {}
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def charge(self, operation):
+        """Spend quota for operation; False once the daily quota is gone."""
+        with self._lock:
+            cost = QUOTA_COSTS[operation]
+            if self.quota is not None and self.quota_used + cost > self.quota:
+                return False
+            self.quota_used += cost
+            return True
+
+    def injected_error(self):
+        with self._lock:
+            self.requests += 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                status = self._random.choice(self.error_statuses)
+                self.errors_injected[status] = self.errors_injected.get(status, 0) + 1
+                return status
+        return None
+
+    def new_session(self, metadata, total):
+        with self._lock:
+            upload_id = "u%d" % next(self._ids)
+            self.sessions[upload_id] = {"metadata": metadata, "total": total, "received": 0}
+        return upload_id
+
+    def add_video(self, metadata):
+        with self._lock:
+            video_id = "vid%05d" % next(self._ids)
+            self.videos.append({"id": video_id, "title": metadata.get("snippet", {}).get("title")})
+        return video_id
+
+class FakeYouTubeHandler(http.server.BaseHTTPRequestHandler):
+    server_version = "FakeYouTube/1.0"
+
+    @property
+    def api(self):
+        return self.server.api
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, reason, message):
+        self._send_json(status, {"error": {"code": status, "message": message,
+                                           "errors": [{"reason": reason, "message": message}]}})
+
+    def _send_progress(self, session):
+        self.send_response(308)
+        if session["received"]:
+            self.send_header("Range", "bytes=0-%d" % (session["received"] - 1))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _read_body(self, throttled=False):
+        remaining = int(self.headers.get("Content-Length") or 0)
+        chunks = []
+        while remaining > 0:
+            chunk = self.rfile.read(min(remaining, 256 * 1024))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            if throttled:
+                self.api.throttle.consume(len(chunk))
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def _fault(self):
+        """Apply latency and maybe an injected error; True if a response was sent."""
+        if self.api.latency:
+            time.sleep(self.api.latency)
+        status = self.api.injected_error()
+        if status is None:
+            return False
+        reason = "rateLimitExceeded" if status == 429 else "backendError"
+        self._send_error(status, reason, "Injected %d" % status)
+        return True
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        body = self._read_body()
+        if self._fault():
+            return
+        if url.path == "/upload/youtube/v3/videos":
+            if not self.api.charge("videos.insert"):
+                self._send_error(403, "quotaExceeded", "The request cannot be completed because you have exceeded your quota.")
+                return
+            total = self.headers.get("X-Upload-Content-Length")
+            upload_id = self.api.new_session(json.loads(body or b"{}"), int(total) if total else None)
+            location = "http://%s:%d/upload/youtube/v3/videos?uploadType=resumable&upload_id=%s" % (
+                self.server.server_address[0], self.server.server_address[1], upload_id)
+            self._send_json(200, {}, headers={"Location": location})
+        elif url.path == "/upload/youtube/v3/thumbnails/set":
+            if not self.api.charge("thumbnails.set"):
+                self._send_error(403, "quotaExceeded", "Quota exceeded.")
+                return
+            video_id = urllib.parse.parse_qs(url.query).get("videoId", [None])[0]
+            self.api.thumbnails[video_id] = len(body)
+            self._send_json(200, {"kind": "youtube#thumbnailSetResponse", "items": [{"default": {"url": "thumb"}}]})
+        elif url.path == "/youtube/v3/playlistItems":
+            if not self.api.charge("playlistItems.insert"):
+                self._send_error(403, "quotaExceeded", "Quota exceeded.")
+                return
+            self._send_json(200, {"kind": "youtube#playlistItem", "snippet": json.loads(body or b"{}").get("snippet")})
+        else:
+            self._send_error(404, "notFound", "Unknown endpoint %s" % url.path)
+
+    def do_PUT(self):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        session = self.api.sessions.get((query.get("upload_id") or [None])[0])
+        content_range = self.headers.get("Content-Range", "")
+        # An injected failure still swallows the chunk, as a dropped connection would.
+        body = self._read_body(throttled=True)
+        if self._fault():
+            return
+        if session is None:
+            self._send_error(404, "notFound", "Unknown upload session")
+            return
+        # "bytes start-end/total", "bytes */total" (status query) or "bytes start-end/*"
+        spec = content_range.replace("bytes", "").strip()
+        span, _, total = spec.partition("/")
+        if total and total != "*":
+            session["total"] = int(total)
+        if span != "*":
+            start = int(span.split("-")[0])
+            if start != session["received"]:
+                self._send_progress(session)
+                return
+            session["received"] += len(body)
+            with self.api._lock:
+                self.api.bytes_received += len(body)
+        if session["total"] is not None and session["received"] >= session["total"]:
+            if "video_id" not in session:
+                session["video_id"] = self.api.add_video(session["metadata"])
+            metadata = session["metadata"]
+            self._send_json(200, {"kind": "youtube#video", "id": session["video_id"],
+                                  "snippet": metadata.get("snippet"), "status": metadata.get("status")})
+            return
+        self._send_progress(session)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        if self._fault():
+            return
+        if not self.api.charge("list"):
+            self._send_error(403, "quotaExceeded", "Quota exceeded.")
+            return
+        if url.path == "/youtube/v3/channels":
+            self._send_json(200, {"items": [{"contentDetails": {"relatedPlaylists": {"uploads": "UUbenchmark"}}}]})
+        elif url.path == "/youtube/v3/playlistItems":
+            start = int((query.get("pageToken") or ["0"])[0])
+            page_size = int((query.get("maxResults") or ["50"])[0])
+            videos = list(reversed(self.api.videos))
+            page = videos[start:start + page_size]
+            payload = {
+                "etag": "e%d-%d" % (start, len(videos)),
+                "items": [
+                    {"snippet": {"title": video["title"], "resourceId": {"videoId": video["id"]}}}
+                    for video in page
+                ],
+            }
+            if start + page_size < len(videos):
+                payload["nextPageToken"] = str(start + page_size)
+            self._send_json(200, payload)
+        else:
+            self._send_error(404, "notFound", "Unknown endpoint %s" % url.path)
+
+def start_fake_youtube(api, host="127.0.0.1", port=0):
+    server = http.server.ThreadingHTTPServer((host, port), FakeYouTubeHandler)
+    server.daemon_threads = True
+    server.api = api
+    threading.Thread(target=server.serve_forever, name="fake-youtube", daemon=True).start()
+    return server, "http://%s:%d/" % server.server_address
+
+def write_synthetic_mp4(path, size, block, token=b""):
+    """Write an MP4-shaped file (ftyp, free, mdat) of exactly size bytes.
+
+    token goes in the free box so recordings sharing a payload still hash
+    differently under duplicate_guard_mode "hash".
+    """
+    free_box = struct.pack(">I4s", 8 + len(token), b"free") + token
+    payload = max(0, size - len(FTYP_BOX) - len(free_box) - 16)
+    with open(path, "wb") as handle:
+        handle.write(FTYP_BOX)
+        handle.write(free_box)
+        handle.write(struct.pack(">I4sQ", 1, b"mdat", payload + 16))
+        while payload > 0:
+            piece = block[:min(len(block), payload)]
+            handle.write(piece)
+            payload -= len(piece)
+
+def recording_name(index, start=None):
+    """Name a recording the way the WoW recorder does, one pull every ~97s."""
+    start = start if start is not None else time.time() - 86400
+    stamp = time.strftime("%Y-%m-%d %H-%M-%S", time.localtime(start + index * 97))
+    # The recorder cuts the context short ("Fo..."), as extract_context_from_filename expects.
+    return "%s - Benchbot - %s....mp4" % (stamp, BOSSES[index % len(BOSSES)][:2])
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def configure_uploader(workdir, root_url, args):
+    config = json.loads(json.dumps(uploader.CONFIG_DEFAULTS))
+    config.update({
+        "watch_folder": os.path.join(workdir, "watch"),
+        "drive_sync_folder": os.path.join(workdir, "drive") if args.drive else None,
+        "failed_folder": os.path.join(workdir, "failed"),
+        "pull_tracker_path": os.path.join(workdir, "pull_tracker.json"),
+        "pending_uploads_path": os.path.join(workdir, "pending_uploads.json"),
+        "uploaded_titles_path": os.path.join(workdir, "uploaded_titles.json"),
+        "scan_index_path": os.path.join(workdir, "scan_index.json"),
+        "metrics_json_path": os.path.join(workdir, "metrics.json"),
+        "log_file": os.path.join(workdir, "youtube_uploader.log"),
+        "youtube_api_root_url": root_url,
+        "stable_write_checks": 1,
+        "stable_write_interval_seconds": 0,
+        "min_file_age_seconds": 0,
+        "event_debounce_seconds": 0.5,
+        "disk_reserve_bytes": 0,
+        "upload_workers": args.upload_workers,
+        "compression_workers": args.upload_workers,
+        "max_retries": args.max_retries,
+        "retry_backoff_seconds": args.retry_backoff_seconds,
+        "retry_jitter_seconds": 0,
+        "duplicate_guard_mode": args.duplicate_guard_mode,
+        "fanout_enabled": args.fanout,
+        "thumbnail_enabled": args.thumbnails,
+    })
+    os.makedirs(config["watch_folder"])
+    uploader.apply_config(config, uploader.parse_args([]))
+    # apply_config attaches the uploader's own handlers at INFO.
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.ERROR)
+    return config
+
+def make_recordings(folder, count, size, seed=0):
+    block = random.Random(seed).getrandbits(8 * 1024 * 1024).to_bytes(1024 * 1024, "little")
+    paths = []
+    for index in range(count):
+        path = os.path.join(folder, recording_name(index))
+        write_synthetic_mp4(path, size, block, token=("%d:%d" % (seed, index)).encode("ascii"))
+        paths.append(path)
+    return paths
+
+def run_once(config, youtube, args):
+    """--once: the startup scan processes every recording in turn."""
+    make_recordings(config["watch_folder"], args.files, args.size_bytes, args.seed)
+    context = uploader.PipelineContext.from_config(config)
+    handler = uploader.VideoHandler(youtube, context)
+    started = time.perf_counter()
+    uploader.process_existing_files(handler)
+    context.shutdown()
+    return time.perf_counter() - started, handler.stats
+
+def run_watch(config, youtube, api, args):
+    """Watch mode: recordings land in the folder while the pipeline runs."""
+    staging = os.path.join(os.path.dirname(config["watch_folder"]), "staging")
+    os.makedirs(staging)
+    paths = make_recordings(staging, args.files, args.size_bytes, args.seed)
+    context = uploader.PipelineContext.from_config(config)
+    handler = uploader.VideoHandler(youtube, context)
+    observer = uploader.build_observer(context.config)
+    for root in context.roots:
+        observer.schedule(handler, root.path, recursive=root.recursive)
+    observer.start()
+    started = time.perf_counter()
+    try:
+        for path in paths:
+            os.replace(path, os.path.join(config["watch_folder"], os.path.basename(path)))
+            if args.arrival_seconds:
+                time.sleep(args.arrival_seconds)
+        deadline = time.monotonic() + args.timeout
+        while time.monotonic() < deadline:
+            settled = handler.stats["uploaded"] + handler.stats["queued"] + handler.stats["failed"]
+            if settled >= args.files:
+                break
+            time.sleep(0.1)
+        else:
+            print("Timed out after %ds waiting for uploads." % args.timeout)
+        elapsed = time.perf_counter() - started
+    finally:
+        observer.stop()
+        handler.coalescer.close()
+        context.shutdown()
+        observer.join()
+    return elapsed, handler.stats
+
+def run_pending(config, youtube, args):
+    """Drain a pending queue of recordings that failed to upload earlier."""
+    folder = config["watch_folder"]
+    paths = make_recordings(folder, args.files, args.size_bytes, args.seed)
+    pending = [
+        {
+            "file_path": path,
+            "original_path": path,
+            "cleanup_path": None,
+            "drive_sync_folder": config["drive_sync_folder"],
+            "drive_sync_mode": config["drive_sync_mode"],
+            "title": uploader.create_youtube_title(os.path.basename(path)),
+            "upload_options": {
+                "description": config["default_description"],
+                "playlist_id": "PLbenchmark",
+                "tags": config["default_tags"],
+                "privacy_status": config["youtube_privacy"],
+            },
+        }
+        for path in paths
+    ]
+    uploader.save_pending_uploads(config["pending_uploads_path"], pending)
+    started = time.perf_counter()
+    uploader.process_pending_uploads(youtube, uploader.PipelineConfig(config))
+    elapsed = time.perf_counter() - started
+    remaining = len(uploader.load_pending_uploads(config["pending_uploads_path"]))
+    return elapsed, {"processed": len(pending), "uploaded": len(pending) - remaining, "queued": remaining}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline youtube_uploader throughput benchmark")
+    parser.add_argument("--scenario", choices=["once", "watch", "pending"], default="once")
+    parser.add_argument("--files", type=int, default=10, help="Synthetic recordings to upload")
+    parser.add_argument("--size-mb", type=float, default=50, help="Size of each recording in MB")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Added latency per API request")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0, help="Shared upload bandwidth in Mbit/s (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429/500/503")
+    parser.add_argument("--quota", type=int, default=None, help="Daily quota units (videos.insert costs 1600)")
+    parser.add_argument("--upload-workers", type=int, default=1)
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--retry-backoff-seconds", type=float, default=0.2)
+    parser.add_argument("--duplicate-guard-mode", choices=["title", "hash", "none"], default="title")
+    parser.add_argument("--drive", action="store_true", help="Also sync to a local Drive folder")
+    parser.add_argument("--fanout", action="store_true", help="Enable fanout_enabled")
+    parser.add_argument("--thumbnails", action="store_true", help="Enable thumbnail_enabled (needs ffmpeg)")
+    parser.add_argument("--arrival-seconds", type=float, default=0, help="Gap between recordings in watch mode")
+    parser.add_argument("--timeout", type=int, default=3600, help="Watch mode time limit in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Keep state and files here instead of a temp folder")
+    parser.add_argument("--save-result", help="Write the result JSON here")
+    parser.add_argument("--baseline", help="Result JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed files/hour drop vs --baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show the uploader's log output")
+    args = parser.parse_args()
+    args.size_bytes = int(args.size_mb * 1_000_000)
+    return args
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR,
+                        format="%(asctime)s - %(levelname)s - %(message)s")
+    api = FakeYouTube(
+        latency=args.latency_ms / 1000.0,
+        bandwidth=args.bandwidth_mbps * 1_000_000 / 8 if args.bandwidth_mbps else None,
+        error_rate=args.error_rate,
+        quota=args.quota,
+        seed=args.seed,
+    )
+    server, root_url = start_fake_youtube(api)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="uploader-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        config = configure_uploader(workdir, root_url, args)
+        youtube = uploader.authenticate_youtube(uploader.PipelineConfig(config))
+        if args.scenario == "watch":
+            elapsed, stats = run_watch(config, youtube, api, args)
+        elif args.scenario == "pending":
+            elapsed, stats = run_pending(config, youtube, args)
+        else:
+            elapsed, stats = run_once(config, youtube, args)
+    finally:
+        server.shutdown()
+        server.server_close()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    uploaded = len(api.videos)
+    result = {
+        "scenario": args.scenario,
+        "files": args.files,
+        "size_bytes": args.size_bytes,
+        "upload_workers": args.upload_workers,
+        "elapsed_seconds": round(elapsed, 3),
+        "uploaded": uploaded,
+        "stats": stats,
+        "files_per_hour": round(uploaded * 3600 / elapsed, 1) if elapsed else None,
+        "bytes_per_second": round(api.bytes_received / elapsed) if elapsed else None,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "api_requests": api.requests,
+        "errors_injected": api.errors_injected,
+        "quota_used": api.quota_used,
+        "thumbnails_set": len(api.thumbnails),
+    }
+    print("Scenario: %s | files=%d x %.0f MB | workers=%d" % (args.scenario, args.files, args.size_mb, args.upload_workers))
+    print("Uploaded: %d/%d in %.1fs" % (uploaded, args.files, elapsed))
+    print("Throughput: %.1f files/hour | %.1f MB/s" % (result["files_per_hour"] or 0, (result["bytes_per_second"] or 0) / 1e6))
+    if result["peak_rss_bytes"] is not None:
+        print("Peak RSS: %.1f MB" % (result["peak_rss_bytes"] / 1e6))
+    print("API requests: %d | injected errors: %s | quota used: %d" % (api.requests, api.errors_injected or "none", api.quota_used))
+
+    if args.save_result:
+        with open(args.save_result, "w", encoding="utf-8") as handle:
+            json.dump(result, handle, indent=2)
+        print("Saved result to %s" % args.save_result)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        floor = baseline["files_per_hour"] * (1 - args.tolerance)
+        if result["files_per_hour"] < floor:
+            print("REGRESSION: %.1f files/hour is below %.1f (baseline %.1f, tolerance %d%%)" % (
+                result["files_per_hour"], floor, baseline["files_per_hour"], args.tolerance * 100))
+            sys.exit(1)
+        print("OK vs baseline: %.1f files/hour (baseline %.1f)" % (result["files_per_hour"], baseline["files_per_hour"]))
+
+if __name__ == "__main__":
+    main()
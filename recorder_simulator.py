@@ -0,0 +1,372 @@
+"""Simulate Warcraft Recorder output and benchmark file-ready detection.
+
+Writer threads produce recordings the way the recorder does: growing MP4s
+written in bursts with the odd stall, finished by patching the mdat size and
+appending the moov box. Recordings use the real "YYYY-MM-DD HH-MM-SS -
+Character - Fo....mp4" names, with the context cut short as the recorder
+does. Patterns:
+
+    growing  written in place under the final name
+    rename   written as "<name>.part", renamed once finished
+    cut      the finished clip is cut out of the replay buffer: a fast
+             write under the final name, with a short stall part-way
+    mixed    a random pick per recording
+
+A scanner polls the folder as the watcher would, and every detector is
+run on each new recording. The benchmark reports the hand-off latency
+(hand-off time minus the recording's last write) and false-early pickups
+(hand-off before the file was finished):
+
+    python recorder_simulator.py --files 6 --writers 2 --pattern mixed
+    python recorder_simulator.py --detector stable:3,2,5 --detector stable:2,1,3 --detector mp4:0.5
+
+stable:CHECKS,INTERVAL,MIN_AGE calls wait_for_file_stable with those
+settings (stable_write_checks, stable_write_interval_seconds,
+min_file_age_seconds). mp4:POLL waits until the file's top-level boxes
+cover it exactly, including a moov box.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import struct
+import tempfile
+import threading
+import time
+
+import youtube_uploader as uploader
+
+CHARACTERS = ["Marpally", "Simbot", "Holytotem"]
+ENCOUNTERS = ["Fyrakk", "Tindral", "Smolderon", "Nymue", "Larodar", "Council", "Igira", "Volcoross", "Gnarlroot"]
+FTYP_BOX = struct.pack(">I4s4sI8s", 24, b"ftyp", b"isom", 512, b"isomiso2")
+
+def recording_name(started, rng):
+    stamp = time.strftime("%Y-%m-%d %H-%M-%S", time.localtime(started))
+    return "%s - %s - %s....mp4" % (stamp, rng.choice(CHARACTERS), rng.choice(ENCOUNTERS)[:2])
+
+class RecordingWriter:
+    """Writes one recording and records when it was really finished."""
+
+    def __init__(self, folder, name, duration, bytes_per_second, burst_seconds=1.0,
+                 pause_chance=0.05, pause_seconds=6.0, pattern="growing", rng=None):
+        self.final_path = os.path.join(folder, name)
+        self.duration = duration
+        self.bytes_per_second = bytes_per_second
+        self.burst_seconds = burst_seconds
+        self.pause_chance = pause_chance
+        self.pause_seconds = pause_seconds
+        self.pattern = pattern
+        self.rng = rng or random.Random()
+        self.finished_at = None
+        self.size = None
+        self.pauses = 0
+
+    def _pause(self):
+        if self.rng.random() < self.pause_chance:
+            self.pauses += 1
+            time.sleep(self.rng.uniform(0.5, 1.0) * self.pause_seconds)
+
+    def write(self):
+        path = self.final_path + ".part" if self.pattern == "rename" else self.final_path
+        with open(path, "wb") as handle:
+            handle.write(FTYP_BOX)
+            mdat_offset = handle.tell()
+            # Size 1 + 64-bit largesize of 0: still growing, as the muxer leaves it.
+            handle.write(struct.pack(">I4sQ", 1, b"mdat", 0))
+            payload = 0
+            if self.pattern == "cut":
+                payload = self._write_cut(handle)
+            else:
+                payload = self._write_bursts(handle)
+            handle.seek(mdat_offset + 8)
+            handle.write(struct.pack(">Q", payload + 16))
+            handle.seek(0, os.SEEK_END)
+            moov = os.urandom(self.rng.randint(4096, 65536))
+            handle.write(struct.pack(">I4s", len(moov) + 8, b"moov") + moov)
+            handle.flush()
+            self.finished_at = time.monotonic()
+            os.fsync(handle.fileno())
+        if path != self.final_path:
+            os.replace(path, self.final_path)
+            self.finished_at = time.monotonic()
+        self.size = os.path.getsize(self.final_path)
+
+    def _write_bursts(self, handle):
+        written = 0
+        elapsed = 0.0
+        while elapsed < self.duration:
+            burst = self.burst_seconds * self.rng.uniform(0.5, 1.5)
+            chunk = int(self.bytes_per_second * burst)
+            handle.write(os.urandom(chunk))
+            handle.flush()
+            written += chunk
+            time.sleep(burst)
+            elapsed += burst
+            self._pause()
+        return written
+
+    def _write_cut(self, handle):
+        # The cut copies the whole clip at disk speed with one stall part-way.
+        total = int(self.bytes_per_second * self.duration)
+        block = os.urandom(1024 * 1024)
+        written = 0
+        stall_at = total * self.rng.uniform(0.3, 0.7)
+        stalled = False
+        while written < total:
+            piece = block[:min(len(block), total - written)]
+            handle.write(piece)
+            written += len(piece)
+            if not stalled and written >= stall_at:
+                handle.flush()
+                stalled = True
+                time.sleep(self.rng.uniform(0.2, 1.0) * self.pause_seconds)
+        return written
+
+def mp4_is_finalized(file_path):
+    """True once the top-level boxes tile the file exactly and include moov."""
+    try:
+        with open(file_path, "rb") as handle:
+            file_size = os.fstat(handle.fileno()).st_size
+            offset = 0
+            seen = set()
+            while offset < file_size:
+                handle.seek(offset)
+                header = handle.read(16)
+                if len(header) < 8:
+                    return False
+                size, box_type = struct.unpack(">I4s", header[:8])
+                if size == 1:
+                    if len(header) < 16:
+                        return False
+                    size = struct.unpack(">Q", header[8:16])[0]
+                if size < 8:
+                    # 0 means "to end of file": the muxer hasn't written it yet.
+                    return False
+                seen.add(box_type)
+                offset += size
+            return offset == file_size and b"moov" in seen and b"ftyp" in seen
+    except OSError:
+        return False
+
+def wait_for_mp4_finalized(file_path, poll_seconds=0.5):
+    while not mp4_is_finalized(file_path):
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(file_path)
+        time.sleep(poll_seconds)
+
+def parse_detector(spec):
+    """Turn "stable:3,2,5" or "mp4:0.5" into (label, callable)."""
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+    if kind == "stable":
+        checks, interval, min_age = (values + [None, None, None])[:3]
+        checks = int(checks) if checks is not None else uploader.CONFIG_DEFAULTS["stable_write_checks"]
+        interval = interval if interval is not None else uploader.CONFIG_DEFAULTS["stable_write_interval_seconds"]
+        min_age = min_age if min_age is not None else uploader.CONFIG_DEFAULTS["min_file_age_seconds"]
+        label = "stable:%d,%g,%g" % (checks, interval, min_age)
+        return label, lambda path: uploader.wait_for_file_stable(path, checks, interval, min_age)
+    if kind == "mp4":
+        poll = values[0] if values else 0.5
+        return "mp4:%g" % poll, lambda path: wait_for_mp4_finalized(path, poll)
+    raise argparse.ArgumentTypeError("Unknown detector: %s" % spec)
+
+class DetectionBench:
+    """Polls the folder like the watcher and runs every detector on new files."""
+
+    def __init__(self, folder, detectors, scan_seconds=0.1):
+        self.folder = folder
+        self.detectors = detectors
+        self.scan_seconds = scan_seconds
+        self.results = []
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._stop = threading.Event()
+        self._scanner = threading.Thread(target=self._scan, name="scanner", daemon=True)
+
+    def start(self):
+        self._scanner.start()
+
+    def stop(self):
+        self._stop.set()
+        self._scanner.join()
+
+    def _scan(self):
+        while not self._stop.is_set():
+            for entry in os.scandir(self.folder):
+                path = entry.path
+                if path in self._seen or not path.lower().endswith(".mp4"):
+                    continue
+                if uploader.should_ignore_file(
+                    path, uploader.CONFIG_DEFAULTS["ignore_patterns"], uploader.CONFIG_DEFAULTS["ignore_extensions"]
+                ):
+                    continue
+                self._seen.add(path)
+                detected = time.monotonic()
+                for label, detector in self.detectors:
+                    thread = threading.Thread(target=self._detect, args=(path, label, detector, detected), daemon=True)
+                    thread.start()
+            time.sleep(self.scan_seconds)
+
+    def _detect(self, path, label, detector, detected):
+        try:
+            detector(path)
+            size = os.path.getsize(path)
+            error = None
+        except OSError as exc:
+            size = None
+            error = str(exc)
+        with self._lock:
+            self.results.append({
+                "path": path,
+                "detector": label,
+                "detected_at": detected,
+                "handed_off_at": time.monotonic(),
+                "size": size,
+                "error": error,
+            })
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize(results, writers):
+    truth = {writer.final_path: writer for writer in writers}
+    report = {}
+    for result in results:
+        writer = truth.get(result["path"])
+        entry = report.setdefault(result["detector"], {"latencies": [], "false_early": 0, "errors": 0})
+        if result["error"] or writer is None:
+            entry["errors"] += 1
+            continue
+        latency = result["handed_off_at"] - writer.finished_at
+        if latency < 0 or result["size"] != writer.size:
+            entry["false_early"] += 1
+        else:
+            entry["latencies"].append(latency)
+    summary = {}
+    for label, entry in report.items():
+        latencies = entry["latencies"]
+        summary[label] = {
+            "files": len(latencies) + entry["false_early"] + entry["errors"],
+            "false_early": entry["false_early"],
+            "errors": entry["errors"],
+            "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+            "latency_p50": _percentile(latencies, 0.5),
+            "latency_p95": _percentile(latencies, 0.95),
+            "latency_max": max(latencies) if latencies else None,
+        }
+    return summary
+
+def run_writers(folder, args, rng):
+    writers = []
+    names = set()
+    lock = threading.Lock()
+    per_writer = [args.files // args.writers + (1 if index < args.files % args.writers else 0)
+                  for index in range(args.writers)]
+
+    def session(count, seed):
+        session_rng = random.Random(seed)
+        for _ in range(count):
+            pattern = args.pattern
+            if pattern == "mixed":
+                pattern = session_rng.choice(["growing", "rename", "cut"])
+            with lock:
+                # Names carry a one-second timestamp; concurrent writers mustn't collide.
+                started = time.time()
+                name = recording_name(started, session_rng)
+                while name in names:
+                    started += 1
+                    name = recording_name(started, session_rng)
+                names.add(name)
+                writer = RecordingWriter(
+                    folder, name,
+                    duration=args.duration_seconds * session_rng.uniform(1 - args.duration_jitter, 1 + args.duration_jitter),
+                    bytes_per_second=args.bitrate_mbps * 1_000_000 / 8,
+                    burst_seconds=args.burst_seconds,
+                    pause_chance=args.pause_chance,
+                    pause_seconds=args.pause_seconds,
+                    pattern=pattern,
+                    rng=session_rng,
+                )
+                writers.append(writer)
+            writer.write()
+            time.sleep(args.gap_seconds * session_rng.uniform(0.5, 1.5))
+
+    threads = [threading.Thread(target=session, args=(count, rng.random()), name="writer-%d" % index)
+               for index, count in enumerate(per_writer) if count]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return writers
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Warcraft Recorder simulator and detection-latency benchmark")
+    parser.add_argument("--files", type=int, default=6, help="Recordings to write in total")
+    parser.add_argument("--writers", type=int, default=1, help="Recordings written at the same time")
+    parser.add_argument("--pattern", choices=["growing", "rename", "cut", "mixed"], default="mixed")
+    parser.add_argument("--duration-seconds", type=float, default=15, help="Mean recording length")
+    parser.add_argument("--duration-jitter", type=float, default=0.5, help="Length varies by +/- this fraction")
+    parser.add_argument("--bitrate-mbps", type=float, default=8, help="Recording bitrate in Mbit/s")
+    parser.add_argument("--burst-seconds", type=float, default=1.0, help="Mean gap between muxer writes")
+    parser.add_argument("--pause-chance", type=float, default=0.05, help="Chance of a stall after each write")
+    parser.add_argument("--pause-seconds", type=float, default=6.0, help="Longest stall")
+    parser.add_argument("--gap-seconds", type=float, default=5.0, help="Mean gap between one writer's recordings")
+    parser.add_argument("--detector", action="append", dest="detectors",
+                        help="stable:CHECKS,INTERVAL,MIN_AGE or mp4:POLL (repeatable)")
+    parser.add_argument("--scan-seconds", type=float, default=0.1, help="How often the folder is polled for new files")
+    parser.add_argument("--settle-seconds", type=float, default=60, help="How long to wait for detectors after the last write")
+    parser.add_argument("--folder", help="Write recordings here and keep them (default: a temp folder)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the summary JSON here")
+    args = parser.parse_args()
+    if not args.detectors:
+        args.detectors = ["stable", "mp4:0.5"]
+    if args.writers < 1:
+        parser.error("--writers must be at least 1")
+    return args
+
+def main():
+    args = parse_args()
+    detectors = [parse_detector(spec) for spec in args.detectors]
+    folder = args.folder or tempfile.mkdtemp(prefix="recorder-sim-")
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(args.seed)
+    bench = DetectionBench(folder, detectors, scan_seconds=args.scan_seconds)
+    bench.start()
+    try:
+        print("Writing %d recordings (%s) with %d writer(s) to %s" % (args.files, args.pattern, args.writers, folder))
+        writers = run_writers(folder, args, rng)
+        expected = len(writers) * len(detectors)
+        deadline = time.monotonic() + args.settle_seconds
+        while len(bench.results) < expected and time.monotonic() < deadline:
+            time.sleep(0.2)
+        if len(bench.results) < expected:
+            print("Gave up on %d detections after %ds" % (expected - len(bench.results), args.settle_seconds))
+        summary = summarize(list(bench.results), writers)
+    finally:
+        bench.stop()
+        if not args.folder:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    print("Stalls simulated: %d | patterns: %s" % (
+        sum(writer.pauses for writer in writers),
+        ", ".join(sorted({writer.pattern for writer in writers})),
+    ))
+    print("%-22s %6s %12s %9s %9s %9s %9s" % ("detector", "files", "false-early", "mean s", "p50 s", "p95 s", "max s"))
+    for label, row in summary.items():
+        print("%-22s %6d %12d %9s %9s %9s %9s" % (
+            label, row["files"], row["false_early"],
+            *("%.2f" % row[key] if row[key] is not None else "-"
+              for key in ("latency_mean", "latency_p50", "latency_p95", "latency_max")),
+        ))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"args": vars(args), "detectors": summary}, handle, indent=2)
+        print("Saved summary to %s" % args.json)
+
+if __name__ == "__main__":
+    main()
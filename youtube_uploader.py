@@ -1,25 +1,63 @@
 # Python script to upload videos to YouTube from a folder
 import os
 import time
+import atexit
 import datetime
 import json
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import shutil
+import signal
 import sys
+from abc import ABC, abstractmethod
 import argparse
+import asyncio
+import functools
 import fnmatch
+import re
 import subprocess
 import random
 import hashlib
+import errno
+import heapq
+import itertools
+import math
+import socket
+import http.server
+import mmap
+import threading
+import queue
+from collections import OrderedDict, deque
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor, as_completed
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import psutil
+except ImportError:  # Optional: CPU load checks, and pausing encodes on Windows
+    psutil = None
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from watchdog.events import (
+    DirCreatedEvent,
+    DirDeletedEvent,
+    DirMovedEvent,
+    FileCreatedEvent,
+    FileDeletedEvent,
+    FileModifiedEvent,
+    FileMovedEvent,
+    FileSystemEventHandler,
+)
 
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+import google_auth_httplib2
+import httplib2
+from googleapiclient.http import HttpRequest, MediaFileUpload, MediaUpload
 from googleapiclient.errors import HttpError
 
 # ---------- CONFIG ----------
@@ -59,6 +97,9 @@ CONFIG_DEFAULTS = {
     "log_file": "youtube_uploader.log",
     "log_max_bytes": 5_000_000,
     "log_backup_count": 3,
+    "log_format": "text",
+    "progress_log_seconds": 10,
+    "progress_log_percent": 10,
     "uploaded_titles_path": "uploaded_titles.json",
     "delete_after_upload": False,
     "drive_sync_mode": "move",
@@ -67,57 +108,144 @@ CONFIG_DEFAULTS = {
     "failed_folder": "failed",
     "max_uploads_per_run": None,
     "title_collision_suffix": "auto",
+    "scan_index_path": "scan_index.json",
+    "watch_roots": [],
+    "watch_recursive": False,
+    "stability_workers": 4,
+    "compression_workers": 1,
+    "upload_workers": 1,
+    "observer_mode": "native",
+    "poll_min_interval_seconds": 1,
+    "poll_max_interval_seconds": 30,
+    "poll_full_scan_seconds": 300,
+    "event_debounce_seconds": 2,
+    "recent_files_limit": 1024,
+    "disk_reserve_bytes": 1_000_000_000,
+    "disk_retry_seconds": 60,
+    "compression_size_ratio": 1.0,
+    "schedule_policy": "fifo",
+    "schedule_aging_factor": 0.1,
+    "schedule_bytes_per_second": 10_000_000,
+    "drive_sync_workers": 1,
+    "drive_copy_chunk_bytes": 64 * 1024 * 1024,
+    "fanout_enabled": False,
+    "fanout_chunk_bytes": 8 * 1024 * 1024,
+    "fanout_queue_depth": 4,
+    "fanout_object_store_path": None,
+    "remote_index_enabled": False,
+    "remote_index_path": "remote_index.json",
+    "backfill_workers": 4,
+    "backfill_checkpoint_path": "backfill_checkpoint.json",
+    "lease_dir": None,
+    "node_id": None,
+    "lease_ttl_seconds": 120,
+    "lease_heartbeat_seconds": 30,
+    "metrics_port": None,
+    "metrics_json_path": "metrics.json",
+    "trace_path": None,
+    "youtube_api_root_url": None,
+    "thumbnail_enabled": False,
+    "thumbnail_mode": "offset",
+    "thumbnail_offset_seconds": 30,
+    "thumbnail_width": 1280,
+    "recovery_enabled": True,
+    "failed_retention_days": None,
+    "failed_max_bytes": None,
+    "temp_retention_hours": 24,
+    "sweep_interval_seconds": 3600,
+    "youtube_daily_quota": 10000,
+    "run_window_minutes": None,
+    "plan_encode_speed": None,
+    "plan_upload_mb_per_second": None,
+    "encode_low_priority": True,
+    "encode_threads": None,
+    "game_process_names": ["Wow.exe", "WowClassic.exe"],
+    "encode_game_action": "pause",
+    "encode_throttle_percent": 25,
+    "encode_max_cpu_percent": None,
+    "governor_poll_seconds": 2,
+    "encode_cache_dir": None,
+    "encode_cache_max_bytes": 20 * 1024 * 1024 * 1024,
+    "encode_stall_seconds": 120,
+    "encode_stall_retries": 1,
+    "encode_stderr_lines": 40,
+    "stream_encode_upload": False,
+    "stream_chunk_bytes": 8 * 1024 * 1024,
 }
 
-WATCH_FOLDER = CONFIG_DEFAULTS["watch_folder"]
-DRIVE_SYNC_FOLDER = CONFIG_DEFAULTS["drive_sync_folder"]
-YOUTUBE_PLAYLIST_ID = CONFIG_DEFAULTS["youtube_playlist_id"]
-SEASON_START_DATE = CONFIG_DEFAULTS["season_start_date"]
-SCOPES = CONFIG_DEFAULTS["scopes"]
-YOUTUBE_PRIVACY = CONFIG_DEFAULTS["youtube_privacy"]
-DEFAULT_DESCRIPTION = CONFIG_DEFAULTS["default_description"]
-DEFAULT_TAGS = CONFIG_DEFAULTS["default_tags"]
-DRY_RUN = CONFIG_DEFAULTS["dry_run"]
-STABLE_WRITE_CHECKS = CONFIG_DEFAULTS["stable_write_checks"]
-STABLE_WRITE_INTERVAL_SECONDS = CONFIG_DEFAULTS["stable_write_interval_seconds"]
-MIN_FILE_AGE_SECONDS = CONFIG_DEFAULTS["min_file_age_seconds"]
-IGNORE_PATTERNS = CONFIG_DEFAULTS["ignore_patterns"]
-IGNORE_EXTENSIONS = CONFIG_DEFAULTS["ignore_extensions"]
-PULL_TRACKER_PATH = CONFIG_DEFAULTS["pull_tracker_path"]
-LOG_LEVEL = CONFIG_DEFAULTS["log_level"]
-COMPRESSION_ENABLED = CONFIG_DEFAULTS["compression_enabled"]
-COMPRESSION_PRESET = CONFIG_DEFAULTS["compression_preset"]
-COMPRESSION_CRF = CONFIG_DEFAULTS["compression_crf"]
-COMPRESSION_AUDIO_BITRATE = CONFIG_DEFAULTS["compression_audio_bitrate"]
-COMPRESSION_MAX_WIDTH = CONFIG_DEFAULTS["compression_max_width"]
-MAX_RETRIES = CONFIG_DEFAULTS["max_retries"]
-RETRY_BACKOFF_SECONDS = CONFIG_DEFAULTS["retry_backoff_seconds"]
-RETRY_BACKOFF_MULTIPLIER = CONFIG_DEFAULTS["retry_backoff_multiplier"]
-RETRY_JITTER_SECONDS = CONFIG_DEFAULTS["retry_jitter_seconds"]
-PENDING_UPLOADS_PATH = CONFIG_DEFAULTS["pending_uploads_path"]
-LOG_FILE = CONFIG_DEFAULTS["log_file"]
-LOG_MAX_BYTES = CONFIG_DEFAULTS["log_max_bytes"]
-LOG_BACKUP_COUNT = CONFIG_DEFAULTS["log_backup_count"]
-UPLOADED_TITLES_PATH = CONFIG_DEFAULTS["uploaded_titles_path"]
-DELETE_AFTER_UPLOAD = CONFIG_DEFAULTS["delete_after_upload"]
-DRIVE_SYNC_MODE = CONFIG_DEFAULTS["drive_sync_mode"]
-DUPLICATE_GUARD_MODE = CONFIG_DEFAULTS["duplicate_guard_mode"]
-COMPRESSION_KEEP_ORIGINAL = CONFIG_DEFAULTS["compression_keep_original"]
-FAILED_FOLDER = CONFIG_DEFAULTS["failed_folder"]
-MAX_UPLOADS_PER_RUN = CONFIG_DEFAULTS["max_uploads_per_run"]
-TITLE_COLLISION_SUFFIX = CONFIG_DEFAULTS["title_collision_suffix"]
+class PipelineConfig:
+    """Settings, as attributes named after the config keys.
+
+    Built from the config after apply_config has applied the command line;
+    keys it lacks take their CONFIG_DEFAULTS value. The pipeline holds one
+    on PipelineContext.config and passes it (or single values from it) to
+    the helpers it calls.
+    """
+
+    def __init__(self, config=None):
+        settings = dict(CONFIG_DEFAULTS)
+        settings.update(config or {})
+        for key, value in settings.items():
+            setattr(self, key, value)
+
+# libx264 presets, fastest first; a stalled encode is retried two steps faster.
+X264_PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow"]
+
+# YouTube Data API quota units per call.
+VIDEO_INSERT_QUOTA_COST = 1600
+PLAYLIST_INSERT_QUOTA_COST = 50
+THUMBNAIL_SET_QUOTA_COST = 50
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line; extra= fields (event, percent, ...) are kept."""
+
+    _STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._STANDARD and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+_LOG_LISTENER = None
+
+def _stop_log_listener():
+    global _LOG_LISTENER
+    if _LOG_LISTENER is not None:
+        _LOG_LISTENER.stop()
+        _LOG_LISTENER = None
+
+atexit.register(_stop_log_listener)
 
 # Setup logging
-def configure_logging():
+def configure_logging(config=None):
+    """Log through a queue so callers never wait on file writes or rollover.
+
+    The file and console handlers run on a QueueListener thread. Calling
+    this again (after the config is applied) swaps in new handlers.
+    """
+    global _LOG_LISTENER
+    config = config or PipelineConfig()
     logger = logging.getLogger()
-    logger.setLevel(LOG_LEVEL)
+    logger.setLevel(config.log_level)
 
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    if config.log_format == "json":
+        formatter = JsonLogFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
     file_handler = RotatingFileHandler(
-        LOG_FILE,
-        maxBytes=LOG_MAX_BYTES,
-        backupCount=LOG_BACKUP_COUNT,
+        config.log_file,
+        maxBytes=config.log_max_bytes,
+        backupCount=config.log_backup_count,
         encoding="utf-8",
     )
     file_handler.setFormatter(formatter)
@@ -125,7 +253,33 @@ def configure_logging():
     stream_handler = logging.StreamHandler()
     stream_handler.setFormatter(formatter)
 
-    logger.handlers = [file_handler, stream_handler]
+    _stop_log_listener()
+    log_queue = queue.SimpleQueue()
+    _LOG_LISTENER = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _LOG_LISTENER.start()
+    logger.handlers = [QueueHandler(log_queue)]
+
+class ProgressLogLimiter:
+    """Let a progress update through every N seconds or N percent, per file."""
+
+    def __init__(self, seconds, percent):
+        self.seconds = seconds
+        self.percent = percent
+        self._last_time = None
+        self._last_percent = None
+
+    def should_log(self, percent):
+        now = time.monotonic()
+        if (
+            self._last_time is None
+            or percent >= 100
+            or now - self._last_time >= self.seconds
+            or percent - self._last_percent >= self.percent
+        ):
+            self._last_time = now
+            self._last_percent = percent
+            return True
+        return False
 # ----------------------------
 
 def _merge_config(defaults, overrides):
@@ -153,10 +307,17 @@ def load_config(path):
         logging.warning("Failed to load config %s: %s. Using defaults.", path, exc)
         return dict(CONFIG_DEFAULTS)
 
-def parse_args():
+def _uploads_limit_arg(value):
+    if value == "auto":
+        return value
+    return int(value)
+
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description="WoW POV YouTube uploader")
     parser.add_argument("--config", default="config.json", help="Path to JSON config file")
     parser.add_argument("--watch-folder", help="Folder to monitor for videos")
+    parser.add_argument("--watch-root", action="append", help="Additional folder to monitor (repeatable)")
+    parser.add_argument("--watch-recursive", action="store_true", help="Also watch subfolders of --watch-folder")
     parser.add_argument("--drive-sync-folder", help="Google Drive sync folder (optional)")
     parser.add_argument("--playlist-id", help="YouTube playlist ID")
     parser.add_argument("--season-start-date", help="Season start date (YYYY-MM-DD)")
@@ -182,6 +343,7 @@ def parse_args():
     parser.add_argument("--log-file", help="Log file path")
     parser.add_argument("--log-max-bytes", type=int, help="Max log size in bytes before rotation")
     parser.add_argument("--log-backup-count", type=int, help="Number of rotated log files to keep")
+    parser.add_argument("--log-format", choices=["text", "json"], help="Log line format (json = one object per line)")
     parser.add_argument("--uploaded-titles-path", help="Path to uploaded titles cache JSON")
     parser.add_argument("--once", action="store_true", help="Process existing files and exit")
     parser.add_argument("--delete-after-upload", action="store_true", help="Delete local file after successful upload")
@@ -190,9 +352,43 @@ def parse_args():
     parser.add_argument("--compression-keep-original", action="store_true", help="Keep original after compression")
     parser.add_argument("--compression-replace-original", action="store_true", help="Replace original with compressed file")
     parser.add_argument("--failed-folder", help="Folder to move failed files into")
-    parser.add_argument("--max-uploads-per-run", type=int, help="Limit uploads per run")
+    parser.add_argument("--max-uploads-per-run", type=_uploads_limit_arg, help="Limit uploads per run (a number, or auto to fit run_window_minutes and the daily quota)")
     parser.add_argument("--title-collision-suffix", choices=["auto", "none"], help="Append suffix on title collisions")
-    return parser.parse_args()
+    parser.add_argument("--scan-index-path", help="Path to startup scan index JSON")
+    parser.add_argument("--stability-workers", type=int, help="Files waited on for stability in parallel")
+    parser.add_argument("--compression-workers", type=int, help="Parallel rename/compression workers")
+    parser.add_argument("--encode-threads", type=int, help="Cap the threads each ffmpeg encode may use")
+    parser.add_argument("--stream-encode", action="store_true", help="Upload the fragmented MP4 while ffmpeg is still writing it")
+    parser.add_argument("--encode-stall-seconds", type=int, help="Kill and retry an encode that makes no progress for this long")
+    parser.add_argument("--encode-cache-dir", help="Folder of finished encodes reused by retries and re-runs")
+    parser.add_argument("--encode-game-action", choices=["pause", "throttle", "ignore"], help="What encodes do while the game is running")
+    parser.add_argument("--upload-workers", type=int, help="Parallel upload workers")
+    parser.add_argument("--observer-mode", choices=["native", "polling"], help="Filesystem event source (polling for SMB/NFS)")
+    parser.add_argument("--poll-min-interval-seconds", type=float, help="Polling interval while files are changing")
+    parser.add_argument("--poll-max-interval-seconds", type=float, help="Polling interval when idle")
+    parser.add_argument("--event-debounce-seconds", type=float, help="Quiet period before a file event is handed off")
+    parser.add_argument("--disk-reserve-bytes", type=int, help="Free space to keep on every volume the pipeline writes to")
+    parser.add_argument("--schedule-policy", choices=["fifo", "sjf", "newest"], help="Order in which queued files are processed")
+    parser.add_argument("--drive-sync-workers", type=int, help="Background Drive sync workers")
+    parser.add_argument("--schedule-aging-factor", type=float, help="Priority seconds a queued file gains per second waited")
+    parser.add_argument("--fanout", action="store_true", help="Read each file once and feed upload, Drive copy and hash together")
+    parser.add_argument("--sync-remote-index", action="store_true", help="Sync the channel's uploads into the duplicate guard at startup")
+    parser.add_argument("--remote-index-path", help="Path to the cached remote uploads index JSON")
+    parser.add_argument("--backfill-index", action="store_true", help="Hash already-uploaded archives into the hash duplicate cache and exit")
+    parser.add_argument("--backfill-workers", type=int, help="Parallel hashing threads for --backfill-index")
+    parser.add_argument("--lease-dir", help="Shared folder for job leases when several nodes drain one recorder folder")
+    parser.add_argument("--node-id", help="Name of this node in lease files (default: host-pid)")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus-style metrics on this local port")
+    parser.add_argument("--trace", metavar="PATH", help="Write a Chrome/Perfetto trace of every file's stages to PATH")
+    parser.add_argument("--youtube-api-root-url", help="Send API calls to a local YouTube stand-in (benchmarks/tests)")
+    parser.add_argument("--thumbnails", action="store_true", help="Extract a frame and set it as each video's thumbnail")
+    parser.add_argument("--thumbnail-mode", choices=["offset", "motion"], help="Frame at thumbnail_offset_seconds, or the highest-motion keyframe")
+    parser.add_argument("--plan", action="store_true", help="Estimate how long the backlog takes to encode and upload, then exit")
+    parser.add_argument("--run-window-minutes", type=int, help="Time a --once run may take when max_uploads_per_run is auto")
+    parser.add_argument("--no-recovery", action="store_true", help="Skip the startup pass over backups and renamed files left by an interrupted run")
+    parser.add_argument("--failed-retention-days", type=int, help="Delete files in the failed folder after this many days")
+    parser.add_argument("--failed-max-bytes", type=int, help="Keep the failed folder under this many bytes, oldest files first")
+    return parser.parse_args(argv)
 
 def _validate_positive_int(value, name):
     if value is None:
@@ -220,6 +416,76 @@ def validate_config(config):
     _validate_positive_int(config.get("retry_jitter_seconds"), "retry_jitter_seconds")
     _validate_positive_int(config.get("log_max_bytes"), "log_max_bytes")
     _validate_positive_int(config.get("log_backup_count"), "log_backup_count")
+    _validate_positive_int(config.get("progress_log_seconds"), "progress_log_seconds")
+    _validate_positive_int(config.get("progress_log_percent"), "progress_log_percent")
+    if config.get("log_format") not in {"text", "json"}:
+        logging.warning("log_format should be text/json. Got: %s", config.get("log_format"))
+    _validate_positive_int(config.get("stability_workers"), "stability_workers")
+    _validate_positive_int(config.get("compression_workers"), "compression_workers")
+    _validate_positive_int(config.get("upload_workers"), "upload_workers")
+    _validate_positive_int(config.get("poll_full_scan_seconds"), "poll_full_scan_seconds")
+    _validate_positive_int(config.get("recent_files_limit"), "recent_files_limit")
+    _validate_positive_int(config.get("disk_reserve_bytes"), "disk_reserve_bytes")
+    _validate_positive_int(config.get("disk_retry_seconds"), "disk_retry_seconds")
+    _validate_positive_int(config.get("drive_sync_workers"), "drive_sync_workers")
+    _validate_positive_int(config.get("drive_copy_chunk_bytes"), "drive_copy_chunk_bytes")
+    _validate_positive_int(config.get("fanout_chunk_bytes"), "fanout_chunk_bytes")
+    _validate_positive_int(config.get("fanout_queue_depth"), "fanout_queue_depth")
+    _validate_positive_int(config.get("backfill_workers"), "backfill_workers")
+    _validate_string(config.get("lease_dir"), "lease_dir")
+    _validate_string(config.get("node_id"), "node_id")
+    _validate_positive_int(config.get("lease_ttl_seconds"), "lease_ttl_seconds")
+    _validate_positive_int(config.get("lease_heartbeat_seconds"), "lease_heartbeat_seconds")
+    ttl = config.get("lease_ttl_seconds")
+    heartbeat = config.get("lease_heartbeat_seconds")
+    if isinstance(ttl, int) and isinstance(heartbeat, int) and ttl <= 2 * heartbeat:
+        logging.warning("lease_ttl_seconds should be well above lease_heartbeat_seconds.")
+    _validate_positive_int(config.get("metrics_port"), "metrics_port")
+    _validate_string(config.get("metrics_json_path"), "metrics_json_path")
+    _validate_string(config.get("trace_path"), "trace_path")
+    _validate_string(config.get("youtube_api_root_url"), "youtube_api_root_url")
+    if config.get("thumbnail_mode") not in {"offset", "motion"}:
+        logging.warning("thumbnail_mode should be offset/motion. Got: %s", config.get("thumbnail_mode"))
+    _validate_positive_int(config.get("thumbnail_offset_seconds"), "thumbnail_offset_seconds")
+    _validate_positive_int(config.get("thumbnail_width"), "thumbnail_width")
+    _validate_positive_int(config.get("failed_retention_days"), "failed_retention_days")
+    _validate_positive_int(config.get("failed_max_bytes"), "failed_max_bytes")
+    _validate_positive_int(config.get("temp_retention_hours"), "temp_retention_hours")
+    _validate_positive_int(config.get("sweep_interval_seconds"), "sweep_interval_seconds")
+    if config.get("max_uploads_per_run") != "auto":
+        _validate_positive_int(config.get("max_uploads_per_run"), "max_uploads_per_run")
+    _validate_positive_int(config.get("youtube_daily_quota"), "youtube_daily_quota")
+    _validate_positive_int(config.get("run_window_minutes"), "run_window_minutes")
+    _validate_positive_int(config.get("encode_threads"), "encode_threads")
+    if config.get("encode_game_action") not in {"pause", "throttle", "ignore"}:
+        logging.warning("encode_game_action should be pause/throttle/ignore. Got: %s", config.get("encode_game_action"))
+    throttle = config.get("encode_throttle_percent")
+    if not isinstance(throttle, int) or not 1 <= throttle <= 99:
+        logging.warning("encode_throttle_percent should be between 1 and 99. Got: %s", throttle)
+    _validate_positive_int(config.get("encode_max_cpu_percent"), "encode_max_cpu_percent")
+    _validate_string(config.get("encode_cache_dir"), "encode_cache_dir")
+    _validate_positive_int(config.get("encode_stall_seconds"), "encode_stall_seconds")
+    _validate_positive_int(config.get("encode_stall_retries"), "encode_stall_retries")
+    _validate_positive_int(config.get("encode_stderr_lines"), "encode_stderr_lines")
+    _validate_positive_int(config.get("stream_chunk_bytes"), "stream_chunk_bytes")
+    stream_chunk = config.get("stream_chunk_bytes")
+    if isinstance(stream_chunk, int) and (stream_chunk <= 0 or stream_chunk % RESUMABLE_CHUNK_ALIGNMENT):
+        logging.warning("Config stream_chunk_bytes should be a positive multiple of %d.", RESUMABLE_CHUNK_ALIGNMENT)
+    if config.get("compression_preset") not in X264_PRESETS:
+        logging.warning("compression_preset should be one of %s. Got: %s", ", ".join(X264_PRESETS), config.get("compression_preset"))
+    _validate_positive_int(config.get("encode_cache_max_bytes"), "encode_cache_max_bytes")
+    if config.get("encode_max_cpu_percent") is not None and psutil is None:
+        logging.warning("encode_max_cpu_percent needs the psutil package; CPU load will not pause encodes.")
+    game_names = config.get("game_process_names")
+    if game_names is not None and not isinstance(game_names, list):
+        logging.warning("game_process_names should be a list. Got: %s", game_names)
+    for key in ("plan_encode_speed", "plan_upload_mb_per_second", "governor_poll_seconds"):
+        value = config.get(key)
+        if value is not None and (not isinstance(value, (int, float)) or value <= 0):
+            logging.warning("%s should be a positive number. Got: %s", key, value)
+    chunk = config.get("fanout_chunk_bytes")
+    if isinstance(chunk, int) and chunk % RESUMABLE_CHUNK_ALIGNMENT:
+        logging.warning("Config fanout_chunk_bytes should be a multiple of %d.", RESUMABLE_CHUNK_ALIGNMENT)
 
     privacy = config.get("youtube_privacy")
     if privacy not in {"unlisted", "private", "public"}:
@@ -233,6 +499,14 @@ def validate_config(config):
     if duplicate_guard_mode not in {"title", "hash", "none"}:
         logging.warning("duplicate_guard_mode should be title/hash/none. Got: %s", duplicate_guard_mode)
 
+    schedule_policy = config.get("schedule_policy")
+    if schedule_policy not in {"fifo", "sjf", "newest"}:
+        logging.warning("schedule_policy should be fifo/sjf/newest. Got: %s", schedule_policy)
+
+    observer_mode = config.get("observer_mode")
+    if observer_mode not in {"native", "polling"}:
+        logging.warning("observer_mode should be native/polling. Got: %s", observer_mode)
+
     title_collision_suffix = config.get("title_collision_suffix")
     if title_collision_suffix not in {"auto", "none"}:
         logging.warning("title_collision_suffix should be auto/none. Got: %s", title_collision_suffix)
@@ -253,47 +527,24 @@ def validate_config(config):
     if ignore_extensions is not None and not isinstance(ignore_extensions, list):
         logging.warning("ignore_extensions should be a list. Got: %s", ignore_extensions)
 
-def apply_config(config, args):
-    global WATCH_FOLDER
-    global DRIVE_SYNC_FOLDER
-    global YOUTUBE_PLAYLIST_ID
-    global SEASON_START_DATE
-    global SCOPES
-    global YOUTUBE_PRIVACY
-    global DEFAULT_DESCRIPTION
-    global DEFAULT_TAGS
-    global DRY_RUN
-    global STABLE_WRITE_CHECKS
-    global STABLE_WRITE_INTERVAL_SECONDS
-    global MIN_FILE_AGE_SECONDS
-    global IGNORE_PATTERNS
-    global IGNORE_EXTENSIONS
-    global PULL_TRACKER_PATH
-    global LOG_LEVEL
-    global COMPRESSION_ENABLED
-    global COMPRESSION_PRESET
-    global COMPRESSION_CRF
-    global COMPRESSION_AUDIO_BITRATE
-    global COMPRESSION_MAX_WIDTH
-    global MAX_RETRIES
-    global RETRY_BACKOFF_SECONDS
-    global RETRY_BACKOFF_MULTIPLIER
-    global RETRY_JITTER_SECONDS
-    global PENDING_UPLOADS_PATH
-    global LOG_FILE
-    global LOG_MAX_BYTES
-    global LOG_BACKUP_COUNT
-    global UPLOADED_TITLES_PATH
-    global DELETE_AFTER_UPLOAD
-    global DRIVE_SYNC_MODE
-    global DUPLICATE_GUARD_MODE
-    global COMPRESSION_KEEP_ORIGINAL
-    global FAILED_FOLDER
-    global MAX_UPLOADS_PER_RUN
-    global TITLE_COLLISION_SUFFIX
+    watch_roots = config.get("watch_roots")
+    if watch_roots is not None and not isinstance(watch_roots, list):
+        logging.warning("watch_roots should be a list. Got: %s", watch_roots)
+    elif watch_roots:
+        for root in watch_roots:
+            if isinstance(root, str):
+                continue
+            if not isinstance(root, dict) or not root.get("path"):
+                logging.warning("watch_roots entries should be paths or objects with a path. Got: %s", root)
 
+def apply_config(config, args):
+    """Apply the command line to config and set up logging with the result."""
     if args.watch_folder:
         config["watch_folder"] = args.watch_folder
+    if args.watch_root:
+        config["watch_roots"] = list(config.get("watch_roots") or []) + args.watch_root
+    if args.watch_recursive:
+        config["watch_recursive"] = True
     if args.drive_sync_folder is not None:
         config["drive_sync_folder"] = args.drive_sync_folder
     if args.playlist_id is not None:
@@ -344,6 +595,8 @@ def apply_config(config, args):
         config["log_max_bytes"] = args.log_max_bytes
     if args.log_backup_count is not None:
         config["log_backup_count"] = args.log_backup_count
+    if args.log_format is not None:
+        config["log_format"] = args.log_format
     if args.uploaded_titles_path is not None:
         config["uploaded_titles_path"] = args.uploaded_titles_path
     if args.delete_after_upload:
@@ -362,59 +615,437 @@ def apply_config(config, args):
         config["max_uploads_per_run"] = args.max_uploads_per_run
     if args.title_collision_suffix is not None:
         config["title_collision_suffix"] = args.title_collision_suffix
+    if args.scan_index_path is not None:
+        config["scan_index_path"] = args.scan_index_path
+    if args.stability_workers is not None:
+        config["stability_workers"] = args.stability_workers
+    if args.compression_workers is not None:
+        config["compression_workers"] = args.compression_workers
+    if args.upload_workers is not None:
+        config["upload_workers"] = args.upload_workers
+    if args.observer_mode is not None:
+        config["observer_mode"] = args.observer_mode
+    if args.poll_min_interval_seconds is not None:
+        config["poll_min_interval_seconds"] = args.poll_min_interval_seconds
+    if args.poll_max_interval_seconds is not None:
+        config["poll_max_interval_seconds"] = args.poll_max_interval_seconds
+    if args.event_debounce_seconds is not None:
+        config["event_debounce_seconds"] = args.event_debounce_seconds
+    if args.disk_reserve_bytes is not None:
+        config["disk_reserve_bytes"] = args.disk_reserve_bytes
+    if args.schedule_policy is not None:
+        config["schedule_policy"] = args.schedule_policy
+    if args.schedule_aging_factor is not None:
+        config["schedule_aging_factor"] = args.schedule_aging_factor
+    if args.drive_sync_workers is not None:
+        config["drive_sync_workers"] = args.drive_sync_workers
+    if args.fanout:
+        config["fanout_enabled"] = True
+    if args.sync_remote_index:
+        config["remote_index_enabled"] = True
+    if args.remote_index_path is not None:
+        config["remote_index_path"] = args.remote_index_path
+    if args.backfill_workers is not None:
+        config["backfill_workers"] = args.backfill_workers
+    if args.lease_dir is not None:
+        config["lease_dir"] = args.lease_dir
+    if args.node_id is not None:
+        config["node_id"] = args.node_id
+    if args.metrics_port is not None:
+        config["metrics_port"] = args.metrics_port
+    if args.trace is not None:
+        config["trace_path"] = args.trace
+    if args.youtube_api_root_url is not None:
+        config["youtube_api_root_url"] = args.youtube_api_root_url
+    if args.thumbnails:
+        config["thumbnail_enabled"] = True
+    if args.thumbnail_mode is not None:
+        config["thumbnail_mode"] = args.thumbnail_mode
+    if args.encode_threads is not None:
+        config["encode_threads"] = args.encode_threads
+    if args.stream_encode:
+        config["stream_encode_upload"] = True
+    if args.encode_stall_seconds is not None:
+        config["encode_stall_seconds"] = args.encode_stall_seconds
+    if args.encode_cache_dir is not None:
+        config["encode_cache_dir"] = args.encode_cache_dir
+    if args.encode_game_action is not None:
+        config["encode_game_action"] = args.encode_game_action
+    if args.run_window_minutes is not None:
+        config["run_window_minutes"] = args.run_window_minutes
+    if args.no_recovery:
+        config["recovery_enabled"] = False
+    if args.failed_retention_days is not None:
+        config["failed_retention_days"] = args.failed_retention_days
+    if args.failed_max_bytes is not None:
+        config["failed_max_bytes"] = args.failed_max_bytes
+
+    configure_logging(PipelineConfig(config))
+
+SECONDS_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+MBPS_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+# Speeds --plan and the automatic upload limit read back from metrics_json_path.
+THROUGHPUT_METRICS = {"encode": "uploader_encode_mb_per_second", "upload": "uploader_upload_mb_per_second"}
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, lock):
+        self.name = name
+        self.help = help_text
+        self._lock = lock
+        self._values = {}  # sorted label items -> value
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    @staticmethod
+    def _format_labels(key, extra=()):
+        items = list(key) + list(extra)
+        if not items:
+            return ""
+        escaped = (
+            '%s="%s"' % (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for name, value in items
+        )
+        return "{%s}" % ",".join(escaped)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name + self._format_labels(key), value) for key, value in self._values.items()]
+
+    def snapshot(self):
+        with self._lock:
+            return [{"labels": dict(key), "value": value} for key, value in self._values.items()]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, lock, buckets=SECONDS_BUCKETS):
+        super().__init__(name, help_text, lock)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            for key, state in self._values.items():
+                for bound, count in zip(self.buckets, state["counts"]):
+                    lines.append((self.name + "_bucket" + self._format_labels(key, [("le", repr(float(bound)))]), count))
+                lines.append((self.name + "_bucket" + self._format_labels(key, [("le", "+Inf")]), state["count"]))
+                lines.append((self.name + "_sum" + self._format_labels(key), state["sum"]))
+                lines.append((self.name + "_count" + self._format_labels(key), state["count"]))
+        return lines
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                {
+                    "labels": dict(key),
+                    "buckets": dict(zip(self.buckets, state["counts"])),
+                    "sum": state["sum"],
+                    "count": state["count"],
+                }
+                for key, state in self._values.items()
+            ]
+
+class MetricsRegistry:
+    """Counters, gauges and histograms for every pipeline stage.
+
+    Metrics are created on first use, so instrumented code just calls
+    METRICS.counter(...).inc(). serve() exposes them in the Prometheus
+    text format on a local port; dump_json() writes a snapshot at shutdown.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = OrderedDict()
+        self._server = None
+
+    def _get(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, threading.Lock(), **kwargs)
+        return metric
+
+    def counter(self, name, help_text=""):
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name, help_text=""):
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name, help_text="", buckets=SECONDS_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def render_prometheus(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append("# HELP %s %s" % (metric.name, metric.help))
+            lines.append("# TYPE %s %s" % (metric.name, metric.kind))
+            lines.extend("%s %s" % (sample, value) for sample, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {"type": metric.kind, "help": metric.help, "values": metric.snapshot()}
+            for metric in metrics
+        }
+
+    def dump_json(self, path, keep=()):
+        """Write a snapshot to path.
+
+        Metrics named in keep that this run never recorded are carried over
+        from the snapshot already at path, so a run with nothing to do
+        doesn't erase them.
+        """
+        if not path:
+            return
+        snapshot = self.snapshot()
+        missing = [name for name in keep if not snapshot.get(name, {}).get("values")]
+        if missing and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as handle:
+                    previous = json.load(handle)
+            except (OSError, json.JSONDecodeError) as exc:
+                logging.warning("Could not read previous metrics from %s: %s", path, exc)
+                previous = {}
+            for name in missing:
+                if name in previous:
+                    snapshot[name] = previous[name]
+        try:
+            with open(path, "w", encoding="utf-8") as handle:
+                json.dump(snapshot, handle, indent=2, sort_keys=True)
+            logging.info("Wrote metrics to %s", path)
+        except OSError as exc:
+            logging.warning("Failed to write metrics: %s", exc)
+
+    def serve(self, port, host="127.0.0.1"):
+        registry = self
+
+        class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((host, port), MetricsRequestHandler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        logging.info("Serving metrics on http://%s:%d/metrics", host, self._server.server_address[1])
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+METRICS = MetricsRegistry()
+
+def _observe_throughput(metric_name, help_text, nbytes, seconds):
+    if seconds > 0 and nbytes > 0:
+        METRICS.histogram(metric_name, help_text, buckets=MBPS_BUCKETS).observe(nbytes / 1e6 / seconds)
+
+class _NullSpan:
+    """Stand-in returned by Tracer.span() while tracing is off."""
+
+    args = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class _Span:
+    def __init__(self, tracer, name, track, args):
+        self.tracer = tracer
+        self.name = name
+        self.track = track
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.complete(self.name, self.start, time.perf_counter(), self.track, **self.args)
+        return False
+
+class Tracer:
+    """Per-file spans exported as a Chrome/Perfetto trace (chrome://tracing, ui.perfetto.dev).
+
+    Each job gets its own track (a trace "thread"), so concurrent files sit on
+    separate rows. Spans land on the calling thread's current track, set by
+    set_track() when a pipeline stage picks up a job. While disabled, span()
+    returns a shared no-op context manager and nothing is recorded.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self._events = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._tracks = itertools.count(1)
+        self._named_threads = set()
+        self._origin = time.perf_counter()
+
+    def enable(self, path):
+        self.enabled = True
+        self.path = path
+        self._origin = time.perf_counter()
+
+    def track(self, label):
+        """Allocate a new track named label; None while disabled."""
+        if not self.enabled:
+            return None
+        track = next(self._tracks)
+        with self._lock:
+            self._events.append({"ph": "M", "name": "thread_name", "pid": 1, "tid": track, "args": {"name": label}})
+        return track
+
+    def set_track(self, track):
+        if self.enabled:
+            self._local.track = track
+
+    def current_track(self):
+        return getattr(self._local, "track", None) if self.enabled else None
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, self.current_track(), args)
+
+    def complete(self, name, start, end, track=None, **args):
+        """Record a finished span given perf_counter() start and end times."""
+        if not self.enabled:
+            return
+        thread_name = None
+        if track is None:
+            # Work outside a job (pending drain, Drive sync) goes on its thread's track.
+            track = threading.get_ident()
+            thread_name = threading.current_thread().name
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": 1,
+            "tid": track,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            if thread_name is not None and track not in self._named_threads:
+                self._named_threads.add(track)
+                self._events.append({"ph": "M", "name": "thread_name", "pid": 1, "tid": track, "args": {"name": thread_name}})
+            self._events.append(event)
+
+    def write(self):
+        if not self.enabled or not self.path:
+            return
+        with self._lock:
+            events = list(self._events)
+        try:
+            with open(self.path, "w", encoding="utf-8") as handle:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, handle)
+            logging.info("Wrote trace with %d events to %s", len(events), self.path)
+        except OSError as exc:
+            logging.warning("Failed to write trace: %s", exc)
 
-    WATCH_FOLDER = config["watch_folder"]
-    DRIVE_SYNC_FOLDER = config["drive_sync_folder"]
-    YOUTUBE_PLAYLIST_ID = config["youtube_playlist_id"]
-    SEASON_START_DATE = config["season_start_date"]
-    SCOPES = config["scopes"]
-    YOUTUBE_PRIVACY = config["youtube_privacy"]
-    DEFAULT_DESCRIPTION = config["default_description"]
-    DEFAULT_TAGS = config["default_tags"]
-    DRY_RUN = config["dry_run"]
-    STABLE_WRITE_CHECKS = config["stable_write_checks"]
-    STABLE_WRITE_INTERVAL_SECONDS = config["stable_write_interval_seconds"]
-    MIN_FILE_AGE_SECONDS = config["min_file_age_seconds"]
-    IGNORE_PATTERNS = config["ignore_patterns"]
-    IGNORE_EXTENSIONS = config["ignore_extensions"]
-    PULL_TRACKER_PATH = config["pull_tracker_path"]
-    LOG_LEVEL = config["log_level"]
-    COMPRESSION_ENABLED = config["compression_enabled"]
-    COMPRESSION_PRESET = config["compression_preset"]
-    COMPRESSION_CRF = config["compression_crf"]
-    COMPRESSION_AUDIO_BITRATE = config["compression_audio_bitrate"]
-    COMPRESSION_MAX_WIDTH = config["compression_max_width"]
-    MAX_RETRIES = config["max_retries"]
-    RETRY_BACKOFF_SECONDS = config["retry_backoff_seconds"]
-    RETRY_BACKOFF_MULTIPLIER = config["retry_backoff_multiplier"]
-    RETRY_JITTER_SECONDS = config["retry_jitter_seconds"]
-    PENDING_UPLOADS_PATH = config["pending_uploads_path"]
-    LOG_FILE = config["log_file"]
-    LOG_MAX_BYTES = config["log_max_bytes"]
-    LOG_BACKUP_COUNT = config["log_backup_count"]
-    UPLOADED_TITLES_PATH = config["uploaded_titles_path"]
-    DELETE_AFTER_UPLOAD = config["delete_after_upload"]
-    DRIVE_SYNC_MODE = config["drive_sync_mode"]
-    DUPLICATE_GUARD_MODE = config["duplicate_guard_mode"]
-    COMPRESSION_KEEP_ORIGINAL = config["compression_keep_original"]
-    FAILED_FOLDER = config["failed_folder"]
-    MAX_UPLOADS_PER_RUN = config["max_uploads_per_run"]
-    TITLE_COLLISION_SUFFIX = config["title_collision_suffix"]
-    configure_logging()
-
-def authenticate_youtube():
+TRACER = Tracer()
+
+def build_local_youtube(root_url):
+    """YouTube client for a local stand-in API such as benchmark_uploader.py.
+
+    Rewrites rootUrl in the bundled discovery document, so resumable media
+    uploads go to the stand-in as well (api_endpoint alone only moves the
+    non-media calls). No OAuth is done; the stand-in doesn't check tokens.
+    """
+    document = json.loads(get_static_doc("youtube", "v3"))
+    root_url = root_url.rstrip("/") + "/"
+    document["rootUrl"] = root_url
+    document["mtlsRootUrl"] = root_url
+    return build_from_document(document, http=httplib2.Http(timeout=60),
+                               requestBuilder=_per_request_http())
+
+def _per_request_http(credentials=None, timeout=60):
+    """requestBuilder giving each API request its own connection.
+
+    Upload workers share one service object, and httplib2.Http isn't
+    thread-safe: concurrent uploads on it interleave and stall until timeout.
+    A resumable upload still reuses its connection across chunks.
+    """
+    def build_request(http, *args, **kwargs):
+        request_http = httplib2.Http(timeout=timeout)
+        # A resumable upload answers each non-final chunk with 308 and no
+        # Location; as in googleapiclient's build_http, that isn't a redirect.
+        request_http.redirect_codes = request_http.redirect_codes - {308}
+        if credentials is not None:
+            request_http = google_auth_httplib2.AuthorizedHttp(credentials, http=request_http)
+        return HttpRequest(request_http, *args, **kwargs)
+    return build_request
+
+def authenticate_youtube(config):
+    if config.youtube_api_root_url:
+        logging.warning("Using the YouTube API stand-in at %s", config.youtube_api_root_url)
+        return build_local_youtube(config.youtube_api_root_url)
     creds = None
     if os.path.exists("token.json"):
-        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
+        creds = Credentials.from_authorized_user_file("token.json", config.scopes)
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             creds.refresh(Request())
         else:
-            flow = InstalledAppFlow.from_client_secrets_file("credentials.json", SCOPES)
+            flow = InstalledAppFlow.from_client_secrets_file("credentials.json", config.scopes)
             creds = flow.run_local_server(port=0)
         with open("token.json", "w", encoding="utf-8") as token:
             token.write(creds.to_json())
-    return build("youtube", "v3", credentials=creds)
+    return build("youtube", "v3", credentials=creds, requestBuilder=_per_request_http(creds))
 
 def extract_context_from_filename(filename):
     """Extract context information from Warcraft Recorder filename.
@@ -462,21 +1093,19 @@ def save_pull_tracker(path, tracker):
     except OSError as exc:
         logging.warning("Failed to save pull tracker to %s: %s", path, exc)
 
-def get_raid_week(start_date=None):
+def get_raid_week(season_start_date):
     """Calculate raid week number from season start date.
 
     Args:
-        start_date: Season start date (defaults to SEASON_START_DATE config)
+        season_start_date: Season start date as YYYY-MM-DD (season_start_date config)
     Returns:
         Week number (W1, W2, etc.)
     """
-    if start_date is None:
-        # Use the configured season start date
-        try:
-            start_date = datetime.datetime.strptime(SEASON_START_DATE, "%Y-%m-%d").date()
-        except ValueError:
-            # Fallback to default if config is invalid
-            start_date = datetime.date(2024, 9, 1)
+    try:
+        start_date = datetime.datetime.strptime(season_start_date, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        # Fallback to default if config is invalid
+        start_date = datetime.date(2024, 9, 1)
 
     today = datetime.date.today()
     days_diff = (today - start_date).days
@@ -503,7 +1132,7 @@ def get_boss_pull_count(boss_name, date, pull_tracker):
     pull_tracker[boss_key] += 1
     return pull_tracker[boss_key]
 
-def make_nice_name(file_path, pull_tracker=None):
+def make_nice_name(file_path, season_start_date, pull_tracker=None):
     """Generate a context-aware filename with raid week, boss, and pull tracking.
 
     Format: RaidWeek_BossName_Pull#_Date_Time.mp4
@@ -519,7 +1148,7 @@ def make_nice_name(file_path, pull_tracker=None):
     record_time, context = extract_context_from_filename(filename)
 
     # Get raid week
-    raid_week = get_raid_week()
+    raid_week = get_raid_week(season_start_date)
 
     # Get pull count for this boss on this date
     pull_count = get_boss_pull_count(context, record_time.date(), pull_tracker)
@@ -534,47 +1163,975 @@ def make_nice_name(file_path, pull_tracker=None):
     logging.info("Renamed: %s -> %s", filename, new_name)
     return new_name
 
-def wait_for_file_stable(file_path):
-    """Wait until a file stops changing size/mtime for a few checks."""
-    stable_checks = 0
-    previous_size = -1
-    previous_mtime = -1
+NICE_NAME_RE = re.compile(r"^W\d+_.+_Pull\d+_[A-Za-z]{3}\d{2}_\d{2}-\d{2}[AP]M\.[^.]+$")
 
-    while stable_checks < STABLE_WRITE_CHECKS:
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(
-                "File disappeared before processing: %s" % file_path
+def is_nice_name(filename):
+    """True if filename already has the make_nice_name format (W1_Fo_Pull1_Sep03_10-16PM.mp4)."""
+    return NICE_NAME_RE.match(os.path.basename(filename)) is not None
+
+def create_youtube_title(filename):
+    """Create a descriptive YouTube title from the filename.
+
+    Format: WoW Raid - [Raid Week] [Boss Name] Pull #X - [Date] [Time]
+    Example: WoW Raid - W1 Fo Pull #1 - Sep 03 10:16 PM
+    """
+    try:
+        # Remove file extension
+        name = os.path.splitext(filename)[0]
+
+        # Split by underscores to get parts
+        parts = name.split('_')
+        if len(parts) >= 5:
+            raid_week = parts[0]  # W1
+            boss_name = parts[1]  # Fo
+            pull_info = parts[2]  # Pull1
+            date_str = parts[3]   # Sep03
+            time_str = parts[4]   # 10-16PM
+
+            # Format time for better readability
+            time_formatted = time_str.replace('-', ':').replace(
+                'PM', ' PM').replace('AM', ' AM')
+
+            # Format date for better readability
+            date_formatted = date_str.replace('Sep', 'September').replace(
+                'Oct', 'October').replace('Nov', 'November').replace(
+                'Dec', 'December')
+            date_formatted = date_formatted.replace('Jan', 'January').replace(
+                'Feb', 'February').replace('Mar', 'March').replace(
+                'Apr', 'April')
+            date_formatted = date_formatted.replace('May', 'May').replace(
+                'Jun', 'June').replace('Jul', 'July').replace(
+                'Aug', 'August')
+
+            # Add day number
+            if len(date_formatted) > 3:
+                day_num = date_formatted[3:]
+                month_name = date_formatted[:3]
+                date_formatted = f"{month_name} {day_num}"
+
+            return (
+                "WoW Raid - %s %s %s - %s %s"
+                % (raid_week, boss_name, pull_info, date_formatted, time_formatted)
             )
-        current_size = os.path.getsize(file_path)
-        current_mtime = os.path.getmtime(file_path)
-        current_age = time.time() - current_mtime
+    except (IndexError, ValueError) as exc:
+        logging.warning(
+            "Could not create YouTube title from %s: %s", filename, exc
+        )
 
-        is_stable = current_size == previous_size and current_mtime == previous_mtime
-        is_old_enough = current_age >= MIN_FILE_AGE_SECONDS
+    # Fallback to original filename
+    return filename
 
-        if is_stable and is_old_enough:
-            stable_checks += 1
+class _StabilityCheck:
+    """Counts consecutive stat results where a file is unchanged and old enough."""
+
+    def __init__(self, checks, min_age):
+        self.checks = checks
+        self.min_age = min_age
+        self.stable_checks = 0
+        self._previous = None
+
+    @property
+    def done(self):
+        return self.stable_checks >= self.checks
+
+    def observe(self, stat_result):
+        """Record one stat of the file; True once it has been stable long enough."""
+        current = (stat_result.st_size, stat_result.st_mtime)
+        is_old_enough = time.time() - stat_result.st_mtime >= self.min_age
+        if current == self._previous and is_old_enough:
+            self.stable_checks += 1
         else:
-            stable_checks = 0
+            self.stable_checks = 0
+        self._previous = current
+        return self.done
+
+def _stat_for_stability(file_path):
+    try:
+        return os.stat(file_path)
+    except FileNotFoundError:
+        raise FileNotFoundError("File disappeared before processing: %s" % file_path) from None
+
+def _observe_stability_wait(seconds):
+    METRICS.histogram(
+        "uploader_stability_wait_seconds", "Time spent waiting for a recording to stop changing"
+    ).observe(seconds)
 
-        previous_size = current_size
-        previous_mtime = current_mtime
-        time.sleep(STABLE_WRITE_INTERVAL_SECONDS)
+def wait_for_file_stable(file_path, checks, interval, min_age):
+    """Wait until a file stops changing size/mtime for a few checks.
 
-def should_ignore_file(file_path):
+    checks/interval/min_age are the stable_write_checks,
+    stable_write_interval_seconds and min_file_age_seconds settings; the
+    recorder simulator passes its own to compare several at once.
+    """
+    started = time.time()
+    check = _StabilityCheck(checks, min_age)
+    while not check.done:
+        if check.observe(_stat_for_stability(file_path)):
+            break
+        time.sleep(interval)
+    _observe_stability_wait(time.time() - started)
+
+async def wait_for_file_stable_async(file_path, pipeline_loop, executor, checks, interval, min_age):
+    """wait_for_file_stable as a coroutine on the pipeline loop.
+
+    The waits are loop sleeps and only the stat goes to executor (it can
+    block on network shares). Returns False if the pipeline started
+    closing before the file settled.
+    """
+    started = time.time()
+    check = _StabilityCheck(checks, min_age)
+    while not check.done:
+        stat_result = await pipeline_loop.run_blocking(executor, _stat_for_stability, file_path)
+        if check.observe(stat_result):
+            break
+        if not await pipeline_loop.sleep(interval):
+            return False
+    _observe_stability_wait(time.time() - started)
+    return True
+
+def should_ignore_file(file_path, patterns, extensions):
     filename = os.path.basename(file_path)
     _, ext = os.path.splitext(filename)
     lower_ext = ext.lower()
 
-    if lower_ext in [e.lower() for e in IGNORE_EXTENSIONS]:
+    if lower_ext in [e.lower() for e in extensions]:
         return True
 
-    for pattern in IGNORE_PATTERNS:
+    for pattern in patterns:
         if fnmatch.fnmatch(filename.lower(), pattern.lower()):
             return True
 
     return False
 
+class WatchRoot:
+    """A watched folder with its own ignore rules and playlist."""
+
+    def __init__(self, path, ignore_patterns, ignore_extensions, recursive=False, playlist_id=None):
+        self.path = os.path.abspath(path)
+        self.recursive = recursive
+        self.ignore_patterns = ignore_patterns
+        self.ignore_extensions = ignore_extensions
+        self.playlist_id = playlist_id
+
+    def contains(self, file_path):
+        parent = os.path.dirname(os.path.abspath(file_path))
+        if parent == self.path:
+            return True
+        if not self.recursive:
+            return False
+        try:
+            return os.path.commonpath([self.path, parent]) == self.path
+        except ValueError:
+            # Different drives on Windows.
+            return False
+
+    def accepts(self, file_path):
+        """Return True if file_path looks like a recording this root should process."""
+        lower_path = file_path.lower()
+        if not lower_path.endswith(".mp4") or lower_path.endswith(".compressed.mp4"):
+            return False
+        return not should_ignore_file(file_path, self.ignore_patterns, self.ignore_extensions)
+
+def _existing_volume_path(path):
+    """Return the nearest existing ancestor of path, for stat/disk_usage calls."""
+    probe = os.path.abspath(path)
+    while not os.path.exists(probe):
+        parent = os.path.dirname(probe)
+        if parent == probe:
+            break
+        probe = parent
+    return probe
+
+def estimate_job_footprint(file_path, size, config):
+    """Estimate the extra bytes a job writes per volume at its peak.
+
+    Returns {st_dev: [probe_path, bytes]}. The watch folder holds the
+    .backup copy and the .compressed output next to the original; Drive
+    needs a full copy in copy mode, or in move mode when it is on another
+    volume. An encode cache on another volume gets a copy of the output
+    (on the watch volume it is a hard link).
+    """
+    footprint = {}
+
+    def add(path, nbytes):
+        probe = _existing_volume_path(path)
+        device = os.stat(probe).st_dev
+        footprint.setdefault(device, [probe, 0])[1] += int(nbytes)
+        return device
+
+    watch_device = add(os.path.dirname(file_path), size)
+    if config.compression_enabled:
+        add(os.path.dirname(file_path), size * config.compression_size_ratio)
+        cache_dir = config.encode_cache_dir
+        if cache_dir and os.stat(_existing_volume_path(cache_dir)).st_dev != watch_device:
+            add(cache_dir, size * config.compression_size_ratio)
+    if config.drive_sync_folder:
+        drive_probe = _existing_volume_path(config.drive_sync_folder)
+        if config.drive_sync_mode == "copy" or os.stat(drive_probe).st_dev != watch_device:
+            add(config.drive_sync_folder, size)
+    return footprint
+
+class DiskAdmission:
+    """Hold jobs until every volume they write to has room for their peak footprint.
+
+    Admitted jobs keep a reservation until released, so concurrent jobs can't
+    jointly overcommit a volume. Free space is re-read with shutil.disk_usage
+    on each check; waiting jobs re-check when another job releases or every
+    poll_seconds for space freed outside the uploader.
+    """
+
+    def __init__(self, reserve_bytes=0, poll_seconds=60):
+        self.reserve_bytes = reserve_bytes or 0
+        self.poll_seconds = poll_seconds
+        self._cond = threading.Condition()
+        self._reservations = {}  # job key -> footprint
+        self._closed = False
+
+    def _shortfall_locked(self, footprint):
+        for device, (probe, needed) in footprint.items():
+            reserved = sum(
+                other[device][1]
+                for other in self._reservations.values()
+                if device in other
+            )
+            try:
+                free = shutil.disk_usage(probe).free
+            except OSError:
+                continue
+            missing = needed + reserved + self.reserve_bytes - free
+            if missing > 0:
+                return probe, missing
+        return None
+
+    def acquire(self, key, footprint):
+        """Block until footprint fits. Returns False if the pipeline is closing."""
+        warned = False
+        with self._cond:
+            while not self._closed:
+                shortfall = self._shortfall_locked(footprint)
+                if shortfall is None:
+                    self._reservations[key] = footprint
+                    return True
+                if not warned:
+                    logging.warning(
+                        "Holding %s until %.1f MB frees up on %s",
+                        key,
+                        shortfall[1] / (1024 * 1024),
+                        shortfall[0],
+                    )
+                    warned = True
+                self._cond.wait(self.poll_seconds)
+        return False
+
+    def release(self, key):
+        with self._cond:
+            if self._reservations.pop(key, None) is not None:
+                self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class JobScheduler:
+    """Priority queue for pipeline stages with a pluggable ordering policy.
+
+    Policies: fifo (arrival order), sjf (smallest file first) and newest
+    (most recent recording first). Each policy maps a job to a cost in seconds; the queue key is that cost minus
+    aging_factor seconds for every second the job has waited, so large or
+    low-priority files can't starve.
+    """
+
+    POLICIES = ("fifo", "sjf", "newest")
+
+    def __init__(self, policy="fifo", aging_factor=0.1, bytes_per_second=10_000_000, name=None):
+        if policy not in self.POLICIES:
+            logging.warning("Unknown schedule_policy %s; using fifo.", policy)
+            policy = "fifo"
+        self.policy = policy
+        self.aging_factor = aging_factor
+        self.bytes_per_second = max(1, bytes_per_second)
+        self.name = name
+        self._heap = []
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+
+    def cost(self, file_path, size):
+        """Return the policy cost of a file in seconds (lower runs first)."""
+        if self.policy == "sjf":
+            return size / self.bytes_per_second
+        if self.policy == "newest":
+            record_time, _ = extract_context_from_filename(os.path.basename(file_path))
+            return -record_time.timestamp()
+        return 0.0
+
+    def key(self, file_path, size, enqueued_at):
+        # cost - aging * (now - enqueued_at) orders the same as
+        # cost + aging * enqueued_at, so keys never need recomputing.
+        if self.policy == "fifo":
+            return enqueued_at
+        return self.cost(file_path, size) + self.aging_factor * enqueued_at
+
+    def push(self, job):
+        path = job["upload_path"] or job["file_path"]
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        key = self.key(job["file_path"], size, job["detected_at"])
+        with self._lock:
+            heapq.heappush(self._heap, (key, next(self._sequence), job))
+            self._report_depth()
+
+    def pop(self):
+        with self._lock:
+            if not self._heap:
+                return None
+            job = heapq.heappop(self._heap)[2]
+            self._report_depth()
+            return job
+
+    def _report_depth(self):
+        if self.name:
+            METRICS.gauge("uploader_queue_depth", "Jobs waiting for a worker, by stage").set(
+                len(self._heap), queue=self.name
+            )
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
+
+    def order(self, candidates, enqueued_at):
+        """Sort (path, stat) candidates from a scan, keeping mtime order on ties."""
+        ordered = sorted(candidates, key=lambda item: item[1].st_mtime)
+        return sorted(
+            ordered,
+            key=lambda item: self.key(item[0], item[1].st_size, enqueued_at),
+        )
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+class LeaseManager:
+    """Claim files across uploader nodes with lease files in a shared folder.
+
+    A node owns a file while <key>.lease exists with its token; it touches
+    the lease every heartbeat, and a lease not touched for ttl seconds can be
+    taken over by another node. Completion writes <key>.done, which is
+    created exclusively and never removed, so a file is uploaded at most
+    once however often it is claimed. Keys come from size and whole-second
+    mtime, which survive the rename and are the same from every node.
+    Staleness compares lease mtimes to the local clock, so keep the nodes'
+    clocks in sync (NTP) and ttl well above the heartbeat interval.
+    """
+
+    def __init__(self, lease_dir, node_id=None, ttl_seconds=120, heartbeat_seconds=30, on_expired=None):
+        self.lease_dir = os.path.abspath(lease_dir)
+        self.node_id = node_id or "%s-%d" % (socket.gethostname(), os.getpid())
+        self.ttl_seconds = ttl_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.on_expired = on_expired
+        self._held = {}  # key -> token
+        self._reported = set()  # (key, token) of expired leases already passed to on_expired
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(self.lease_dir, exist_ok=True)
+
+    @staticmethod
+    def key_for(stat_result):
+        return "%d-%d" % (stat_result.st_size, int(stat_result.st_mtime))
+
+    def _lease_path(self, key):
+        return os.path.join(self.lease_dir, key + ".lease")
+
+    def _done_path(self, key):
+        return os.path.join(self.lease_dir, key + ".done")
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                return json.load(handle)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def _create_exclusive(path, data):
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(data, handle)
+
+    def _expired(self, path):
+        try:
+            return time.time() - os.stat(path).st_mtime > self.ttl_seconds
+        except OSError:
+            return False
+
+    def is_done(self, key):
+        return os.path.exists(self._done_path(key))
+
+    def held_elsewhere(self, key):
+        """True if another node holds a live lease on key."""
+        if key in self._held:
+            return False
+        lease_path = self._lease_path(key)
+        return os.path.exists(lease_path) and not self._expired(lease_path)
+
+    def done_info(self, key):
+        return self._read(self._done_path(key))
+
+    def claim(self, key, name=None):
+        """Take the lease for key; False if it is done or held by a live node."""
+        if self.is_done(key):
+            return False
+        lease_path = self._lease_path(key)
+        data = {
+            "node": self.node_id,
+            "token": os.urandom(8).hex(),
+            "path": name,
+            "claimed_at": datetime.datetime.now().isoformat(),
+        }
+        for _ in range(2):
+            try:
+                self._create_exclusive(lease_path, data)
+            except FileExistsError:
+                if not self._expired(lease_path) or not self._take_over(lease_path):
+                    return False
+                continue
+            if self.is_done(key):  # completed between our check and the claim
+                os.remove(lease_path)
+                return False
+            with self._lock:
+                self._held[key] = data["token"]
+            return True
+        return False
+
+    def _take_over(self, lease_path):
+        """Remove an expired lease, unless another node refreshed or replaced it meanwhile."""
+        stale = self._read(lease_path)
+        grave = "%s.%s.expired" % (lease_path, self.node_id)
+        try:
+            os.rename(lease_path, grave)
+        except OSError:
+            return False
+        moved = self._read(grave)
+        if moved != stale or not self._expired(grave):
+            # We moved a lease someone else just took; give it back.
+            try:
+                os.rename(grave, lease_path)
+            except OSError:
+                pass
+            return False
+        logging.warning("Reclaiming expired lease from node %s: %s", (stale or {}).get("node"), lease_path)
+        os.remove(grave)
+        return True
+
+    def update(self, key, name):
+        """Record the file's new name (after renaming) in a lease we hold."""
+        with self._lock:
+            token = self._held.get(key)
+        if token is None:
+            return
+        data = self._read(self._lease_path(key)) or {}
+        if data.get("token") != token:
+            return
+        data["path"] = name
+        temp_path = "%s.%s.tmp" % (self._lease_path(key), self.node_id)
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(data, handle)
+        os.replace(temp_path, self._lease_path(key))
+
+    def confirm(self, key):
+        """True if we still hold key and nobody has completed it."""
+        with self._lock:
+            token = self._held.get(key)
+        if token is None or self.is_done(key):
+            return False
+        data = self._read(self._lease_path(key))
+        return bool(data) and data.get("token") == token
+
+    def complete(self, key, info=None):
+        """Mark key done (idempotently) and drop the lease; False if already done."""
+        record = dict(info or {})
+        record.update({"node": self.node_id, "completed_at": datetime.datetime.now().isoformat()})
+        try:
+            self._create_exclusive(self._done_path(key), record)
+            created = True
+        except FileExistsError:
+            logging.warning("Lease %s was already completed by node %s.", key, (self.done_info(key) or {}).get("node"))
+            created = False
+        self.release(key)
+        return created
+
+    def release(self, key):
+        with self._lock:
+            token = self._held.pop(key, None)
+        if token is None:
+            return
+        data = self._read(self._lease_path(key))
+        if data and data.get("token") == token:
+            try:
+                os.remove(self._lease_path(key))
+            except OSError:
+                pass
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            keys = list(self._held)
+        for key in keys:
+            self.release(key)
+
+    def _run(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            self._heartbeat()
+            if self.on_expired is not None:
+                self._report_expired()
+
+    def _heartbeat(self):
+        with self._lock:
+            held = list(self._held.items())
+        for key, token in held:
+            lease_path = self._lease_path(key)
+            data = self._read(lease_path)
+            if not data or data.get("token") != token:
+                logging.warning("Lost lease %s to another node.", key)
+                with self._lock:
+                    self._held.pop(key, None)
+                continue
+            try:
+                os.utime(lease_path)
+            except OSError as exc:
+                logging.warning("Failed to renew lease %s: %s", key, exc)
+
+    def _report_expired(self):
+        """Hand expired leases of crashed nodes to on_expired so they get re-run."""
+        try:
+            names = os.listdir(self.lease_dir)
+        except OSError as exc:
+            logging.warning("Failed to list lease folder: %s", exc)
+            return
+        for name in names:
+            if not name.endswith(".lease"):
+                continue
+            key = name[:-len(".lease")]
+            lease_path = os.path.join(self.lease_dir, name)
+            with self._lock:
+                if key in self._held:
+                    continue
+            if not self._expired(lease_path):
+                continue
+            data = self._read(lease_path)
+            if not data or (key, data.get("token")) in self._reported:
+                continue
+            self._reported.add((key, data.get("token")))
+            self.on_expired(data)
+
+class PipelineLoop:
+    """An asyncio event loop, on its own thread, for everything the pipeline waits on.
+
+    Stability polling, retry backoff, upload slots and delayed retries are
+    coroutines or timers here, so a file that is only waiting costs a
+    coroutine rather than a pool thread. Blocking work (stat on network
+    shares, Google API calls, ffmpeg, copies) still runs on the context's
+    thread pools through run_blocking.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._closing = None
+        self._closing_flag = False
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="pipeline-loop", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self._closing = asyncio.Event()
+        self._ready.set()
+        self.loop.run_forever()
+
+    @property
+    def closing(self):
+        return self._closing_flag
+
+    def spawn(self, coro):
+        """Run coro on the loop from any thread; RuntimeError once closing."""
+        if self._closing_flag:
+            coro.close()
+            raise RuntimeError("Pipeline loop is closing")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_later(self, delay, callback, *args):
+        """Thread-safe loop.call_later; dropped once the loop is closing."""
+        if not self._closing_flag:
+            self.loop.call_soon_threadsafe(self.loop.call_later, delay, callback, *args)
+
+    async def run_blocking(self, executor, fn, *args, track=None):
+        """Await fn(*args) on executor, tracing into track if given."""
+        def call():
+            if track is not None:
+                TRACER.set_track(track)
+            return fn(*args)
+        return await self.loop.run_in_executor(executor, call)
+
+    async def sleep(self, delay):
+        """Sleep for delay seconds; False if the pipeline started closing meanwhile."""
+        if self._closing.is_set():
+            return False
+        try:
+            await asyncio.wait_for(self._closing.wait(), delay)
+        except asyncio.TimeoutError:
+            return True
+        return False
+
+    async def acquire(self, semaphore):
+        """Take a semaphore slot; False, holding nothing, if the pipeline closes first."""
+        if self._closing.is_set():
+            return False
+        slot = asyncio.ensure_future(semaphore.acquire())
+        closing = asyncio.ensure_future(self._closing.wait())
+        await asyncio.wait({slot, closing}, return_when=asyncio.FIRST_COMPLETED)
+        closing.cancel()
+        if not slot.done():
+            slot.cancel()
+            return False
+        if self._closing.is_set():
+            semaphore.release()
+            return False
+        return True
+
+    def begin_close(self):
+        """Refuse new coroutines and wake every sleep and slot wait with False."""
+        if self._closing_flag:
+            return
+        self._closing_flag = True
+        self.loop.call_soon_threadsafe(self._closing.set)
+
+    def close(self):
+        """begin_close, let running coroutines wind down, then stop the loop."""
+        self.begin_close()
+        if not self._thread.is_alive():
+            return
+
+        async def drain():
+            current = asyncio.current_task()
+            tasks = [task for task in asyncio.all_tasks() if task is not current]
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(drain(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+class PipelineContext:
+    """Watch roots, settings and the worker pools shared by all roots.
+
+    Every root feeds the same stability, compression and upload pools, so a
+    single process can cover several recorders and their category subfolders.
+    Settings come from config; the context passes it, or single values from
+    it, to the helpers that do the work. The encode governor and encode
+    cache live here too, since they hold state shared by every encode.
+    """
+
+    def __init__(self, roots, config=None):
+        self.roots = roots
+        self.config = config or PipelineConfig()
+        stability_workers = max(1, self.config.stability_workers or 1)
+        compression_workers = max(1, self.config.compression_workers or 1)
+        upload_workers = max(1, self.config.upload_workers or 1)
+        self.admission = DiskAdmission(
+            self.config.disk_reserve_bytes, poll_seconds=self.config.disk_retry_seconds
+        )
+        self.prepare_queue = self.make_scheduler("prepare")
+        self.upload_queue = self.make_scheduler("upload")
+        self.drive_sync = DriveSyncEngine(self.config.drive_sync_workers, self.config.drive_copy_chunk_bytes)
+        self.encode_governor = EncodeGovernor(self.config)
+        self.encode_cache = EncodeCache(self.config)
+        self.stability_pool = ThreadPoolExecutor(
+            max_workers=stability_workers, thread_name_prefix="stability"
+        )
+        self.compression_pool = ThreadPoolExecutor(
+            max_workers=compression_workers, thread_name_prefix="compression"
+        )
+        self.upload_pool = ThreadPoolExecutor(
+            max_workers=upload_workers, thread_name_prefix="upload"
+        )
+        self.compression_workers = compression_workers
+        self.upload_workers = upload_workers
+        self.loop = PipelineLoop()
+        self.leases = None
+        if self.config.lease_dir:
+            self.leases = LeaseManager(
+                self.config.lease_dir,
+                node_id=self.config.node_id,
+                ttl_seconds=self.config.lease_ttl_seconds,
+                heartbeat_seconds=self.config.lease_heartbeat_seconds,
+            )
+            self.leases.start()
+
+    @classmethod
+    def from_config(cls, config):
+        settings = PipelineConfig(config)
+        roots = []
+        for entry in settings.watch_roots or []:
+            if isinstance(entry, str):
+                entry = {"path": entry}
+            if not isinstance(entry, dict) or not entry.get("path"):
+                continue
+            # Roots without their own ignore rules use the global ones.
+            patterns = entry.get("ignore_patterns")
+            extensions = entry.get("ignore_extensions")
+            roots.append(WatchRoot(
+                entry["path"],
+                settings.ignore_patterns if patterns is None else patterns,
+                settings.ignore_extensions if extensions is None else extensions,
+                recursive=entry.get("recursive", True),
+                playlist_id=entry.get("playlist_id"),
+            ))
+        if not roots:
+            roots.append(WatchRoot(
+                settings.watch_folder,
+                settings.ignore_patterns,
+                settings.ignore_extensions,
+                recursive=bool(settings.watch_recursive),
+            ))
+        return cls(roots, settings)
+
+    def make_scheduler(self, name=None):
+        return JobScheduler(
+            self.config.schedule_policy,
+            aging_factor=self.config.schedule_aging_factor,
+            bytes_per_second=self.config.schedule_bytes_per_second,
+            name=name,
+        )
+
+    def root_for(self, file_path):
+        """Return the most specific root containing file_path, or None."""
+        matches = [root for root in self.roots if root.contains(file_path)]
+        if not matches:
+            return None
+        return max(matches, key=lambda root: len(root.path))
+
+    def shutdown(self):
+        self.admission.close()
+        self.loop.begin_close()
+        # Running prepares finish; the uploads they hand off go to the pending queue.
+        self.compression_pool.shutdown(wait=True, cancel_futures=True)
+        self.loop.close()
+        for pool in (self.stability_pool, self.upload_pool):
+            pool.shutdown(wait=True, cancel_futures=True)
+        self.drive_sync.shutdown()
+        if self.leases is not None:
+            self.leases.close()
+
+class SnapshotObserver:
+    """Polling observer for network shares where native events don't fire.
+
+    Emits the same watchdog events as Observer. Each tick stats every known
+    directory once and only re-lists those whose mtime changed; files are
+    compared by (inode, size, mtime). Files that changed recently stay "hot"
+    and are re-stat'ed every tick, and a full re-list runs every
+    full_scan_seconds for shares that don't update directory mtimes. The
+    interval drops to min_interval while anything is changing and doubles
+    towards max_interval while idle.
+    """
+
+    def __init__(self, min_interval=1.0, max_interval=30.0, full_scan_seconds=300.0, hot_seconds=60.0):
+        self.min_interval = max(0.05, float(min_interval))
+        self.max_interval = max(self.min_interval, float(max_interval))
+        self.full_scan_seconds = full_scan_seconds
+        self.hot_seconds = hot_seconds
+        self.interval = self.min_interval
+        self._watches = []
+        self._hot = {}  # path -> time of last observed change
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="snapshot-observer", daemon=True)
+        self._last_full_scan = 0.0
+
+    def schedule(self, event_handler, path, recursive=False):
+        self._watches.append({
+            "handler": event_handler,
+            "path": os.path.abspath(path),
+            "recursive": recursive,
+            "dirs": {},  # dir path -> {"mtime": ns, "entries": {name: (inode, size, mtime_ns, is_dir)}}
+        })
+
+    def start(self):
+        for watch in self._watches:
+            self._poll_watch(watch, full=True, emit=False)
+        self._last_full_scan = time.monotonic()
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def join(self, timeout=None):
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            now = time.monotonic()
+            full = now - self._last_full_scan >= self.full_scan_seconds
+            if full:
+                self._last_full_scan = now
+            changed = False
+            for watch in self._watches:
+                try:
+                    changed = self._poll_watch(watch, full=full) or changed
+                except OSError as exc:
+                    logging.warning("Polling %s failed: %s", watch["path"], exc)
+            if changed or self._hot:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * 2, self.max_interval)
+
+    def _poll_watch(self, watch, full=False, emit=True):
+        """Refresh one watch's snapshot and dispatch events. Returns True on change."""
+        dirs = watch["dirs"]
+        created, deleted, modified = [], [], []
+        visited = set()
+        stack = [watch["path"]]
+        while stack:
+            folder = stack.pop()
+            visited.add(folder)
+            try:
+                dir_mtime = os.stat(folder).st_mtime_ns
+            except OSError:
+                continue
+            state = dirs.get(folder)
+            if state is None or full or state["mtime"] != dir_mtime:
+                old_entries = state["entries"] if state else {}
+                entries = self._list_dir(folder, old_entries, full)
+                self._diff(folder, old_entries, entries, created, deleted, modified)
+                state = {"mtime": dir_mtime, "entries": entries}
+                dirs[folder] = state
+            else:
+                self._restat_hot(folder, state["entries"], modified)
+            if watch["recursive"]:
+                for name, info in state["entries"].items():
+                    if info[3]:
+                        stack.append(os.path.join(folder, name))
+        for folder in [path for path in dirs if path not in visited]:
+            del dirs[folder]
+
+        if not emit:
+            self._hot.clear()
+            return False
+        events = self._pair_moves(created, deleted) + modified
+        for event in events:
+            watch["handler"].dispatch(event)
+        return bool(events)
+
+    def _list_dir(self, folder, old_entries, full):
+        entries = {}
+        with os.scandir(folder) as iterator:
+            for entry in iterator:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        entries[entry.name] = (entry.inode(), 0, 0, True)
+                        continue
+                    previous = old_entries.get(entry.name)
+                    # Unchanged names keep their old stat; hot files and full
+                    # scans are re-stat'ed, so a 10k-entry folder costs one
+                    # listing rather than 10k stat calls per change.
+                    if (previous is not None and not full and previous[0] == entry.inode()
+                            and entry.path not in self._hot):
+                        entries[entry.name] = previous
+                        continue
+                    stat_result = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                entries[entry.name] = (
+                    entry.inode() or stat_result.st_ino,
+                    stat_result.st_size,
+                    stat_result.st_mtime_ns,
+                    False,
+                )
+        return entries
+
+    def _diff(self, folder, old_entries, entries, created, deleted, modified):
+        now = time.monotonic()
+        for name, info in entries.items():
+            path = os.path.join(folder, name)
+            previous = old_entries.get(name)
+            if previous is None:
+                created.append((path, info))
+                if not info[3]:
+                    self._hot[path] = now
+            elif not info[3] and previous != info:
+                modified.append(FileModifiedEvent(path))
+                self._hot[path] = now
+        for name, info in old_entries.items():
+            if name not in entries:
+                path = os.path.join(folder, name)
+                deleted.append((path, info))
+                self._hot.pop(path, None)
+
+    def _restat_hot(self, folder, entries, modified):
+        now = time.monotonic()
+        prefix = folder + os.sep
+        for path in [p for p in self._hot if p.startswith(prefix) and os.sep not in p[len(prefix):]]:
+            name = os.path.basename(path)
+            previous = entries.get(name)
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                continue
+            info = (previous[0] if previous else stat_result.st_ino,
+                    stat_result.st_size, stat_result.st_mtime_ns, False)
+            if previous is not None and previous != info:
+                entries[name] = info
+                modified.append(FileModifiedEvent(path))
+                self._hot[path] = now
+            elif now - self._hot[path] >= self.hot_seconds:
+                del self._hot[path]
+
+    @staticmethod
+    def _pair_moves(created, deleted):
+        """Fold a delete and a create of the same inode into one moved event."""
+        deleted_by_inode = {info[0]: (path, info) for path, info in deleted if info[0]}
+        events = []
+        for path, info in created:
+            source = deleted_by_inode.pop(info[0], None) if info[0] else None
+            if source is not None:
+                move_cls = DirMovedEvent if info[3] else FileMovedEvent
+                events.append(move_cls(source[0], path))
+            else:
+                events.append(DirCreatedEvent(path) if info[3] else FileCreatedEvent(path))
+        for path, info in deleted_by_inode.values():
+            events.append(DirDeletedEvent(path) if info[3] else FileDeletedEvent(path))
+        for path, info in deleted:
+            if not info[0]:
+                events.append(DirDeletedEvent(path) if info[3] else FileDeletedEvent(path))
+        return events
+
+def build_observer(config):
+    if config.observer_mode == "polling":
+        return SnapshotObserver(
+            min_interval=config.poll_min_interval_seconds,
+            max_interval=config.poll_max_interval_seconds,
+            full_scan_seconds=config.poll_full_scan_seconds,
+        )
+    return Observer()
+
 def build_upload_request(title, description, tags, privacy_status):
     return {
         "snippet": {
@@ -591,30 +2148,514 @@ def build_upload_request(title, description, tags, privacy_status):
 def _ffmpeg_available():
     return shutil.which("ffmpeg") is not None
 
-def _build_ffmpeg_command(input_path, output_path):
+def running_process_names():
+    """Lower-cased names of running processes (psutil, tasklist, /proc or ps)."""
+    if psutil is not None:
+        names = set()
+        for proc in psutil.process_iter(["name"]):
+            if proc.info.get("name"):
+                names.add(proc.info["name"].lower())
+        return names
+    if os.name == "nt":
+        result = subprocess.run(["tasklist", "/FO", "CSV", "/NH"], capture_output=True, text=True, check=True)
+        return {line.split('","')[0].strip('"').lower() for line in result.stdout.splitlines() if line}
+    if os.path.isdir("/proc"):
+        names = set()
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit():
+                continue
+            try:
+                with open(os.path.join("/proc", pid, "comm"), "r", encoding="utf-8", errors="replace") as handle:
+                    names.add(handle.read().strip().lower())
+            except OSError:
+                continue
+        return names
+    result = subprocess.run(["ps", "-A", "-o", "comm="], capture_output=True, text=True, check=True)
+    return {os.path.basename(line.strip()).lower() for line in result.stdout.splitlines() if line.strip()}
+
+class EncodeStalled(subprocess.SubprocessError):
+    """Raised when an encode stops making progress and is killed."""
+
+class FfmpegProgress:
+    """Live state of one ffmpeg run, read from -progress pipe:1 and stderr.
+
+    Reader threads parse the key=value blocks ffmpeg writes about twice a
+    second into output time, speed and ETA, and keep the last
+    encode_stderr_lines lines of stderr for failure reports.
+    """
+
+    def __init__(self, config, duration=None):
+        self.duration = duration
+        self.out_seconds = 0.0
+        self.speed = None
+        self.stderr = deque(maxlen=config.encode_stderr_lines)
+        self.last_advance = time.monotonic()
+        self.limiter = ProgressLogLimiter(config.progress_log_seconds, config.progress_log_percent)
+
+    def read_progress(self, stream):
+        fields = {}
+        for line in stream:
+            key, sep, value = line.strip().partition("=")
+            if not sep:
+                continue
+            if key != "progress":
+                fields[key] = value
+                continue
+            self._update(fields)
+            fields = {}
+
+    def _update(self, fields):
+        # out_time_ms is in microseconds too (an old ffmpeg naming bug).
+        try:
+            out_seconds = int(fields.get("out_time_us") or fields.get("out_time_ms")) / 1e6
+        except (TypeError, ValueError):
+            out_seconds = None
+        if out_seconds is not None and out_seconds > self.out_seconds:
+            self.out_seconds = out_seconds
+            self.last_advance = time.monotonic()
+        try:
+            self.speed = float(fields.get("speed", "").rstrip("x"))
+        except ValueError:
+            pass
+
+    def read_stderr(self, stream):
+        for line in stream:
+            line = line.rstrip()
+            if line:
+                self.stderr.append(line)
+
+    def percent(self):
+        if not self.duration:
+            return None
+        return min(100, int(self.out_seconds * 100 / self.duration))
+
+    def eta_seconds(self):
+        if not self.duration or not self.speed:
+            return None
+        return max(0.0, (self.duration - self.out_seconds) / self.speed)
+
+    def stalled_for(self):
+        return time.monotonic() - self.last_advance
+
+    def restart_clock(self):
+        """Don't count time the encode was paused as a stall."""
+        self.last_advance = time.monotonic()
+
+    def tail(self):
+        return "\n".join(self.stderr)
+
+    def report(self, label):
+        percent = self.percent()
+        eta = self.eta_seconds()
+        worker = threading.current_thread().name
+        if self.speed is not None:
+            METRICS.gauge("uploader_encode_speed_ratio", "Current encode speed (x realtime)").set(self.speed, worker=worker)
+        if eta is not None:
+            METRICS.gauge("uploader_encode_eta_seconds", "Estimated seconds left in the current encode").set(eta, worker=worker)
+        if not self.limiter.should_log(percent or 0):
+            return
+        logging.info(
+            "Encode progress %s: %s at %sx, ETA %s", label,
+            "%d%%" % percent if percent is not None else "%ds" % self.out_seconds,
+            "%.2f" % self.speed if self.speed is not None else "?",
+            "%ds" % eta if eta is not None else "?",
+            extra={"event": "encode_progress", "file": label, "percent": percent,
+                   "speed": self.speed, "eta_seconds": eta},
+        )
+
+class EncodeGovernor:
+    """Keep ffmpeg encodes from taking CPU away from the game.
+
+    Encodes start at low priority. While a game_process_names process is
+    running (or other processes use more than encode_max_cpu_percent of the
+    CPU) they are paused with SIGSTOP/SIGCONT (psutil suspend/resume on
+    Windows), or with encode_game_action "throttle", only allowed to run
+    encode_throttle_percent of each second. The process list is shared
+    between encodes and refreshed at most every governor_poll_seconds.
+    """
+
+    THROTTLE_PERIOD_SECONDS = 1.0
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._game_checked_at = None
+        self._game_running = None
+        self._warned = set()
+
+    def _warn_once(self, key, message, *args):
+        if key not in self._warned:
+            self._warned.add(key)
+            logging.warning(message, *args)
+
+    def popen_kwargs(self):
+        if self.config.encode_low_priority and os.name == "nt":
+            return {"creationflags": subprocess.BELOW_NORMAL_PRIORITY_CLASS}
+        return {}
+
+    def lower_priority(self, proc):
+        if not self.config.encode_low_priority or os.name == "nt":
+            return
+        try:
+            os.setpriority(os.PRIO_PROCESS, proc.pid, 19)
+        except (AttributeError, OSError) as exc:
+            self._warn_once("nice", "Could not lower encode priority: %s", exc)
+
+    def game_running(self):
+        if not self.config.game_process_names or self.config.encode_game_action == "ignore":
+            return None
+        with self._lock:
+            now = time.monotonic()
+            if self._game_checked_at is not None and now - self._game_checked_at < self.config.governor_poll_seconds:
+                return self._game_running
+            self._game_checked_at = now
+            try:
+                running = running_process_names()
+            except (OSError, subprocess.SubprocessError) as exc:
+                self._warn_once("ps", "Could not list processes to look for the game: %s", exc)
+                self._game_running = None
+                return None
+            names = self.config.game_process_names
+            self._game_running = next((name for name in names if name.lower() in running), None)
+            return self._game_running
+
+    def _other_cpu_percent(self, encoder):
+        """System CPU use minus the encode's own, or None without psutil."""
+        if encoder is None:
+            return None
+        try:
+            total = psutil.cpu_percent(interval=None)
+            own = encoder.cpu_percent(interval=None) / (psutil.cpu_count() or 1)
+        except psutil.Error:
+            return None
+        return max(0.0, total - own)
+
+    def yield_reason(self, encoder, paused):
+        game = self.game_running()
+        if game:
+            return "%s is running" % game
+        if self.config.encode_max_cpu_percent is not None:
+            other = self._other_cpu_percent(encoder)
+            # Resume a little below the limit so the encode doesn't flap.
+            limit = self.config.encode_max_cpu_percent * (0.8 if paused else 1.0)
+            if other is not None and other > limit:
+                return "CPU at %d%%" % other
+        return None
+
+    def _set_suspended(self, proc, encoder, suspended):
+        errors = (OSError, psutil.Error) if psutil is not None else (OSError,)
+        try:
+            if encoder is not None:
+                if suspended:
+                    encoder.suspend()
+                else:
+                    encoder.resume()
+            elif hasattr(signal, "SIGSTOP"):
+                os.kill(proc.pid, signal.SIGSTOP if suspended else signal.SIGCONT)
+            else:
+                self._warn_once("suspend", "Install psutil to pause encodes while the game runs; using low priority only.")
+                return False
+        except errors as exc:
+            # The encode exited between polls.
+            logging.debug("Could not %s encode: %s", "pause" if suspended else "resume", exc)
+            return False
+        return True
+
+    def run(self, cmd, label=None, progress=None, cancel=None):
+        """Run cmd to completion under the governor; returns (returncode, seconds paused).
+
+        With an FfmpegProgress (cmd must include -progress pipe:1), progress
+        is reported as it comes and an encode with no progress for
+        encode_stall_seconds, not counting pauses, is killed with EncodeStalled.
+        Setting the cancel event kills the encode; returncode is then None.
+        """
+        if progress is None:
+            proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **self.popen_kwargs())
+            readers = []
+        else:
+            proc = subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                text=True, encoding="utf-8", errors="replace", **self.popen_kwargs()
+            )
+            readers = [
+                threading.Thread(target=progress.read_progress, args=(proc.stdout,), daemon=True),
+                threading.Thread(target=progress.read_stderr, args=(proc.stderr,), daemon=True),
+            ]
+            for reader in readers:
+                reader.start()
+        self.lower_priority(proc)
+        encoder = None
+        if psutil is not None:
+            try:
+                encoder = psutil.Process(proc.pid)
+            except psutil.Error:
+                encoder = None
+        label = label or cmd[-1]
+        stall_seconds = self.config.encode_stall_seconds
+        suspended = False
+        paused_seconds = 0.0
+        reason = None
+        try:
+            while True:
+                new_reason = self.yield_reason(encoder, suspended)
+                if new_reason and not reason:
+                    logging.info("Encode of %s yielding (%s; %s).", label, new_reason, self.config.encode_game_action)
+                    METRICS.counter("uploader_encode_pauses_total", "Times an encode yielded to the game or CPU load").inc()
+                elif reason and not new_reason:
+                    logging.info("Encode of %s resumed.", label)
+                reason = new_reason
+
+                step = self.config.governor_poll_seconds
+                want_suspended = False
+                if reason and self.config.encode_game_action == "throttle":
+                    # Duty cycle: run for the throttle share of each period.
+                    want_suspended = not suspended
+                    throttle = self.config.encode_throttle_percent
+                    share = (100 - throttle if want_suspended else throttle) / 100.0
+                    step = self.THROTTLE_PERIOD_SECONDS * share
+                elif reason:
+                    want_suspended = True
+                if want_suspended != suspended and self._set_suspended(proc, encoder, want_suspended):
+                    suspended = want_suspended
+
+                step_started = time.monotonic()
+                try:
+                    returncode = proc.wait(timeout=step)
+                except subprocess.TimeoutExpired:
+                    returncode = None
+                if suspended:
+                    paused_seconds += time.monotonic() - step_started
+                if returncode is not None or (cancel is not None and cancel.is_set()):
+                    break
+                if progress is None:
+                    continue
+                if suspended:
+                    progress.restart_clock()
+                elif stall_seconds and progress.stalled_for() > stall_seconds:
+                    raise EncodeStalled("Encode of %s made no progress for %ds" % (label, stall_seconds))
+                progress.report(label)
+        finally:
+            if proc.poll() is None:
+                if suspended:
+                    self._set_suspended(proc, encoder, False)
+                proc.kill()
+                proc.wait()
+            for reader in readers:
+                reader.join(timeout=5)
+        if paused_seconds:
+            METRICS.counter("uploader_encode_paused_seconds_total", "Seconds encodes spent paused for the game").inc(
+                paused_seconds
+            )
+        return returncode, paused_seconds
+
+def _faster_preset(preset):
+    """Two x264 presets faster than preset (ultrafast stays ultrafast)."""
+    if preset not in X264_PRESETS:
+        return "veryfast"
+    return X264_PRESETS[max(0, X264_PRESETS.index(preset) - 2)]
+
+def _build_ffmpeg_command(input_path, output_path, config, preset=None, fragmented=False):
     cmd = [
         "ffmpeg",
         "-y",
+        "-nostats",
+        "-progress",
+        "pipe:1",
         "-i",
         input_path,
         "-c:v",
         "libx264",
         "-preset",
-        str(COMPRESSION_PRESET),
+        str(preset or config.compression_preset),
         "-crf",
-        str(COMPRESSION_CRF),
+        str(config.compression_crf),
         "-c:a",
         "aac",
         "-b:a",
-        str(COMPRESSION_AUDIO_BITRATE),
+        str(config.compression_audio_bitrate),
     ]
-    if COMPRESSION_MAX_WIDTH:
-        cmd += ["-vf", f"scale='min({COMPRESSION_MAX_WIDTH},iw)':-2"]
+    if config.compression_max_width:
+        cmd += ["-vf", f"scale='min({config.compression_max_width},iw)':-2"]
+    if config.encode_threads:
+        cmd += ["-threads", str(config.encode_threads)]
+    if fragmented:
+        # A moof+mdat per keyframe, each written whole and never revisited,
+        # so the file can be uploaded while it grows.
+        cmd += ["-movflags", "+frag_keyframe+empty_moov+default_base_moof"]
     cmd.append(output_path)
     return cmd
 
-def compress_video(input_path):
-    if not COMPRESSION_ENABLED:
+def _link_or_copy(src_path, dst_path):
+    """Hard-link src_path to dst_path, copying when they are on different volumes."""
+    if os.path.exists(dst_path):
+        os.remove(dst_path)
+    try:
+        os.link(src_path, dst_path)
+    except OSError:
+        copy_file_fast(src_path, dst_path)
+
+class EncodeCache:
+    """Finished encodes kept so retries and re-runs don't encode again.
+
+    Entries are named by a fingerprint of the source (size plus its first
+    and last MiB) and a hash of the ffmpeg settings, so a changed preset or
+    CRF gets its own entry and switching back reuses the old one. They are
+    hard links to the .compressed output where possible, so the job can
+    delete its copy as usual. Hits refresh an entry's mtime, and once the
+    folder is over encode_cache_max_bytes the least recently used entries
+    are dropped.
+
+    A source whose encode stalled gets a small .preset hint naming the
+    faster preset it was retried with, so later runs start there instead
+    of stalling again. The encode itself is only stored under the settings
+    that produced it.
+    """
+
+    SAMPLE_BYTES = 1024 * 1024
+    SUFFIX = ".encode"
+    HINT_SUFFIX = ".preset"
+
+    def __init__(self, config):
+        self.config = config
+
+    def enabled(self):
+        return bool(self.config.encode_cache_dir)
+
+    @classmethod
+    def source_fingerprint(cls, path):
+        size = os.path.getsize(path)
+        digest = hashlib.sha256(str(size).encode("ascii"))
+        with open(path, "rb") as handle:
+            digest.update(handle.read(cls.SAMPLE_BYTES))
+            if size > cls.SAMPLE_BYTES:
+                handle.seek(max(cls.SAMPLE_BYTES, size - cls.SAMPLE_BYTES))
+                digest.update(handle.read(cls.SAMPLE_BYTES))
+        return digest.hexdigest()[:32]
+
+    @staticmethod
+    def settings_hash(cmd):
+        """Hash of the ffmpeg arguments that shape the output.
+
+        Leaves out the input/output paths and -threads, which the governor
+        may change between runs without changing what comes out.
+        """
+        args = []
+        skip = 0
+        for arg in cmd[1:-1]:
+            if skip:
+                skip -= 1
+                continue
+            if arg in ("-i", "-threads"):
+                skip = 1
+                continue
+            args.append(arg)
+        return hashlib.sha256(json.dumps(args).encode("utf-8")).hexdigest()[:16]
+
+    def key_for(self, fingerprint, cmd):
+        return "%s-%s" % (fingerprint, self.settings_hash(cmd))
+
+    def _entry_path(self, key):
+        return os.path.join(self.config.encode_cache_dir, key + self.SUFFIX)
+
+    def _hint_path(self, fingerprint):
+        return os.path.join(self.config.encode_cache_dir, fingerprint + self.HINT_SUFFIX)
+
+    def start_preset(self, fingerprint):
+        """Preset an earlier stall moved this source to, or None."""
+        try:
+            with open(self._hint_path(fingerprint), encoding="utf-8") as handle:
+                preset = handle.read().strip()
+        except OSError:
+            return None
+        return preset if preset in X264_PRESETS else None
+
+    def remember_stall(self, fingerprint, preset):
+        """Have later encodes of this source start at preset."""
+        hint_path = self._hint_path(fingerprint)
+        try:
+            os.makedirs(self.config.encode_cache_dir, exist_ok=True)
+            with open(hint_path + ".tmp", "w", encoding="utf-8") as handle:
+                handle.write(preset)
+            os.replace(hint_path + ".tmp", hint_path)
+        except OSError as exc:
+            logging.warning("Could not record the stalled preset for %s: %s", fingerprint, exc)
+
+    def entry_size(self, key):
+        """Size of the cached encode for key; OSError if there is none."""
+        return os.path.getsize(self._entry_path(key))
+
+    def fetch(self, key, output_path):
+        """Put the cached encode for key at output_path; False on a miss."""
+        entry_path = self._entry_path(key)
+        if not os.path.exists(entry_path):
+            METRICS.counter("uploader_encode_cache_misses_total", "Encodes not found in the encode cache").inc()
+            return False
+        try:
+            _link_or_copy(entry_path, output_path)
+            os.utime(entry_path)
+        except OSError as exc:
+            logging.warning("Could not reuse cached encode %s: %s", entry_path, exc)
+            return False
+        METRICS.counter("uploader_encode_cache_hits_total", "Encodes reused from the encode cache").inc()
+        return True
+
+    def store(self, key, output_path):
+        entry_path = self._entry_path(key)
+        temp_path = entry_path + ".tmp"
+        try:
+            os.makedirs(self.config.encode_cache_dir, exist_ok=True)
+            _link_or_copy(output_path, temp_path)
+            os.replace(temp_path, entry_path)
+        except OSError as exc:
+            logging.warning("Could not add %s to the encode cache: %s", output_path, exc)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        if self.config.encode_cache_max_bytes is not None:
+            removed, removed_bytes = sweep_folder(
+                self.config.encode_cache_dir,
+                max_bytes=self.config.encode_cache_max_bytes,
+                suffixes=(self.SUFFIX, self.HINT_SUFFIX),
+            )
+            if removed:
+                logging.info("Encode cache: evicted %d entries (%.1f MB).", removed, removed_bytes / 1e6)
+
+def _encode_cache_fingerprint(cache, input_path):
+    """Fingerprint of input_path for the encode cache, or None when it can't be used."""
+    if not cache.enabled():
+        return None
+    try:
+        return cache.source_fingerprint(input_path)
+    except OSError as exc:
+        logging.warning("Could not fingerprint %s for the encode cache: %s", input_path, exc)
+        return None
+
+def _start_preset(cache, fingerprint, preset):
+    """Preset to encode with: preset, or a faster one a stall left behind."""
+    hint = cache.start_preset(fingerprint) if fingerprint else None
+    if hint is None or preset not in X264_PRESETS:
+        return preset
+    # Only ever speed up: a hint slower than the configured preset is stale.
+    return min(hint, preset, key=X264_PRESETS.index)
+
+def _reuse_cached_encode(cache, fingerprint, input_path, output_path, cmd):
+    """Return (cache key or None, True if output_path now holds a cached encode)."""
+    if fingerprint is None:
+        return None, False
+    cache_key = cache.key_for(fingerprint, cmd)
+    if cache.fetch(cache_key, output_path):
+        logging.info("Reusing cached encode for %s", os.path.basename(input_path))
+        return cache_key, True
+    return cache_key, False
+
+def compress_video(input_path, context):
+    """Encode input_path with the context's settings, governor and encode cache.
+
+    Returns (path to upload, True if that is a new .compressed file).
+    """
+    config = context.config
+    cache = context.encode_cache
+    if not config.compression_enabled:
         return input_path, False
     if not _ffmpeg_available():
         logging.warning("ffmpeg not found in PATH; skipping compression.")
@@ -622,42 +2663,198 @@ def compress_video(input_path):
 
     base, ext = os.path.splitext(input_path)
     output_path = base + ".compressed" + ext
-    cmd = _build_ffmpeg_command(input_path, output_path)
-
-    logging.info("Compressing via ffmpeg: %s", " ".join(cmd))
-    try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except (OSError, subprocess.CalledProcessError) as exc:
-        logging.error("Compression failed: %s", exc)
-        return input_path, False
+    fingerprint = _encode_cache_fingerprint(cache, input_path)
+    preset = _start_preset(cache, fingerprint, config.compression_preset)
+    if preset != config.compression_preset:
+        logging.info("%s stalled before; encoding with preset %s.", os.path.basename(input_path), preset)
+    cmd = _build_ffmpeg_command(input_path, output_path, config, preset=preset)
+
+    cache_key, cached = _reuse_cached_encode(cache, fingerprint, input_path, output_path, cmd)
+    if cached:
+        return output_path, True
+
+    label = os.path.basename(input_path)
+    duration = probe_duration(input_path) if shutil.which("ffprobe") else None
+    attempt = 0
+    while True:
+        logging.info("Compressing via ffmpeg: %s", " ".join(cmd))
+        progress = FfmpegProgress(config, duration)
+        started = time.time()
+        try:
+            returncode, paused_seconds = context.encode_governor.run(cmd, label=label, progress=progress)
+            if returncode != 0:
+                raise subprocess.CalledProcessError(returncode, cmd)
+            break
+        except EncodeStalled as exc:
+            METRICS.counter("uploader_encode_stalls_total", "Encodes killed for making no progress").inc()
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            faster = _faster_preset(preset)
+            if attempt >= (config.encode_stall_retries or 0) or faster == preset:
+                logging.error("%s; giving up on compression.\n%s", exc, progress.tail())
+                return input_path, False
+            logging.warning("%s; retrying with preset %s.", exc, faster)
+            attempt += 1
+            preset = faster
+            cmd = _build_ffmpeg_command(input_path, output_path, config, preset=preset)
+            if fingerprint:
+                cache.remember_stall(fingerprint, preset)
+                cache_key = cache.key_for(fingerprint, cmd)
+        except (OSError, subprocess.CalledProcessError) as exc:
+            logging.error("Compression failed: %s\n%s", exc, progress.tail())
+            # Don't leave a partial encode behind (e.g. after running out of disk).
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            return input_path, False
 
     if not os.path.exists(output_path):
         logging.error("Compression output missing: %s", output_path)
         return input_path, False
 
+    elapsed = time.time() - started
+    METRICS.histogram("uploader_encode_seconds", "Wall time of each ffmpeg encode").observe(elapsed)
+    # Time paused for the game isn't encode speed; --plan reads this rate.
+    _observe_throughput(
+        "uploader_encode_mb_per_second", "Source MB encoded per second", os.path.getsize(input_path),
+        elapsed - paused_seconds,
+    )
+    if cache_key:
+        cache.store(cache_key, output_path)
     return output_path, True
 
+def _highest_motion_keyframe(input_path):
+    """Timestamp of the keyframe with the largest scene change, or None.
+
+    -skip_frame nokey decodes keyframes only, scaled down before scoring,
+    so this costs a small fraction of an encode.
+    """
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostats",
+        "-skip_frame", "nokey", "-i", input_path,
+        "-an", "-vf", "scale=160:-2,select='gte(scene,0)',metadata=print:key=lavfi.scene_score:file=-",
+        "-f", "null", "-",
+    ]
+    try:
+        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError) as exc:
+        logging.warning("Keyframe scan failed for %s: %s", input_path, exc)
+        return None
+    best_time = None
+    best_score = -1.0
+    frame_time = None
+    for line in result.stdout.splitlines():
+        if line.startswith("frame:"):
+            match = re.search(r"pts_time:([0-9.]+)", line)
+            frame_time = float(match.group(1)) if match else None
+        elif line.startswith("lavfi.scene_score=") and frame_time is not None:
+            score = float(line.split("=", 1)[1])
+            if score > best_score:
+                best_time, best_score = frame_time, score
+    return best_time
+
+def extract_thumbnail(input_path, config, output_path=None):
+    """Grab one frame as a JPEG for the video's thumbnail; return its path or None.
+
+    -ss goes before -i so ffmpeg seeks in the container and decodes a single
+    frame instead of everything up to the offset.
+    """
+    if not _ffmpeg_available():
+        logging.warning("ffmpeg not found in PATH; skipping thumbnail.")
+        return None
+    if output_path is None:
+        output_path = os.path.splitext(input_path)[0] + ".thumb.jpg"
+    offset = config.thumbnail_offset_seconds
+    if config.thumbnail_mode == "motion":
+        keyframe = _highest_motion_keyframe(input_path)
+        if keyframe is not None:
+            offset = keyframe
+    started = time.time()
+    # A recording shorter than the offset yields no frame; fall back to the start.
+    for seek in dict.fromkeys((offset, 0)):
+        cmd = [
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-ss", "%.3f" % seek, "-i", input_path,
+            "-frames:v", "1", "-an",
+            "-vf", f"scale='min({config.thumbnail_width},iw)':-2",
+            "-q:v", "2",
+            output_path,
+        ]
+        try:
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except (OSError, subprocess.CalledProcessError) as exc:
+            logging.warning("Thumbnail extraction failed at %.1fs: %s", seek, exc)
+            continue
+        if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            METRICS.histogram("uploader_thumbnail_seconds", "Wall time to pick and extract a thumbnail").observe(
+                time.time() - started
+            )
+            return output_path
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    return None
+
+def set_youtube_thumbnail(youtube_service, video_id, image_path):
+    youtube_service.thumbnails().set(
+        videoId=video_id,
+        media_body=MediaFileUpload(image_path, mimetype="image/jpeg"),
+    ).execute()
+    logging.info("Thumbnail set for %s", video_id)
+
+def _discard_thumbnail(future):
+    """Done-callback removing an extracted frame that won't be used."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    image_path = future.result()
+    if image_path and os.path.exists(image_path):
+        os.remove(image_path)
+
 def _should_retry_http_error(exc):
     status = getattr(exc, "status_code", None)
     if status is None and hasattr(exc, "resp"):
         status = getattr(exc.resp, "status", None)
     return status in {429, 500, 502, 503, 504}
 
-def _sleep_backoff(attempt):
-    base = RETRY_BACKOFF_SECONDS * (RETRY_BACKOFF_MULTIPLIER ** attempt)
-    jitter = random.uniform(0, RETRY_JITTER_SECONDS)
-    time.sleep(base + jitter)
+def _backoff_seconds(attempt, config):
+    base = config.retry_backoff_seconds * (config.retry_backoff_multiplier ** attempt)
+    jitter = random.uniform(0, config.retry_jitter_seconds)
+    return base + jitter
 
-def upload_to_youtube(youtube_service, file_path, title, upload_options):
-    """Upload video to YouTube with error handling and progress tracking."""
+def _upload_retry_delay(exc, attempt, config):
+    """Count and log a failed upload attempt.
+
+    Returns the backoff before the next attempt, or None to give up.
+    """
+    if isinstance(exc, HttpError):
+        status = getattr(exc.resp, "status", "unknown")
+        retryable = _should_retry_http_error(exc)
+    else:
+        status = "network"
+        retryable = True
+    if attempt >= config.max_retries or not retryable:
+        METRICS.counter("uploader_upload_failures_total", "Uploads given up on, by HTTP status").inc(status=status)
+        logging.error("YouTube upload failed: %s", exc)
+        return None
+    METRICS.counter("uploader_upload_retries_total", "Upload retries, by HTTP status").inc(status=status)
+    logging.warning("Upload failed; retrying (%d/%d): %s", attempt + 1, config.max_retries, exc)
+    return _backoff_seconds(attempt, config)
+
+def _start_upload(file_path, title, upload_options, streaming=False):
+    """Log the upload and return (file size, videos.insert body).
+
+    The size is None when streaming: ffmpeg is still writing file_path.
+    """
     logging.info("Starting upload: %s", title)
 
     # Check if file exists and get size
     if not os.path.exists(file_path):
         raise FileNotFoundError("Video file not found: %s" % file_path)
 
-    file_size = os.path.getsize(file_path)
-    logging.info("File size: %.1f MB", file_size / (1024*1024))
+    if streaming:
+        file_size = None
+        logging.info("Uploading while the encode is still writing the file")
+    else:
+        file_size = os.path.getsize(file_path)
+        logging.info("File size: %.1f MB", file_size / (1024*1024))
 
     request_body = build_upload_request(
         title,
@@ -665,79 +2862,743 @@ def upload_to_youtube(youtube_service, file_path, title, upload_options):
         upload_options["tags"],
         upload_options["privacy_status"],
     )
+    return file_size, request_body
 
-    last_exc = None
-    for attempt in range(MAX_RETRIES + 1):
-        try:
-            media = MediaFileUpload(file_path, chunksize=-1, resumable=True)
-            request = youtube_service.videos().insert(
-                part="snippet,status",
-                body=request_body,
-                media_body=media
-            )
+def _insert_video_request(youtube_service, file_path, request_body, media=None):
+    return youtube_service.videos().insert(
+        part="snippet,status",
+        body=request_body,
+        media_body=media or MediaFileUpload(file_path, chunksize=-1, resumable=True)
+    )
 
-            response = None
-            while response is None:
-                status, response = request.next_chunk()
-                if status:
-                    progress = int(status.progress() * 100)
-                    logging.info("Upload progress: %d%%", progress)
+def _send_upload(youtube_service, request, title, upload_options, file_size, started, config):
+    """Send request's chunks until YouTube answers, then add it to the playlist.
 
-            video_id = response["id"]
-            video_url = "https://youtu.be/%s" % video_id
-            logging.info("Upload complete: %s", video_url)
+    One attempt: HttpError/OSError propagate to the caller's retry loop.
+    """
+    response = None
+    progress_limiter = ProgressLogLimiter(config.progress_log_seconds, config.progress_log_percent)
+    while response is None:
+        with TRACER.span("next_chunk"):
+            status, response = request.next_chunk()
+        if status and status.total_size is None:
+            # Streaming an encode that isn't finished: no total to take a percentage of.
+            if progress_limiter.should_log(0):
+                logging.info(
+                    "Upload progress: %.1f MB sent", status.resumable_progress / (1024*1024),
+                    extra={"event": "upload_progress", "title": title, "bytes_sent": status.resumable_progress},
+                )
+        elif status:
+            progress = int(status.progress() * 100)
+            if progress_limiter.should_log(progress):
+                logging.info(
+                    "Upload progress: %d%%", progress,
+                    extra={"event": "upload_progress", "title": title, "percent": progress,
+                           "bytes_sent": status.resumable_progress},
+                )
 
-            # Add to playlist if requested
-            playlist_id = upload_options["playlist_id"]
-            if playlist_id:
-                try:
-                    youtube_service.playlistItems().insert(
-                        part="snippet",
-                        body={
-                            "snippet": {
-                                "playlistId": playlist_id,
-                                "resourceId": {"kind": "youtube#video", "videoId": video_id}
-                            }
-                        }
-                    ).execute()
-                    logging.info("Added to playlist: %s", playlist_id)
-                except HttpError as exc:
-                    logging.error("Failed to add to playlist: %s", exc)
-
-            return video_url
+    if file_size is None:
+        file_size = request.resumable.size()
+    video_id = response["id"]
+    video_url = "https://youtu.be/%s" % video_id
+    logging.info("Upload complete: %s", video_url)
+    METRICS.counter("uploader_uploaded_bytes_total", "Bytes sent to YouTube").inc(file_size)
+    _observe_throughput(
+        "uploader_upload_mb_per_second", "Upload MB per second, retries included", file_size, time.time() - started
+    )
 
+    # Add to playlist if requested
+    playlist_id = upload_options["playlist_id"]
+    if playlist_id:
+        try:
+            youtube_service.playlistItems().insert(
+                part="snippet",
+                body={
+                    "snippet": {
+                        "playlistId": playlist_id,
+                        "resourceId": {"kind": "youtube#video", "videoId": video_id}
+                    }
+                }
+            ).execute()
+            logging.info("Added to playlist: %s", playlist_id)
         except HttpError as exc:
-            last_exc = exc
-            if attempt >= MAX_RETRIES or not _should_retry_http_error(exc):
-                logging.error("YouTube upload failed: %s", exc)
-                raise
-            logging.warning("Upload failed; retrying (%d/%d): %s", attempt + 1, MAX_RETRIES, exc)
-            _sleep_backoff(attempt)
-        except OSError as exc:
-            last_exc = exc
-            if attempt >= MAX_RETRIES:
-                logging.error("YouTube upload failed: %s", exc)
-                raise
-            logging.warning("Upload failed; retrying (%d/%d): %s", attempt + 1, MAX_RETRIES, exc)
-            _sleep_backoff(attempt)
+            logging.error("Failed to add to playlist: %s", exc)
 
-    if last_exc:
-        raise last_exc
+    return video_url
 
-    raise RuntimeError("Upload failed without exception.")
+def _upload_attempt(youtube_service, file_path, request_body, title, upload_options, file_size, started, config):
+    request = _insert_video_request(youtube_service, file_path, request_body)
+    return _send_upload(youtube_service, request, title, upload_options, file_size, started, config)
 
-def move_to_drive(file_path, dest_folder, mode="move"):
-    """Move or copy file to Google Drive sync folder."""
-    if not dest_folder:
-        return
-    os.makedirs(dest_folder, exist_ok=True)
-    new_path = os.path.join(dest_folder, os.path.basename(file_path))
-    if mode == "copy":
-        shutil.copy2(file_path, new_path)
-        logging.info("Copied to Drive sync folder: %s", new_path)
-    else:
-        shutil.move(file_path, new_path)
-        logging.info("Moved to Drive sync folder: %s", new_path)
+def upload_to_youtube(youtube_service, file_path, title, upload_options, config, media=None):
+    """Upload video to YouTube with error handling and progress tracking.
+
+    Retries and progress logging follow config. media overrides the request
+    body (e.g. a StreamedMediaUpload). Retries then resume the same
+    resumable session, since a stream can't be re-read from the start.
+    """
+    file_size, request_body = _start_upload(
+        file_path, title, upload_options, streaming=isinstance(media, GrowingFileMediaUpload)
+    )
+    request = None
+    started = time.time()
+    for attempt in range(config.max_retries + 1):
+        try:
+            if request is None or media is None:
+                request = _insert_video_request(youtube_service, file_path, request_body, media)
+            return _send_upload(youtube_service, request, title, upload_options, file_size, started, config)
+        except (HttpError, OSError) as exc:
+            delay = _upload_retry_delay(exc, attempt, config)
+            if delay is None:
+                raise
+            time.sleep(delay)
+
+    raise RuntimeError("Upload failed without exception.")
+
+async def upload_to_youtube_async(pipeline_loop, executor, youtube_service, file_path, title, upload_options, config,
+                                  track=None):
+    """upload_to_youtube with the backoff awaited on the pipeline loop.
+
+    Each attempt runs on executor, so no thread sits idle between retries.
+    If the pipeline starts closing during a backoff, the last error is
+    re-raised and the caller queues the upload for the next run.
+    """
+    file_size, request_body = await pipeline_loop.run_blocking(
+        executor, _start_upload, file_path, title, upload_options, track=track
+    )
+    started = time.time()
+    for attempt in range(config.max_retries + 1):
+        try:
+            return await pipeline_loop.run_blocking(
+                executor, _upload_attempt, youtube_service, file_path, request_body,
+                title, upload_options, file_size, started, config, track=track,
+            )
+        except (HttpError, OSError) as exc:
+            delay = _upload_retry_delay(exc, attempt, config)
+            if delay is None:
+                raise
+            if not await pipeline_loop.sleep(delay):
+                logging.warning("Pipeline is shutting down; not retrying %s.", title)
+                raise
+
+    raise RuntimeError("Upload failed without exception.")
+
+RESUMABLE_CHUNK_ALIGNMENT = 256 * 1024  # resumable upload chunks must be multiples of this
+FICLONE = 0x40049409  # Linux ioctl: share extents with another file (btrfs, XFS)
+
+def _open_flags(flags):
+    return flags | getattr(os, "O_BINARY", 0)
+
+def _try_reflink(src_fd, dst_fd):
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    except OSError:
+        return False
+    return True
+
+def _kernel_copy(src_fd, dst_fd, offset, total, chunk_size):
+    """Copy src[offset:total] to the same offsets in dst.
+
+    Prefers os.copy_file_range, then os.sendfile, so the data never passes
+    through userspace; falls back to plain reads/writes where neither exists.
+    """
+    copy_range = getattr(os, "copy_file_range", None)
+    sendfile = getattr(os, "sendfile", None) if sys.platform.startswith("linux") else None
+    unsupported = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP}
+    while offset < total:
+        count = min(chunk_size, total - offset)
+        if copy_range is not None:
+            try:
+                copied = copy_range(src_fd, dst_fd, count, offset, offset)
+            except OSError as exc:
+                if exc.errno not in unsupported:
+                    raise
+                copy_range = None
+                continue
+        elif sendfile is not None:
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+            try:
+                copied = sendfile(dst_fd, src_fd, offset, count)
+            except OSError as exc:
+                if exc.errno not in unsupported:
+                    raise
+                sendfile = None
+                continue
+        else:
+            os.lseek(src_fd, offset, os.SEEK_SET)
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+            data = os.read(src_fd, min(count, 8 * 1024 * 1024))
+            copied = 0
+            while copied < len(data):
+                copied += os.write(dst_fd, data[copied:])
+        if copied <= 0:
+            raise OSError(errno.EIO, "Source ended early during Drive copy")
+        offset += copied
+
+def _sampled_digest(fd, length, samples=16, block_size=64 * 1024):
+    """Hash evenly spaced blocks (always including head and tail) of fd[:length]."""
+    hash_obj = hashlib.sha256(str(length).encode("ascii"))
+    if length <= 0:
+        return hash_obj.hexdigest()
+    last_start = max(0, length - block_size)
+    offsets = sorted({last_start * i // max(1, samples - 1) for i in range(samples)})
+    for offset in offsets:
+        os.lseek(fd, offset, os.SEEK_SET)
+        hash_obj.update(os.read(fd, min(block_size, length - offset)))
+    return hash_obj.hexdigest()
+
+def _resume_offset(src_fd, partial_path, src_size):
+    """Return where a previous partial copy can safely continue, or 0."""
+    partial_size = os.path.getsize(partial_path)
+    if partial_size == 0 or partial_size > src_size:
+        return 0
+    partial_fd = os.open(partial_path, _open_flags(os.O_RDONLY))
+    try:
+        matches = _sampled_digest(partial_fd, partial_size) == _sampled_digest(src_fd, partial_size)
+    finally:
+        os.close(partial_fd)
+    if not matches:
+        return 0
+    # Rewrite the tail in case the last write before the interruption was torn.
+    return max(0, partial_size - 1024 * 1024)
+
+def copy_file_fast(src_path, dst_path, chunk_size=None):
+    """Copy src_path to dst_path via reflink or kernel-side copy, resumably.
+
+    Data goes to dst_path + ".partial" first. An interrupted copy resumes
+    where it stopped if the partial file still matches the source. The
+    result is checked by size plus a sampled checksum before it is renamed
+    into place with the source's timestamps.
+    """
+    chunk_size = chunk_size or CONFIG_DEFAULTS["drive_copy_chunk_bytes"]
+    partial_path = dst_path + ".partial"
+    src_fd = os.open(src_path, _open_flags(os.O_RDONLY))
+    try:
+        src_size = os.fstat(src_fd).st_size
+        offset = 0
+        if os.path.exists(partial_path):
+            offset = _resume_offset(src_fd, partial_path, src_size)
+            if offset:
+                logging.info("Resuming Drive copy of %s at %.1f MB", src_path, offset / (1024 * 1024))
+        dst_fd = os.open(partial_path, _open_flags(os.O_RDWR | os.O_CREAT), 0o644)
+        try:
+            if offset == 0:
+                os.ftruncate(dst_fd, 0)
+                if _try_reflink(src_fd, dst_fd):
+                    offset = src_size
+            _kernel_copy(src_fd, dst_fd, offset, src_size, chunk_size)
+            os.ftruncate(dst_fd, src_size)
+            verified = (
+                os.fstat(dst_fd).st_size == src_size
+                and _sampled_digest(dst_fd, src_size) == _sampled_digest(src_fd, src_size)
+            )
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    if not verified:
+        os.remove(partial_path)
+        raise OSError(errno.EIO, "Drive copy verification failed: %s" % dst_path)
+    shutil.copystat(src_path, partial_path)
+    os.replace(partial_path, dst_path)
+
+def move_to_drive(file_path, dest_folder, mode="move", chunk_size=None):
+    """Move or copy file to Google Drive sync folder."""
+    if not dest_folder:
+        return
+    os.makedirs(dest_folder, exist_ok=True)
+    new_path = os.path.join(dest_folder, os.path.basename(file_path))
+    if mode != "copy":
+        try:
+            os.replace(file_path, new_path)
+            logging.info("Moved to Drive sync folder: %s", new_path)
+            return
+        except OSError as exc:
+            if exc.errno != errno.EXDEV:
+                raise
+    copy_file_fast(file_path, new_path, chunk_size)
+    if mode == "copy":
+        logging.info("Copied to Drive sync folder: %s", new_path)
+    else:
+        os.remove(file_path)
+        logging.info("Moved to Drive sync folder: %s", new_path)
+
+class DriveSyncEngine:
+    """Run Drive folder syncs in the background so uploads don't wait on them."""
+
+    def __init__(self, workers=1, chunk_size=None):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers or 1), thread_name_prefix="drive-sync")
+        self.chunk_size = chunk_size
+
+    def submit(self, file_path, dest_folder, mode="move", delete_after=False):
+        track = TRACER.current_track()
+        try:
+            return self._pool.submit(self._sync, file_path, dest_folder, mode, delete_after, track)
+        except RuntimeError:
+            self._sync(file_path, dest_folder, mode, delete_after, track)
+            return None
+
+    def _sync(self, file_path, dest_folder, mode, delete_after, track=None):
+        TRACER.set_track(track)
+        started = time.time()
+        try:
+            with TRACER.span("move_to_drive", mode=mode):
+                move_to_drive(file_path, dest_folder, mode=mode, chunk_size=self.chunk_size)
+            METRICS.histogram("uploader_drive_sync_seconds", "Time to move or copy a file into the Drive folder").observe(
+                time.time() - started
+            )
+            if delete_after and mode == "copy" and os.path.exists(file_path):
+                os.remove(file_path)
+                logging.info("Deleted local file after upload: %s", file_path)
+        except OSError as exc:
+            logging.error("Drive sync failed; local file kept at %s: %s", file_path, exc)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+class FanOutSink(ABC):
+    """A destination fed by FanOutReader.
+
+    write() receives each chunk in order on the sink's own thread; close()
+    returns the sink's result once the stream ends and abort() discards any
+    partial output after a failure.
+    """
+
+    name = "sink"
+
+    @abstractmethod
+    def write(self, chunk):
+        """Consume the next chunk of the file."""
+
+    def close(self):
+        return None
+
+    def abort(self):
+        pass
+
+class HashSink(FanOutSink):
+    """SHA-256 of the stream, matching compute_file_hash."""
+
+    name = "hash"
+
+    def __init__(self):
+        self._hash = hashlib.sha256()
+
+    def write(self, chunk):
+        self._hash.update(chunk)
+
+    def close(self):
+        return self._hash.hexdigest()
+
+class FileCopySink(FanOutSink):
+    """Write the stream to dest_path through a .partial file renamed on close."""
+
+    name = "drive"
+
+    def __init__(self, src_path, dest_path, name=None):
+        if name:
+            self.name = name
+        self.src_path = src_path
+        self.dest_path = dest_path
+        self.partial_path = dest_path + ".partial"
+        os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+        self._handle = open(self.partial_path, "wb")
+
+    def write(self, chunk):
+        self._handle.write(chunk)
+
+    def close(self):
+        self._handle.close()
+        shutil.copystat(self.src_path, self.partial_path)
+        os.replace(self.partial_path, self.dest_path)
+        return self.dest_path
+
+    def abort(self):
+        self._handle.close()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+class LocalObjectSink(FileCopySink):
+    """Local stand-in for an object-store destination (e.g. S3-compatible).
+
+    Stores the object as root/key with a key.json sidecar holding its size
+    and MD5 ETag, so a real client can be swapped in behind the same sink.
+    """
+
+    name = "object_store"
+
+    def __init__(self, src_path, root, key):
+        super().__init__(src_path, os.path.join(root, key))
+        self.key = key
+        self._md5 = hashlib.md5()
+        self._size = 0
+
+    def write(self, chunk):
+        super().write(chunk)
+        self._md5.update(chunk)
+        self._size += len(chunk)
+
+    def close(self):
+        dest_path = super().close()
+        with open(dest_path + ".json", "w", encoding="utf-8") as handle:
+            json.dump({"key": self.key, "size": self._size, "etag": self._md5.hexdigest()}, handle, indent=2)
+        return dest_path
+
+class StreamedMediaUpload(MediaUpload):
+    """Resumable upload body fed by a FanOutReader instead of reading the file.
+
+    Keeps a sliding window of bytes from the last offset the client asked
+    for; feed() blocks once the window holds max_buffer bytes, which is
+    what pushes back on the reader when the network is the slow sink.
+    """
+
+    def __init__(self, size, chunksize=8 * 1024 * 1024, mimetype="video/mp4", max_buffer=None):
+        super().__init__()
+        self._size = size
+        self._chunksize = chunksize
+        self._mimetype = mimetype
+        self._max_buffer = max_buffer or 2 * chunksize
+        self._cond = threading.Condition()
+        self._buffer = bytearray()
+        self._start = 0
+        self._eof = False
+        self._error = None
+
+    def chunksize(self):
+        return self._chunksize
+
+    def mimetype(self):
+        return self._mimetype
+
+    def size(self):
+        return self._size
+
+    def resumable(self):
+        return True
+
+    def has_stream(self):
+        return False
+
+    def getbytes(self, begin, length):
+        end = begin + length
+        with self._cond:
+            if begin < self._start:
+                raise OSError(errno.ESPIPE, "Streamed upload cannot rewind to byte %d" % begin)
+            # Everything before begin is acknowledged by the server.
+            drop = min(begin - self._start, len(self._buffer))
+            if drop:
+                del self._buffer[:drop]
+                self._start += drop
+                self._cond.notify_all()
+            while self._start + len(self._buffer) < end and not self._eof and self._error is None:
+                self._cond.wait()
+            if self._error is not None:
+                raise self._error
+            return bytes(self._buffer[begin - self._start:end - self._start])
+
+    def feed(self, chunk):
+        with self._cond:
+            while len(self._buffer) >= self._max_buffer and self._error is None:
+                self._cond.wait()
+            if self._error is not None:
+                raise self._error
+            self._buffer.extend(chunk)
+            self._cond.notify_all()
+
+    def finish(self):
+        with self._cond:
+            self._eof = True
+            self._cond.notify_all()
+
+    def fail(self, exc):
+        with self._cond:
+            if self._error is None:
+                self._error = exc
+            self._cond.notify_all()
+
+class StreamedEncodeFailed(Exception):
+    """The encode behind a GrowingFileMediaUpload failed; the upload can't finish."""
+
+class GrowingFileMediaUpload(MediaUpload):
+    """Resumable upload body read from a file ffmpeg is still writing.
+
+    A chunk is sent once the file has grown past it, and the total size is
+    held back until finish(), so YouTube only sees the end of the file with
+    the last chunk. finish() re-hashes the bytes already sent before letting
+    that chunk go, in case the muxer went back and rewrote any of them.
+    """
+
+    def __init__(self, path, chunksize=8 * 1024 * 1024, mimetype="video/mp4", poll_seconds=0.5):
+        super().__init__()
+        self._path = path
+        self._chunksize = chunksize
+        self._mimetype = mimetype
+        self._poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._total = None
+        self._error = None
+        self._sent = 0
+        self._hash = hashlib.sha256()
+        self._hashed = 0
+
+    def chunksize(self):
+        return self._chunksize
+
+    def mimetype(self):
+        return self._mimetype
+
+    def resumable(self):
+        return True
+
+    def has_stream(self):
+        return False
+
+    def _wait_for(self, end):
+        """Block until the file holds end bytes or the encode has ended."""
+        while not self._done.is_set() and os.path.getsize(self._path) < end:
+            self._done.wait(self._poll_seconds)
+        if self._error is not None:
+            raise self._error
+
+    def size(self):
+        # Wait for a byte past the next chunk: a chunk that turns out to be
+        # the last one is then always sent with the real total.
+        self._wait_for(self._sent + self._chunksize + 1)
+        return self._total
+
+    def getbytes(self, begin, length):
+        self._wait_for(begin + length + 1)
+        with self._lock:
+            with open(self._path, "rb") as handle:
+                handle.seek(begin)
+                data = handle.read(length)
+            end = begin + len(data)
+            if begin <= self._hashed < end:
+                self._hash.update(data[self._hashed - begin:])
+                self._hashed = end
+            self._sent = end
+        return data
+
+    def finish(self):
+        """Mark the encode complete once the bytes already sent are unchanged."""
+        with self._lock:
+            hashed = self._hashed
+            expected = self._hash.hexdigest()
+        digest = hashlib.sha256()
+        with open(self._path, "rb") as handle:
+            remaining = hashed
+            while remaining:
+                block = handle.read(min(remaining, 1024 * 1024))
+                if not block:
+                    break
+                digest.update(block)
+                remaining -= len(block)
+        if remaining or digest.hexdigest() != expected:
+            self.fail(StreamedEncodeFailed("%s changed after it was uploaded" % self._path))
+            return
+        self._total = os.path.getsize(self._path)
+        self._done.set()
+
+    def fail(self, exc):
+        if self._error is None:
+            self._error = exc
+        self._done.set()
+
+def reuse_streamed_encode(input_path, context):
+    """(encode path, True) if the encode cache holds input_path's streamed encode, else (input_path, False)."""
+    base, ext = os.path.splitext(input_path)
+    output_path = base + ".compressed" + ext
+    cmd = _build_ffmpeg_command(input_path, output_path, context.config, fragmented=True)
+    cache = context.encode_cache
+    if _reuse_cached_encode(cache, _encode_cache_fingerprint(cache, input_path), input_path, output_path, cmd)[1]:
+        return output_path, True
+    return input_path, False
+
+def stream_encode_and_upload(youtube_service, input_path, title, upload_options, context):
+    """Compress input_path to fragmented MP4 and upload it as ffmpeg writes it.
+
+    Returns (video URL, encode path), or (video URL, None) if the encode
+    failed and the original was uploaded instead. Upload errors kill the
+    encode and propagate as from upload_to_youtube.
+    """
+    config = context.config
+    base, ext = os.path.splitext(input_path)
+    output_path = base + ".compressed" + ext
+    cmd = _build_ffmpeg_command(input_path, output_path, config, fragmented=True)
+    label = os.path.basename(input_path)
+    progress = FfmpegProgress(config, probe_duration(input_path) if shutil.which("ffprobe") else None)
+    media = GrowingFileMediaUpload(output_path, chunksize=config.stream_chunk_bytes)
+    cancel = threading.Event()
+    encode = {}
+
+    def run_encode():
+        started = time.time()
+        try:
+            returncode, encode["paused_seconds"] = context.encode_governor.run(
+                cmd, label=label, progress=progress, cancel=cancel
+            )
+            if cancel.is_set():
+                return
+            if returncode != 0:
+                raise subprocess.CalledProcessError(returncode, cmd)
+            encode["seconds"] = time.time() - started
+            media.finish()
+        except (OSError, subprocess.SubprocessError) as exc:
+            media.fail(StreamedEncodeFailed("%s\n%s" % (exc, progress.tail())))
+
+    # The upload polls the output's size from the start.
+    with open(output_path, "wb"):
+        pass
+    logging.info("Compressing via ffmpeg while uploading: %s", " ".join(cmd))
+    encoder = threading.Thread(target=run_encode, name="stream-encode", daemon=True)
+    encoder.start()
+    try:
+        video_url = upload_to_youtube(youtube_service, output_path, title, upload_options, config, media=media)
+    except StreamedEncodeFailed as exc:
+        encoder.join()
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        logging.error("Streamed compression failed: %s", exc)
+        logging.warning("Uploading the original of %s instead.", label)
+        return upload_to_youtube(youtube_service, input_path, title, upload_options, config), None
+    except BaseException:
+        cancel.set()
+        encoder.join()
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    encoder.join()
+
+    METRICS.histogram("uploader_encode_seconds", "Wall time of each ffmpeg encode").observe(encode["seconds"])
+    _observe_throughput(
+        "uploader_encode_mb_per_second", "Source MB encoded per second", os.path.getsize(input_path),
+        encode["seconds"] - encode["paused_seconds"],
+    )
+    cache = context.encode_cache
+    fingerprint = _encode_cache_fingerprint(cache, input_path)
+    if fingerprint:
+        cache.store(cache.key_for(fingerprint, cmd), output_path)
+    return video_url, output_path
+
+class YouTubeUploadSink(FanOutSink):
+    """Run upload_to_youtube on its own thread, pulling bytes from the stream."""
+
+    name = "youtube"
+
+    def __init__(self, youtube_service, file_path, title, upload_options, config, size, chunksize):
+        self.media = StreamedMediaUpload(size, chunksize=chunksize)
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(youtube_service, file_path, title, upload_options, config),
+            name="fanout-youtube",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _run(self, youtube_service, file_path, title, upload_options, config):
+        try:
+            self._result = upload_to_youtube(
+                youtube_service, file_path, title, upload_options, config, media=self.media
+            )
+        except (HttpError, OSError, RuntimeError) as exc:
+            self._error = exc
+        finally:
+            if self._result is None:
+                # Unblock the feeding thread however the upload ended.
+                self._error = self._error or RuntimeError("Upload ended without a response")
+                self.media.fail(self._error)
+
+    def write(self, chunk):
+        self.media.feed(chunk)
+
+    def close(self):
+        self.media.finish()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def abort(self):
+        self.media.fail(OSError(errno.ECANCELED, "Fan-out read aborted"))
+        self._thread.join()
+
+class FanOutReader:
+    """Read a file from disk once and stream it to several sinks in parallel.
+
+    Each sink drains its own bounded queue on its own thread, so a slow sink
+    only holds up the reader once its queue is full, and a failed sink is
+    dropped without stopping the others. Chunks are shared, not copied.
+    """
+
+    def __init__(self, file_path, sinks, chunk_size=8 * 1024 * 1024, queue_depth=4):
+        self.file_path = file_path
+        self.sinks = list(sinks)
+        self.chunk_size = chunk_size
+        self.queue_depth = max(1, queue_depth)
+
+    def run(self):
+        """Stream the file and return {sink.name: result or exception}."""
+        workers = []
+        for sink in self.sinks:
+            worker = {"sink": sink, "queue": queue.Queue(maxsize=self.queue_depth), "result": None, "error": None}
+            worker["thread"] = threading.Thread(
+                target=self._drain, args=(worker,), name="fanout-%s" % sink.name, daemon=True
+            )
+            worker["thread"].start()
+            workers.append(worker)
+        read_error = None
+        try:
+            with open(self.file_path, "rb", buffering=0) as handle:
+                while True:
+                    live = [worker for worker in workers if worker["error"] is None]
+                    if not live:
+                        break
+                    chunk = handle.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    for worker in live:
+                        worker["queue"].put(chunk)
+        except OSError as exc:
+            read_error = exc
+            for worker in workers:
+                if worker["error"] is None:
+                    worker["error"] = exc
+        finally:
+            for worker in workers:
+                worker["queue"].put(None)
+            for worker in workers:
+                worker["thread"].join()
+        if read_error is not None:
+            logging.error("Fan-out read failed for %s: %s", self.file_path, read_error)
+        return {worker["sink"].name: worker["error"] or worker["result"] for worker in workers}
+
+    @staticmethod
+    def _drain(worker):
+        sink = worker["sink"]
+        pending = worker["queue"]
+        try:
+            while True:
+                chunk = pending.get()
+                if chunk is None:
+                    break
+                if worker["error"] is not None:
+                    continue
+                sink.write(chunk)
+            if worker["error"] is None:
+                worker["result"] = sink.close()
+                return
+        except Exception as exc:  # a dead sink must not leave the reader blocked
+            worker["error"] = exc
+            logging.warning("Fan-out destination %s failed: %s", sink.name, exc)
+        sink.abort()
+        # Keep draining so the reader never blocks on a dead sink.
+        while chunk is not None:
+            chunk = pending.get()
 
 class PendingUploadQueued(Exception):
     """Raised when an upload is queued for later retry."""
@@ -763,12 +3624,22 @@ def save_pending_uploads(path, pending):
     except OSError as exc:
         logging.warning("Failed to save pending uploads: %s", exc)
 
-def process_pending_uploads(youtube_service):
-    pending = load_pending_uploads(PENDING_UPLOADS_PATH)
+def process_pending_uploads(youtube_service, config, leases=None, drive_sync=None):
+    """Retry the pending queue, handing Drive syncs to drive_sync.
+
+    The next upload doesn't wait for the previous file's Drive copy; the
+    syncs started here are waited for before returning. Without a
+    DriveSyncEngine, a temporary one is used.
+    """
+    pending = load_pending_uploads(config.pending_uploads_path)
     if not pending:
         return
 
     logging.info("Processing %d pending uploads...", len(pending))
+    own_drive_sync = drive_sync is None
+    if own_drive_sync:
+        drive_sync = DriveSyncEngine(config.drive_sync_workers, config.drive_copy_chunk_bytes)
+    syncs = []
     remaining = []
     for item in pending:
         file_path = item.get("file_path")
@@ -777,40 +3648,60 @@ def process_pending_uploads(youtube_service):
         original_path = item.get("original_path")
         cleanup_path = item.get("cleanup_path")
         drive_sync_folder = item.get("drive_sync_folder")
-        drive_sync_mode = item.get("drive_sync_mode") or DRIVE_SYNC_MODE
+        drive_sync_mode = item.get("drive_sync_mode") or config.drive_sync_mode
         if not file_path or not title or not upload_options:
             logging.warning("Skipping invalid pending upload entry: %s", item)
             continue
         if not os.path.exists(file_path):
             logging.warning("Pending file missing, skipping: %s", file_path)
             continue
+        lease_key = item.get("lease_key") if leases is not None else None
+        if lease_key and not leases.claim(lease_key, os.path.basename(original_path or file_path)):
+            if leases.is_done(lease_key):
+                logging.info("Pending upload already done by another node, dropping: %s", title)
+            else:
+                logging.info("Pending upload claimed by another node, keeping: %s", title)
+                remaining.append(item)
+            continue
 
+        TRACER.set_track(TRACER.track("pending: %s" % title))
         try:
-            if DRY_RUN:
+            if config.dry_run:
                 logging.info("Dry run enabled; skipping pending upload for %s", title)
                 remaining.append(item)
                 continue
-            upload_to_youtube(youtube_service, file_path, title, upload_options)
+            with TRACER.span("upload_to_youtube", pending=True):
+                video_url = upload_to_youtube(youtube_service, file_path, title, upload_options, config)
+            if lease_key:
+                leases.complete(lease_key, {"title": title, "url": video_url})
             if cleanup_path and os.path.exists(cleanup_path):
                 os.remove(cleanup_path)
             if drive_sync_folder:
                 if original_path and os.path.exists(original_path):
-                    move_to_drive(original_path, drive_sync_folder, mode=drive_sync_mode)
-                    if DELETE_AFTER_UPLOAD and drive_sync_mode == "copy":
-                        if os.path.exists(original_path):
-                            os.remove(original_path)
+                    local_path = original_path
                 elif os.path.exists(file_path) and file_path != cleanup_path:
-                    move_to_drive(file_path, drive_sync_folder, mode=drive_sync_mode)
-                    if DELETE_AFTER_UPLOAD and drive_sync_mode == "copy":
-                        if os.path.exists(file_path):
-                            os.remove(file_path)
-            elif DELETE_AFTER_UPLOAD and os.path.exists(file_path):
+                    local_path = file_path
+                else:
+                    local_path = None
+                if local_path:
+                    syncs.append(drive_sync.submit(
+                        local_path, drive_sync_folder, mode=drive_sync_mode, delete_after=config.delete_after_upload
+                    ))
+            elif config.delete_after_upload and os.path.exists(file_path):
                 os.remove(file_path)
         except (HttpError, OSError, ValueError) as exc:
             logging.error("Pending upload failed, keeping in queue: %s", exc)
             remaining.append(item)
+        finally:
+            if lease_key:
+                leases.release(lease_key)
+    TRACER.set_track(None)
 
-    save_pending_uploads(PENDING_UPLOADS_PATH, remaining)
+    save_pending_uploads(config.pending_uploads_path, remaining)
+    if own_drive_sync:
+        drive_sync.shutdown()
+    else:
+        concurrent.futures.wait([sync for sync in syncs if sync is not None])
 
 def load_uploaded_titles(path):
     return load_uploaded_cache(path)
@@ -818,26 +3709,48 @@ def load_uploaded_titles(path):
 def save_uploaded_titles(path, cache):
     save_uploaded_cache(path, cache)
 
+TITLE_SUFFIX_RE = re.compile(r"^(?P<base>.*) \((?P<number>\d+)\)$")
+
+def index_title(counters, title):
+    """Record title in the per-base-title counters ("Foo (3)" -> counters["Foo"] >= 3)."""
+    match = TITLE_SUFFIX_RE.match(title)
+    if match:
+        base, number = match.group("base"), int(match.group("number"))
+    else:
+        base, number = title, 1
+    if number > counters.get(base, 0):
+        counters[base] = number
+
+def next_free_title(counters, title):
+    """Next "title (N)" past every number used so far, in one lookup."""
+    return f"{title} ({max(counters.get(title, 1), 1) + 1})"
+
 def _normalize_uploaded_cache(data):
     if not isinstance(data, dict):
-        return {"titles": {}, "hashes": {}}
+        return {"titles": {}, "hashes": {}, "title_counters": {}}
     if "titles" in data or "hashes" in data:
-        return {
+        cache = {
             "titles": data.get("titles", {}),
             "hashes": data.get("hashes", {}),
+            "title_counters": dict(data.get("title_counters") or {}),
         }
-    return {"titles": data, "hashes": {}}
+    else:
+        cache = {"titles": data, "hashes": {}, "title_counters": {}}
+    # Rebuild from the titles too, so entries added by older versions count.
+    for title in cache["titles"]:
+        index_title(cache["title_counters"], title)
+    return cache
 
 def load_uploaded_cache(path):
     if not os.path.exists(path):
-        return {"titles": {}, "hashes": {}}
+        return {"titles": {}, "hashes": {}, "title_counters": {}}
     try:
         with open(path, "r", encoding="utf-8") as handle:
             data = json.load(handle)
         return _normalize_uploaded_cache(data)
     except (OSError, json.JSONDecodeError) as exc:
         logging.warning("Failed to load uploaded cache: %s", exc)
-        return {"titles": {}, "hashes": {}}
+        return {"titles": {}, "hashes": {}, "title_counters": {}}
 
 def save_uploaded_cache(path, cache):
     try:
@@ -846,7 +3759,139 @@ def save_uploaded_cache(path, cache):
     except OSError as exc:
         logging.warning("Failed to save uploaded cache: %s", exc)
 
+def load_remote_index(path):
+    if not path or not os.path.exists(path):
+        return {"playlist_id": None, "pages": [], "synced_at": None}
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+    except (OSError, json.JSONDecodeError) as exc:
+        logging.warning("Failed to load remote index: %s", exc)
+        return {"playlist_id": None, "pages": [], "synced_at": None}
+    if not isinstance(data, dict) or not isinstance(data.get("pages"), list):
+        return {"playlist_id": None, "pages": [], "synced_at": None}
+    return data
+
+def save_remote_index(path, index):
+    if not path:
+        return
+    try:
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(index, handle, indent=2, sort_keys=True)
+    except OSError as exc:
+        logging.warning("Failed to save remote index: %s", exc)
+
+def _uploads_playlist_id(youtube_service):
+    response = youtube_service.channels().list(part="contentDetails", mine=True).execute()
+    items = response.get("items") or []
+    if not items:
+        return None
+    return items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
+
+def sync_remote_index(youtube_service, index):
+    """Refresh the index from the channel's uploads playlist, 50 items a page.
+
+    Each page is requested with If-None-Match on the ETag stored for the same
+    page token, so unchanged pages come back as 304 and are reused as-is.
+    Listing the uploads playlist needs the youtube.readonly (or youtube)
+    scope in addition to youtube.upload.
+    """
+    if not index.get("playlist_id"):
+        index["playlist_id"] = _uploads_playlist_id(youtube_service)
+        index["pages"] = []
+        if not index["playlist_id"]:
+            logging.warning("No uploads playlist found for this channel.")
+            return index
+    cached_pages = {page.get("token"): page for page in index["pages"]}
+    pages = []
+    page_token = None
+    fetched = reused = 0
+    while True:
+        cached = cached_pages.get(page_token)
+        request = youtube_service.playlistItems().list(
+            part="snippet",
+            playlistId=index["playlist_id"],
+            maxResults=50,
+            pageToken=page_token,
+        )
+        if cached and cached.get("etag"):
+            request.headers["If-None-Match"] = cached["etag"]
+        try:
+            response = request.execute()
+        except HttpError as exc:
+            if cached and getattr(exc.resp, "status", None) == 304:
+                page = cached
+                reused += 1
+            else:
+                raise
+        else:
+            page = {
+                "token": page_token,
+                "etag": response.get("etag"),
+                "next_page_token": response.get("nextPageToken"),
+                "items": [
+                    {
+                        "video_id": item["snippet"]["resourceId"]["videoId"],
+                        "title": item["snippet"]["title"],
+                        "published_at": item["snippet"].get("publishedAt"),
+                    }
+                    for item in response.get("items", [])
+                ],
+            }
+            fetched += 1
+        pages.append(page)
+        page_token = page.get("next_page_token")
+        if not page_token:
+            break
+    index["pages"] = pages
+    index["synced_at"] = datetime.datetime.now().isoformat()
+    logging.info(
+        "Remote index synced: %d videos (%d pages fetched, %d unchanged).",
+        sum(len(page["items"]) for page in pages),
+        fetched,
+        reused,
+    )
+    return index
+
+def merge_remote_index(cache, index):
+    """Add remote uploads missing from the local cache; returns how many were added."""
+    added = 0
+    for page in index.get("pages", []):
+        for item in page["items"]:
+            title = item["title"]
+            if title in cache["titles"]:
+                continue
+            cache["titles"][title] = {
+                "url": "https://youtu.be/%s" % item["video_id"],
+                "uploaded_at": item.get("published_at"),
+                "source": "remote",
+            }
+            index_title(cache["title_counters"], title)
+            added += 1
+    return added
+
+def refresh_remote_index(youtube_service, config):
+    """Sync the remote index and fold it into the uploaded cache on disk."""
+    index = load_remote_index(config.remote_index_path)
+    try:
+        sync_remote_index(youtube_service, index)
+    except HttpError as exc:
+        if getattr(exc.resp, "status", None) == 403:
+            logging.error("Remote index sync needs the youtube.readonly scope "
+                          "(add it to scopes and delete token.json): %s", exc)
+        else:
+            logging.error("Remote index sync failed; using the local cache only: %s", exc)
+        return
+    save_remote_index(config.remote_index_path, index)
+    cache = load_uploaded_cache(config.uploaded_titles_path)
+    added = merge_remote_index(cache, index)
+    if added:
+        save_uploaded_cache(config.uploaded_titles_path, cache)
+        logging.info("Added %d remote uploads to the duplicate guard.", added)
+
 def compute_file_hash(file_path, chunk_size=8 * 1024 * 1024):
+    started = time.time()
+    nbytes = 0
     hash_obj = hashlib.sha256()
     with open(file_path, "rb") as handle:
         while True:
@@ -854,33 +3899,802 @@ def compute_file_hash(file_path, chunk_size=8 * 1024 * 1024):
             if not chunk:
                 break
             hash_obj.update(chunk)
+            nbytes += len(chunk)
+    _observe_throughput("uploader_hash_mb_per_second", "SHA-256 MB hashed per second", nbytes, time.time() - started)
     return hash_obj.hexdigest()
 
-def process_existing_files(handler):
-    entries = []
-    for name in os.listdir(WATCH_FOLDER):
-        full_path = os.path.join(WATCH_FOLDER, name)
-        if not os.path.isfile(full_path):
-            continue
-        if should_ignore_file(full_path):
-            continue
-        if not full_path.lower().endswith(".mp4"):
+def load_scan_index(path):
+    if not path or not os.path.exists(path):
+        return {"entries": {}}
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+        if not isinstance(data, dict) or not isinstance(data.get("entries"), dict):
+            logging.warning("Scan index file is invalid: %s", path)
+            return {"entries": {}}
+        return data
+    except (OSError, json.JSONDecodeError) as exc:
+        logging.warning("Failed to load scan index: %s", exc)
+        return {"entries": {}}
+
+def save_scan_index(path, index):
+    if not path:
+        return
+    try:
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(index, handle, indent=2, sort_keys=True)
+    except OSError as exc:
+        logging.warning("Failed to save scan index: %s", exc)
+
+def _scan_signature(stat_result):
+    """Return the [size, mtime_ns, inode] tuple used to recognise a file."""
+    return [stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino]
+
+def mark_scanned(index, file_path, stat_result=None):
+    """Record file_path as handled so later scans skip it while unchanged."""
+    if stat_result is None:
+        try:
+            stat_result = os.stat(file_path)
+        except OSError:
+            return
+    index["entries"][os.path.abspath(file_path)] = {
+        "name": os.path.basename(file_path),
+        "signature": _scan_signature(stat_result),
+    }
+
+def is_scanned(index, file_path, stat_result):
+    entry = index["entries"].get(os.path.abspath(file_path))
+    return entry is not None and tuple(entry["signature"]) == tuple(_scan_signature(stat_result))
+
+def scan_watch_root(root, index, exclude=()):
+    """Return (path, stat) pairs for new or changed videos under root.
+
+    Uses os.scandir so each entry is stat'ed at most once, descending into
+    subfolders when the root is recursive (skipping folders in exclude).
+    Entries whose (size, mtime, inode) match the index are skipped, including
+    files that were renamed in place after processing. Index entries for
+    files that no longer exist are dropped.
+    """
+    entries = index["entries"]
+    by_signature = {}
+    for key, value in entries.items():
+        if root.contains(key):
+            by_signature[tuple(value["signature"])] = key
+
+    seen = set()
+    scanned_dirs = set()
+    candidates = []
+    pending_dirs = [root.path]
+    while pending_dirs:
+        folder = pending_dirs.pop()
+        try:
+            iterator = os.scandir(folder)
+        except OSError as exc:
+            logging.warning("Failed to scan %s: %s", folder, exc)
             continue
-        entries.append(full_path)
+        scanned_dirs.add(os.path.abspath(folder))
+        with iterator:
+            for entry in iterator:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if root.recursive and os.path.abspath(entry.path) not in exclude:
+                            pending_dirs.append(entry.path)
+                        continue
+                    if not root.accepts(entry.name) or not entry.is_file():
+                        continue
+                    stat_result = entry.stat()
+                except OSError:
+                    continue
+                key = os.path.abspath(entry.path)
+                signature = _scan_signature(stat_result)
+                seen.add(key)
+
+                known = entries.get(key)
+                if known is not None and known["signature"] == signature:
+                    continue
+                renamed_from = by_signature.get(tuple(signature))
+                if known is None and renamed_from is not None and not os.path.exists(renamed_from):
+                    entries[key] = {"name": entry.name, "signature": signature}
+                    continue
+                candidates.append((entry.path, stat_result))
+
+    for key in [k for k in entries if k not in seen and root.contains(k)]:
+        parent = os.path.dirname(key)
+        if parent in scanned_dirs or not os.path.isdir(parent):
+            del entries[key]
+
+    return candidates
+
+def find_startup_candidates(context, scan_index):
+    """Scan every root for new or changed videos, in the order the pipeline takes them."""
+    config = context.config
+    roots = context.roots
+    exclude = {os.path.abspath(path) for path in (config.failed_folder, config.drive_sync_folder) if path}
+    exclude.update(root.path for root in roots)
+    candidates = []
+    for root in roots:
+        candidates.extend(scan_watch_root(root, scan_index, exclude - {root.path}))
+    detected_at = time.time()
+    return context.prepare_queue.order(candidates, detected_at), detected_at
 
-    entries.sort(key=lambda path: os.path.getmtime(path))
-    for path in entries:
-        if MAX_UPLOADS_PER_RUN is not None and handler.stats["uploaded"] >= MAX_UPLOADS_PER_RUN:
-            logging.info("Reached max uploads per run (%d).", MAX_UPLOADS_PER_RUN)
+def process_existing_files(handler):
+    scan_index = handler.scan_index
+    candidates, detected_at = find_startup_candidates(handler.context, scan_index)
+    with handler.lock:
+        save_scan_index(handler.config.scan_index_path, scan_index)
+    logging.info("Startup scan found %d new or changed files.", len(candidates))
+    if handler.config.max_uploads_per_run == "auto":
+        handler.max_uploads_per_run = plan_upload_limit(handler.context, candidates, handler.uploaded_cache)
+
+    for path, _ in candidates:
+        limit = handler.max_uploads_per_run
+        if limit is not None and handler.stats["uploaded"] >= limit:
+            logging.info("Reached max uploads per run (%d).", limit)
             return
+        if not os.path.exists(path):
+            # Taken by another node (or moved away) since the scan.
+            continue
         try:
-            handler._process_video(path)
+            handler._process_video(path, detected_at=detected_at)
+        except PendingUploadQueued:
+            pass
         except (OSError, HttpError, ValueError) as exc:
             logging.error("Failed to process %s in --once mode: %s", path, exc)
 
+def probe_duration(file_path):
+    """Length of a video in seconds from ffprobe's container header, or None."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        file_path,
+    ]
+    try:
+        result = subprocess.run(cmd, check=True, capture_output=True, text=True, timeout=30)
+        return float(result.stdout.strip())
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+def measured_rates(metrics_path):
+    """Mean encode and upload MB/s recorded in a previous run's metrics JSON."""
+    rates = {}
+    if not metrics_path or not os.path.exists(metrics_path):
+        return rates
+    try:
+        with open(metrics_path, "r", encoding="utf-8") as handle:
+            snapshot = json.load(handle)
+    except (OSError, json.JSONDecodeError) as exc:
+        logging.warning("Could not read measured speeds from %s: %s", metrics_path, exc)
+        return rates
+    for key, metric in THROUGHPUT_METRICS.items():
+        values = snapshot.get(metric, {}).get("values", [])
+        total = sum(value.get("sum", 0) for value in values)
+        count = sum(value.get("count", 0) for value in values)
+        if count:
+            rates[key] = total / count
+    return rates
+
+def next_quota_reset(now):
+    """Next midnight Pacific time, when the YouTube API quota resets."""
+    try:
+        from zoneinfo import ZoneInfo
+        pacific = ZoneInfo("America/Los_Angeles")
+    except Exception:  # No tz database (e.g. Windows without tzdata).
+        pacific = datetime.timezone(datetime.timedelta(hours=-8))
+    local_now = datetime.datetime.fromtimestamp(now, pacific)
+    midnight = (local_now + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight.timestamp()
+
+def quota_used_today(uploaded_cache, now, config):
+    """Quota units spent on uploads recorded since the last reset."""
+    since = datetime.datetime.fromtimestamp(next_quota_reset(now) - 86400)
+    count = 0
+    for info in uploaded_cache["titles"].values():
+        try:
+            if datetime.datetime.fromisoformat(info["uploaded_at"]) >= since:
+                count += 1
+        except (KeyError, TypeError, ValueError):
+            continue
+    return count * upload_quota_cost(config.youtube_playlist_id, config)
+
+def upload_quota_cost(playlist_id, config):
+    cost = VIDEO_INSERT_QUOTA_COST
+    if playlist_id:
+        cost += PLAYLIST_INSERT_QUOTA_COST
+    if config.thumbnail_enabled:
+        cost += THUMBNAIL_SET_QUOTA_COST
+    return cost
+
+class CapacityPlanner:
+    """Project when each file in a backlog is encoded and uploaded.
+
+    A small discrete-event model of the pipeline: compression_workers
+    encoders (at plan_encode_speed x realtime, or the measured MB/s), then
+    upload_workers sharing the uplink, and a daily quota that makes uploads
+    wait for the next reset once it runs out. Retries and disk waits are
+    not modelled, so treat the result as a lower bound.
+    """
+
+    DEFAULT_ENCODE_MB_PER_SECOND = 5.0
+    DEFAULT_UPLOAD_MB_PER_SECOND = 2.5
+
+    def __init__(self, config, measured=None, encode=None, compression_workers=1, upload_workers=1):
+        self.config = config
+        measured = measured or {}
+        self.encode = self.config.compression_enabled and _ffmpeg_available() if encode is None else encode
+        self.encode_speed = self.config.plan_encode_speed
+        self.encode_mb_per_second = measured.get("encode", self.DEFAULT_ENCODE_MB_PER_SECOND)
+        if self.config.plan_encode_speed:
+            self.encode_source = "configured"
+        else:
+            self.encode_source = "measured" if "encode" in measured else "default"
+        self.compression_workers = max(1, compression_workers or 1)
+        self.upload_workers = max(1, upload_workers or 1)
+        if self.config.plan_upload_mb_per_second:
+            # Configured as the whole uplink, shared by concurrent uploads.
+            self.upload_mb_per_second = self.config.plan_upload_mb_per_second / self.upload_workers
+            self.upload_source = "configured"
+        elif "upload" in measured:
+            self.upload_mb_per_second = measured["upload"]
+            self.upload_source = "measured"
+        else:
+            self.upload_mb_per_second = self.DEFAULT_UPLOAD_MB_PER_SECOND / self.upload_workers
+            self.upload_source = "default"
+
+    def encode_seconds(self, size, duration):
+        if self.encode_speed and duration:
+            return duration / self.encode_speed
+        return size / 1e6 / self.encode_mb_per_second
+
+    def simulate(self, files, start, quota_used=0):
+        """Schedule files, a list of dicts with path, size, duration and quota_cost.
+
+        Returns one dict per file, in the given order, with encode_end,
+        upload_start, upload_end and quota_wait (True if it had to wait
+        for a quota reset).
+        """
+        encoders = [start] * self.compression_workers
+        uploaders = [start] * self.upload_workers
+        quota_left = self.config.youtube_daily_quota - quota_used if self.config.youtube_daily_quota else None
+        reset_at = next_quota_reset(start)
+        quota_day_start = start  # Uploads charged to a later quota day can't start before it.
+        schedule = []
+        for item in files:
+            ready = start
+            upload_size = item["size"]
+            if self.encode and item.get("cached_size") is not None:
+                upload_size = item["cached_size"]
+            elif self.encode:
+                encode_start = heapq.heappop(encoders)
+                ready = encode_start + self.encode_seconds(item["size"], item["duration"])
+                heapq.heappush(encoders, ready)
+                upload_size = item["size"] * self.config.compression_size_ratio
+            upload_start = max(heapq.heappop(uploaders), ready, quota_day_start)
+            quota_wait = False
+            if quota_left is not None:
+                while upload_start >= reset_at:
+                    quota_left = self.config.youtube_daily_quota
+                    reset_at += 86400
+                if quota_left < item["quota_cost"]:
+                    quota_wait = True
+                    upload_start = quota_day_start = reset_at
+                    quota_left = self.config.youtube_daily_quota
+                    reset_at += 86400
+                quota_left -= item["quota_cost"]
+            upload_end = upload_start + upload_size / 1e6 / self.upload_mb_per_second
+            heapq.heappush(uploaders, upload_end)
+            schedule.append(dict(item, encode_end=ready, upload_start=upload_start,
+                                 upload_end=upload_end, quota_wait=quota_wait))
+        return schedule
+
+def _plan_files(context, candidates):
+    """Probe each candidate (in parallel; ffprobe only reads the header)."""
+    config = context.config
+    paths = [path for path, _ in candidates]
+    if shutil.which("ffprobe"):
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix="ffprobe") as pool:
+            durations = list(pool.map(probe_duration, paths))
+    else:
+        durations = [None] * len(paths)
+    files = []
+    for (path, stat_result), duration in zip(candidates, durations):
+        root = context.root_for(path)
+        playlist_id = root.playlist_id if root is not None and root.playlist_id else config.youtube_playlist_id
+        files.append({
+            "path": path,
+            "size": stat_result.st_size,
+            "duration": duration,
+            "quota_cost": upload_quota_cost(playlist_id, config),
+            "cached_size": _cached_encode_size(path, context),
+        })
+    return files
+
+def _cached_encode_size(path, context):
+    """Size of the cached encode of path, or None if it would be encoded."""
+    config = context.config
+    cache = context.encode_cache
+    if not config.compression_enabled or not cache.enabled():
+        return None
+    base, ext = os.path.splitext(path)
+    try:
+        fingerprint = cache.source_fingerprint(path)
+        preset = _start_preset(cache, fingerprint, config.compression_preset)
+        cmd = _build_ffmpeg_command(path, base + ".compressed" + ext, config, preset=preset)
+        return cache.entry_size(cache.key_for(fingerprint, cmd))
+    except OSError:
+        return None
+
+def _build_planner(context):
+    return CapacityPlanner(
+        context.config,
+        measured=measured_rates(context.config.metrics_json_path),
+        compression_workers=context.compression_workers,
+        upload_workers=context.upload_workers,
+    )
+
+def plan_upload_limit(context, candidates, uploaded_cache):
+    """How many of candidates a --once run can upload within run_window_minutes and today's quota."""
+    config = context.config
+    started = time.time()
+    schedule = _build_planner(context).simulate(
+        _plan_files(context, candidates), started, quota_used_today(uploaded_cache, started, config)
+    )
+    deadline = started + config.run_window_minutes * 60 if config.run_window_minutes else None
+    limit = 0
+    for entry in schedule:
+        if entry["quota_wait"] or (deadline is not None and entry["upload_end"] > deadline):
+            break
+        limit += 1
+    logging.info(
+        "Planned %d of %d uploads for this run (window: %s, quota left today).",
+        limit, len(schedule), "%d min" % config.run_window_minutes if config.run_window_minutes else "none",
+    )
+    return limit
+
+def _format_clock(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%b %d %H:%M")
+
+def _format_span(seconds):
+    minutes = int(seconds // 60)
+    days, minutes = divmod(minutes, 1440)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return "%dd %dh %dm" % (days, hours, minutes)
+    return "%dh %dm" % (hours, minutes) if hours else "%dm" % minutes
+
+def print_backlog_plan(context, scan_index, uploaded_cache):
+    """--plan: print the projected schedule for everything the next --once run would upload."""
+    config = context.config
+    candidates, _ = find_startup_candidates(context, scan_index)
+    if not candidates:
+        print("Nothing to upload.")
+        return
+    started = time.time()
+    planner = _build_planner(context)
+    quota_used = quota_used_today(uploaded_cache, started, config)
+    schedule = planner.simulate(_plan_files(context, candidates), started, quota_used)
+
+    total_bytes = sum(entry["size"] for entry in schedule)
+    if planner.encode:
+        encode_rate = ("%.1fx realtime" % planner.encode_speed if planner.encode_speed
+                       else "%.1f MB/s" % planner.encode_mb_per_second)
+        print("Encode: %d worker(s) at %s (%s)" % (planner.compression_workers, encode_rate, planner.encode_source))
+    else:
+        print("Encode: off")
+    print("Upload: %d worker(s) at %.1f MB/s each (%s)" % (
+        planner.upload_workers, planner.upload_mb_per_second, planner.upload_source))
+    if config.youtube_daily_quota:
+        print("Quota: %d units/day, %d used today, %d per upload" % (
+            config.youtube_daily_quota, quota_used, schedule[0]["quota_cost"]))
+    print()
+    print("%4s  %-48s %9s %8s  %-12s  %-12s" % ("#", "File", "Size", "Length", "Encoded", "Uploaded"))
+    for number, entry in enumerate(schedule, 1):
+        name = os.path.basename(entry["path"])
+        if len(name) > 48:
+            name = name[:45] + "..."
+        length = "%d:%02d" % divmod(int(entry["duration"]), 60) if entry["duration"] else "?"
+        encoded = "-"
+        if planner.encode:
+            encoded = "cached" if entry["cached_size"] is not None else _format_clock(entry["encode_end"])
+        uploaded = _format_clock(entry["upload_end"]) + (" (quota)" if entry["quota_wait"] else "")
+        print("%4d  %-48s %6.0f MB %8s  %-12s  %s" % (number, name, entry["size"] / 1e6, length, encoded, uploaded))
+    finish = max(entry["upload_end"] for entry in schedule)
+    print()
+    print("%d files, %.1f GB: done by %s (%s)." % (
+        len(schedule), total_bytes / 1e9, _format_clock(finish), _format_span(finish - started)))
+    waits = sum(1 for entry in schedule if entry["quota_wait"])
+    if waits:
+        print("%d upload(s) wait for a quota reset (midnight Pacific)." % waits)
+    if config.run_window_minutes:
+        deadline = started + config.run_window_minutes * 60
+        fit = 0
+        for entry in schedule:
+            if entry["quota_wait"] or entry["upload_end"] > deadline:
+                break
+            fit += 1
+        print("%d file(s) fit in a %d-minute run." % (fit, config.run_window_minutes))
+
+def _uploaded_file_names(uploaded_cache):
+    """Local file names (and derived titles) of everything already uploaded."""
+    names = set()
+    for title, info in uploaded_cache["titles"].items():
+        names.add(title)
+        if isinstance(info, dict) and info.get("file"):
+            names.add(info["file"])
+    return names
+
+def _signatures_in(folder):
+    """(size, int(mtime)) of the files directly in folder, for matching backups to moved twins."""
+    signatures = set()
+    if not folder or not os.path.isdir(folder):
+        return signatures
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    stat_result = entry.stat()
+                    signatures.add((stat_result.st_size, int(stat_result.st_mtime)))
+            except OSError:
+                continue
+    return signatures
+
+def _recovery_folders(root, exclude):
+    folders = [root.path]
+    if root.recursive:
+        for dirpath, dirnames, _ in os.walk(root.path):
+            dirnames[:] = [d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) not in exclude]
+            if dirpath != root.path:
+                folders.append(dirpath)
+    return folders
+
+def _remove_artifact(path, reason):
+    try:
+        os.remove(path)
+    except OSError as exc:
+        logging.warning("Could not remove %s (%s): %s", path, reason, exc)
+        return False
+    logging.info("Recovery: removed %s (%s).", path, reason)
+    return True
+
+def recover_interrupted_work(handler):
+    """Reconcile what an interrupted run left behind in the watch folders.
+
+    A crash between steps of _prepare_job/_finish can leave:
+    - name.mp4.backup: removed if the recording (or its renamed, pending or
+      Drive-synced twin) still exists, otherwise restored to its original
+      name so it is processed again.
+    - name.compressed.mp4: kept if a pending upload points at it, otherwise
+      removed (the source is re-encoded if it still needs uploading).
+    - name.thumb.jpg: removed; thumbnails are extracted again per upload.
+    - renamed W#_..._Pull# files: finished like a normal upload (Drive sync
+      or delete, marked handled) if already uploaded, otherwise returned so
+      the caller can queue them; _prepare_job keeps their name and pull.
+    Files another node holds a live lease on are left alone, and with a
+    lease dir compressed/thumbnail files are only removed once older than
+    temp_retention_hours.
+
+    Returns the list of renamed files that still need uploading.
+    """
+    config = handler.config
+    pending = load_pending_uploads(config.pending_uploads_path)
+    pending_paths = set()
+    for item in pending:
+        for key in ("file_path", "original_path", "cleanup_path"):
+            if item.get(key):
+                pending_paths.add(os.path.abspath(item[key]))
+    uploaded_names = _uploaded_file_names(handler.uploaded_cache)
+    leases = handler.context.leases
+    exclude = {os.path.abspath(path) for path in (config.failed_folder, config.drive_sync_folder) if path}
+    drive_signatures = _signatures_in(config.drive_sync_folder)
+    counts = {"backups_removed": 0, "backups_restored": 0, "compressed_removed": 0,
+              "thumbnails_removed": 0, "finished": 0, "resumed": 0}
+    resume = []
+
+    for root in handler.context.roots:
+        for folder in _recovery_folders(root, exclude):
+            try:
+                with os.scandir(folder) as scanned:
+                    entries = [entry for entry in scanned if entry.is_file()]
+            except OSError as exc:
+                logging.warning("Recovery could not scan %s: %s", folder, exc)
+                continue
+            stats = {}
+            for entry in entries:
+                try:
+                    stats[entry.path] = entry.stat()
+                except OSError:
+                    continue
+            local_signatures = {
+                (st.st_size, int(st.st_mtime)) for path, st in stats.items() if not path.endswith(".backup")
+            }
+
+            for path, stat_result in stats.items():
+                path = os.path.abspath(path)
+                name = os.path.basename(path)
+                lower_name = name.lower()
+                if path in pending_paths:
+                    continue
+                if leases is not None and leases.held_elsewhere(LeaseManager.key_for(stat_result)):
+                    continue
+
+                if leases is not None and lower_name.endswith((".compressed.mp4", ".thumb.jpg")):
+                    # Another node may be mid-upload with it; leave it to the sweeper's age limit.
+                    retention = config.temp_retention_hours
+                    if retention is None or time.time() - stat_result.st_mtime < retention * 3600:
+                        continue
+
+                if lower_name.endswith(".backup"):
+                    original = path[:-len(".backup")]
+                    signature = (stat_result.st_size, int(stat_result.st_mtime))
+                    if os.path.exists(original):
+                        reason = "original still present"
+                    elif signature in local_signatures:
+                        reason = "renamed copy still present"
+                    elif signature in drive_signatures:
+                        reason = "copy already in Drive folder"
+                    elif leases is not None and leases.is_done(LeaseManager.key_for(stat_result)):
+                        reason = "uploaded by another node"
+                    else:
+                        try:
+                            os.replace(path, original)
+                        except OSError as exc:
+                            logging.warning("Could not restore backup %s: %s", path, exc)
+                            continue
+                        logging.info("Recovery: restored %s from its backup.", original)
+                        counts["backups_restored"] += 1
+                        if root.accepts(original):
+                            resume.append(original)
+                        continue
+                    if _remove_artifact(path, reason):
+                        counts["backups_removed"] += 1
+                elif lower_name.endswith(".compressed.mp4"):
+                    if _remove_artifact(path, "no pending upload uses it"):
+                        counts["compressed_removed"] += 1
+                elif lower_name.endswith(".thumb.jpg"):
+                    if _remove_artifact(path, "leftover thumbnail"):
+                        counts["thumbnails_removed"] += 1
+                elif is_nice_name(name) and root.accepts(path):
+                    if is_scanned(handler.scan_index, path, stat_result):
+                        continue
+                    if name in uploaded_names or create_youtube_title(name) in uploaded_names:
+                        logging.info("Recovery: %s was already uploaded; finishing it.", name)
+                        handler._sync_local_copy(path)
+                        with handler.lock:
+                            mark_scanned(handler.scan_index, path, stat_result)
+                        counts["finished"] += 1
+                    else:
+                        resume.append(path)
+                        counts["resumed"] += 1
+
+    with handler.lock:
+        save_scan_index(config.scan_index_path, handler.scan_index)
+    if any(counts.values()):
+        logging.info(
+            "Recovery: %d backups removed, %d restored, %d compressed and %d thumbnail files removed, "
+            "%d uploads finished, %d renamed files to resume.",
+            counts["backups_removed"], counts["backups_restored"], counts["compressed_removed"],
+            counts["thumbnails_removed"], counts["finished"], counts["resumed"],
+        )
+    return resume
+
+def sweep_folder(folder, max_age_seconds=None, max_bytes=None, suffixes=None):
+    """Delete old files from folder, then the oldest ones until it fits max_bytes.
+
+    Only files ending in one of suffixes are considered when given. Returns
+    (files removed, bytes removed).
+    """
+    if not folder or not os.path.isdir(folder) or (max_age_seconds is None and max_bytes is None):
+        return 0, 0
+    files = []
+    for dirpath, _, filenames in os.walk(folder):
+        for filename in filenames:
+            if suffixes and not filename.lower().endswith(suffixes):
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat_result.st_mtime, stat_result.st_size, path))
+    files.sort()
+    now = time.time()
+    total = sum(size for _, size, _ in files)
+    removed = removed_bytes = 0
+    for mtime, size, path in files:
+        too_old = max_age_seconds is not None and now - mtime > max_age_seconds
+        if not too_old and (max_bytes is None or total <= max_bytes):
+            # Sorted oldest first, so nothing after this is too old either.
+            break
+        try:
+            os.remove(path)
+        except OSError as exc:
+            logging.warning("Retention sweep could not remove %s: %s", path, exc)
+            continue
+        total -= size
+        removed += 1
+        removed_bytes += size
+    return removed, removed_bytes
+
+def sweep_retention(config):
+    """Apply the failed-folder and temp-file retention limits once."""
+    failed_days = config.failed_retention_days
+    failed_age = failed_days * 86400 if failed_days is not None else None
+    removed, removed_bytes = sweep_folder(config.failed_folder, failed_age, config.failed_max_bytes)
+    if removed:
+        logging.info("Retention sweep removed %d files (%.1f MB) from %s.",
+                     removed, removed_bytes / 1e6, config.failed_folder)
+    if config.temp_retention_hours is None:
+        return
+    # Interrupted Drive/object-store copies resume from .partial files, so
+    # only ones nobody has touched for a while are abandoned.
+    temp_age = config.temp_retention_hours * 3600
+    for folder in {config.drive_sync_folder, config.fanout_object_store_path}:
+        removed, removed_bytes = sweep_folder(folder, temp_age, suffixes=(".partial",))
+        if removed:
+            logging.info("Retention sweep removed %d stale partial files (%.1f MB) from %s.",
+                         removed, removed_bytes / 1e6, folder)
+
+async def run_retention_sweeper(pipeline_loop, config):
+    """Sweep now and then every sweep_interval_seconds until shutdown."""
+    while True:
+        await pipeline_loop.run_blocking(None, sweep_retention, config)
+        if not config.sweep_interval_seconds or not await pipeline_loop.sleep(config.sweep_interval_seconds):
+            return
+
+def hash_file_mapped(file_path, chunk_size=16 * 1024 * 1024):
+    """SHA-256 of a file read through mmap, matching compute_file_hash.
+
+    hashlib releases the GIL on large buffers, so several of these can hash
+    in parallel threads at close to disk speed.
+    """
+    started = time.time()
+    hash_obj = hashlib.sha256()
+    with open(file_path, "rb") as handle:
+        try:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files can't be mapped, nor can some network filesystems.
+            return compute_file_hash(file_path, chunk_size)
+        with mapped:
+            if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, len(view), chunk_size):
+                    hash_obj.update(view[offset:offset + chunk_size])
+                nbytes = len(view)
+            finally:
+                view.release()
+    _observe_throughput("uploader_hash_mb_per_second", "SHA-256 MB hashed per second", nbytes, time.time() - started)
+    return hash_obj.hexdigest()
+
+def load_backfill_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return {"files": {}}
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+    except (OSError, json.JSONDecodeError) as exc:
+        logging.warning("Failed to load backfill checkpoint: %s", exc)
+        return {"files": {}}
+    if not isinstance(data, dict) or not isinstance(data.get("files"), dict):
+        return {"files": {}}
+    return data
+
+def save_backfill_checkpoint(path, checkpoint):
+    if not path:
+        return
+    try:
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(checkpoint, handle, indent=2, sort_keys=True)
+    except OSError as exc:
+        logging.warning("Failed to save backfill checkpoint: %s", exc)
+
+def _backfill_candidates(roots, checkpoint, cache, config):
+    """Files to hash: everything in the Drive folder, plus renamed local
+    copies (watch roots, failed folder) whose title is in the uploaded cache."""
+    sources = [(root, False) for root in roots]
+    for folder, archived in ((config.drive_sync_folder, True), (config.failed_folder, False)):
+        if folder and os.path.isdir(folder):
+            root = WatchRoot(folder, config.ignore_patterns, config.ignore_extensions, recursive=True)
+            sources.append((root, archived))
+    exclude = {os.path.abspath(path) for path in (config.failed_folder, config.drive_sync_folder) if path}
+    exclude.update(root.path for root, _ in sources)
+
+    candidates = []
+    seen = set()
+    for root, archived in sources:
+        for path, stat_result in scan_watch_root(root, {"entries": {}}, exclude - {root.path}):
+            key = os.path.abspath(path)
+            if key in seen:
+                continue
+            seen.add(key)
+            signature = _scan_signature(stat_result)
+            known = checkpoint["files"].get(key)
+            if known is not None and known["signature"] == signature:
+                continue
+            entry = cache["titles"].get(create_youtube_title(os.path.basename(path)))
+            if entry is None and not archived:
+                continue
+            candidates.append((key, signature, entry))
+    return candidates
+
+def backfill_hash_index(roots, config):
+    """Hash archived uploads into uploaded_cache["hashes"] for the hash guard.
+
+    Progress is checkpointed (keyed by path and size/mtime/inode), so an
+    interrupted run picks up where it stopped and unchanged files are never
+    hashed twice.
+    """
+    cache = load_uploaded_cache(config.uploaded_titles_path)
+    checkpoint = load_backfill_checkpoint(config.backfill_checkpoint_path)
+    candidates = _backfill_candidates(roots, checkpoint, cache, config)
+    total_bytes = sum(signature[0] for _, signature, _ in candidates)
+    logging.info(
+        "Backfill: %d files (%.1f GB) to hash, %d already checkpointed.",
+        len(candidates),
+        total_bytes / 1e9,
+        len(checkpoint["files"]),
+    )
+
+    def save_progress():
+        save_uploaded_cache(config.uploaded_titles_path, cache)
+        save_backfill_checkpoint(config.backfill_checkpoint_path, checkpoint)
+
+    started = time.time()
+    last_report = started
+    hashed_bytes = 0
+    added = 0
+    pool = ThreadPoolExecutor(max_workers=max(1, config.backfill_workers or 1), thread_name_prefix="backfill")
+    try:
+        futures = {
+            pool.submit(hash_file_mapped, key): (key, signature, entry)
+            for key, signature, entry in candidates
+        }
+        for future in as_completed(futures):
+            key, signature, entry = futures[future]
+            try:
+                digest = future.result()
+            except OSError as exc:
+                logging.warning("Backfill could not hash %s: %s", key, exc)
+                continue
+            checkpoint["files"][key] = {"signature": signature, "hash": digest}
+            if digest not in cache["hashes"]:
+                cache["hashes"][digest] = {
+                    "url": entry.get("url") if entry else None,
+                    "uploaded_at": entry.get("uploaded_at") if entry else None,
+                    "source": "backfill",
+                }
+                added += 1
+            hashed_bytes += signature[0]
+            now = time.time()
+            if now - last_report >= 30:
+                last_report = now
+                save_progress()
+                logging.info(
+                    "Backfill: %.1f/%.1f GB at %.1f MB/s",
+                    hashed_bytes / 1e9,
+                    total_bytes / 1e9,
+                    hashed_bytes / 1e6 / max(now - started, 1e-6),
+                )
+    finally:
+        # On Ctrl+C let in-flight hashes finish, drop the rest and keep what's done.
+        pool.shutdown(wait=True, cancel_futures=True)
+        save_progress()
+
+    elapsed = time.time() - started
+    logging.info(
+        "Backfill complete: %d files, %.1f GB in %.1fs (%.1f MB/s), %d new hashes.",
+        len(candidates),
+        hashed_bytes / 1e9,
+        elapsed,
+        hashed_bytes / 1e6 / max(elapsed, 1e-6),
+        added,
+    )
+
 def log_summary(handler):
     stats = handler.stats
-    pending_count = len(load_pending_uploads(PENDING_UPLOADS_PATH))
+    pending_count = len(load_pending_uploads(handler.config.pending_uploads_path))
     logging.info(
         "Summary | processed=%d | uploaded=%d | skipped=%d | queued=%d | failed=%d | pending=%d",
         stats["processed"],
@@ -890,16 +4704,173 @@ def log_summary(handler):
         stats["failed"],
         pending_count,
     )
+    latencies = list(handler.publish_latencies)
+    if latencies:
+        logging.info(
+            "Time to published | policy=%s | n=%d | mean=%.1fs | p95=%.1fs",
+            handler.config.schedule_policy,
+            len(latencies),
+            sum(latencies) / len(latencies),
+            _percentile(latencies, 0.95),
+        )
+
+class EventCoalescer:
+    """Fold noisy filesystem events into one pipeline hand-off per recording.
+
+    Events are keyed by (device, inode), falling back to the path when the
+    file can't be stat'ed. Each event restarts that file's debounce timer, a
+    create followed by renames follows the inode to its final path, and a
+    bounded LRU of finished files drops late events (including the ones our
+    own rename fires) for recordings that were already handled.
+    """
+
+    def __init__(self, submit, accepts, debounce_seconds=2.0, recent_limit=1024):
+        self._submit = submit
+        self._accepts = accepts
+        self.debounce_seconds = debounce_seconds
+        self.recent_limit = recent_limit
+        self._cond = threading.Condition()
+        self._pending = {}  # key -> {"path": ..., "deadline": ...}
+        self._in_flight = {}  # path handed to the pipeline -> key
+        self._in_flight_keys = set()
+        self._recent = OrderedDict()  # key -> (size, mtime_ns) when finished
+        self._closed = False
+        self._thread = None
+
+    @staticmethod
+    def _identify(path):
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return path, None
+        return (stat_result.st_dev, stat_result.st_ino), (stat_result.st_size, stat_result.st_mtime_ns)
+
+    def _is_handled(self, key, signature):
+        if signature is None:
+            # Already gone; nothing left to process.
+            return True
+        if key in self._in_flight_keys:
+            return True
+        return self._recent.get(key) == signature
+
+    def _touch(self, path):
+        key, signature = self._identify(path)
+        with self._cond:
+            if self._is_handled(key, signature):
+                return
+            entry = self._pending.get(key)
+            if entry is None:
+                if not self._accepts(path):
+                    return
+                entry = self._pending[key] = {"path": path}
+                self._start_locked()
+            entry["deadline"] = time.monotonic() + self.debounce_seconds
+            self._cond.notify()
+
+    def created(self, path):
+        self._touch(path)
+
+    def modified(self, path):
+        # Only extend an existing debounce; a lone modify on an idle file is
+        # a late write to something already handled or not yet announced.
+        key, _ = self._identify(path)
+        with self._cond:
+            entry = self._pending.get(key)
+            if entry is not None:
+                entry["deadline"] = time.monotonic() + self.debounce_seconds
+
+    def moved(self, src_path, dest_path):
+        key, signature = self._identify(dest_path)
+        with self._cond:
+            if self._is_handled(key, signature):
+                return
+            entry = self._pending.pop(key, None) or self._pending.pop(src_path, None)
+            if entry is None:
+                if not self._accepts(dest_path):
+                    return
+                entry = {"path": dest_path}
+                self._start_locked()
+            elif not self._accepts(dest_path):
+                return
+            entry["path"] = dest_path
+            entry["deadline"] = time.monotonic() + self.debounce_seconds
+            self._pending[key] = entry
+            self._cond.notify()
+
+    def deleted(self, path):
+        with self._cond:
+            for key in [k for k, entry in self._pending.items() if entry["path"] == path]:
+                del self._pending[key]
+
+    def complete(self, path, local_path=None):
+        """Mark a pipeline job finished and remember it in the recent LRU."""
+        key, signature = self._identify(local_path or path)
+        with self._cond:
+            handed_key = self._in_flight.pop(path, None)
+            self._in_flight_keys.discard(handed_key)
+            if signature is None:
+                return
+            self._recent[key] = signature
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.recent_limit:
+                self._recent.popitem(last=False)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _start_locked(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="event-coalescer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    now = time.monotonic()
+                    due = [key for key, entry in self._pending.items() if entry["deadline"] <= now]
+                    if due:
+                        break
+                    deadlines = [entry["deadline"] for entry in self._pending.values()]
+                    self._cond.wait(min(deadlines) - now if deadlines else None)
+                if self._closed:
+                    return
+                ready = []
+                for key in due:
+                    entry = self._pending[key]
+                    if entry["path"] in self._in_flight:
+                        # Same path still in the pipeline; hand off once it finishes.
+                        entry["deadline"] = now + self.debounce_seconds
+                        continue
+                    del self._pending[key]
+                    self._in_flight[entry["path"]] = key
+                    self._in_flight_keys.add(key)
+                    ready.append(entry["path"])
+            for path in ready:
+                self._submit(path)
 
 class VideoHandler(FileSystemEventHandler):
-    """File system event handler for video file monitoring."""
+    """File system event handler for video file monitoring.
+
+    Events from every watch root are handed to the shared worker pools of the
+    pipeline context: stability checks, then rename/compression, then upload.
+    """
 
-    def __init__(self, youtube_service):
-        """Initialize the video handler with YouTube service."""
+    def __init__(self, youtube_service, context):
+        """Initialize the video handler with YouTube service and pipeline context."""
         self.youtube = youtube_service
+        self.context = context
+        self.config = context.config
+        self.lock = threading.RLock()
         self.processing_files = set()  # Track files being processed
-        self.pull_tracker = load_pull_tracker(PULL_TRACKER_PATH)
-        self.uploaded_cache = load_uploaded_titles(UPLOADED_TITLES_PATH)
+        self.reserved_titles = set()  # Titles claimed by jobs still in flight
+        self.pull_tracker = load_pull_tracker(self.config.pull_tracker_path)
+        self.uploaded_cache = load_uploaded_titles(self.config.uploaded_titles_path)
+        self.scan_index = load_scan_index(self.config.scan_index_path)
+        if context.leases is not None:
+            context.leases.on_expired = self._on_lease_expired
         self.stats = {
             "processed": 0,
             "uploaded": 0,
@@ -907,29 +4878,29 @@ class VideoHandler(FileSystemEventHandler):
             "queued": 0,
             "failed": 0,
         }
-        self.max_uploads_per_run = MAX_UPLOADS_PER_RUN
+        # "auto" is resolved by the --once startup scan; watch mode has no run window.
+        limit = self.config.max_uploads_per_run
+        self.max_uploads_per_run = None if limit == "auto" else limit
+        self.publish_latencies = []  # Seconds from detection to published, per upload
+        self._upload_slots = None  # asyncio.Semaphore, made on the pipeline loop
+        self.coalescer = EventCoalescer(
+            self.submit,
+            self.accepts,
+            debounce_seconds=self.config.event_debounce_seconds,
+            recent_limit=self.config.recent_files_limit,
+        )
 
     def on_created(self, event):
         """Handle file creation events."""
         if event.is_directory:
             return
-        if should_ignore_file(event.src_path):
-            return
-        if not event.src_path.lower().endswith(".mp4"):
-            return
+        self.coalescer.created(event.src_path)
 
-        # Avoid processing the same file multiple times
-        if event.src_path in self.processing_files:
+    def on_modified(self, event):
+        """Handle file write events by extending the file's debounce."""
+        if event.is_directory:
             return
-
-        self.processing_files.add(event.src_path)
-
-        try:
-            self._process_video(event.src_path)
-        except (OSError, HttpError, ValueError) as exc:
-            logging.error("Failed to process video %s: %s", event.src_path, exc)
-        finally:
-            self.processing_files.discard(event.src_path)
+        self.coalescer.modified(event.src_path)
 
     def on_moved(self, event):
         """Handle file move events (e.g., temp file renamed to final)."""
@@ -938,266 +4909,787 @@ class VideoHandler(FileSystemEventHandler):
         dest_path = getattr(event, "dest_path", None)
         if not dest_path:
             return
-        if should_ignore_file(dest_path):
-            return
-        if not dest_path.lower().endswith(".mp4"):
+        self.coalescer.moved(event.src_path, dest_path)
+
+    def on_deleted(self, event):
+        """Forget pending work for files removed before hand-off."""
+        if event.is_directory:
             return
-        if dest_path in self.processing_files:
+        self.coalescer.deleted(event.src_path)
+
+    def accepts(self, file_path):
+        root = self.context.root_for(file_path)
+        return root is not None and root.accepts(file_path)
+
+    def submit(self, file_path):
+        """Queue file_path on the shared pipeline unless it is ignored or in flight."""
+        if not self.accepts(file_path):
+            self.coalescer.complete(file_path)
             return
+        root = self.context.root_for(file_path)
 
-        self.processing_files.add(dest_path)
-        try:
-            self._process_video(dest_path)
-        except (OSError, HttpError, ValueError) as exc:
-            logging.error("Failed to process video %s: %s", dest_path, exc)
-        finally:
-            self.processing_files.discard(dest_path)
+        # Avoid processing the same file multiple times
+        with self.lock:
+            if file_path in self.processing_files:
+                return
+            self.processing_files.add(file_path)
 
-    def _create_youtube_title(self, filename):
-        """Create a descriptive YouTube title from the filename.
+        job = self._new_job(file_path, root)
+        self._spawn(self._stage_stability(job), job)
 
-        Format: WoW Raid - [Raid Week] [Boss Name] Pull #X - [Date] [Time]
-        Example: WoW Raid - W1 Fo Pull #1 - Sep 03 10:16 PM
-        """
+    def _new_job(self, file_path, root=None, detected_at=None):
+        if root is None:
+            root = self.context.root_for(file_path)
+        return {
+            "file_path": file_path,
+            "root": root,
+            "detected_at": detected_at or time.time(),
+            "temp_path": None,
+            "backup_path": None,
+            "upload_path": None,
+            "compressed": False,
+            "stream_encode": False,
+            "title": None,
+            "upload_options": None,
+            "file_hash": None,
+            "uploaded": False,
+            "drive_synced": False,
+            "lease": None,
+            "track": TRACER.track(os.path.basename(file_path)),
+            "queued_at": None,
+            "retry": False,
+            "done": False,
+            "thumbnail": None,
+        }
+
+    def _spawn(self, coro, job):
         try:
-            # Remove file extension
-            name = os.path.splitext(filename)[0]
-
-            # Split by underscores to get parts
-            parts = name.split('_')
-            if len(parts) >= 5:
-                raid_week = parts[0]  # W1
-                boss_name = parts[1]  # Fo
-                pull_info = parts[2]  # Pull1
-                date_str = parts[3]   # Sep03
-                time_str = parts[4]   # 10-16PM
-
-                # Format time for better readability
-                time_formatted = time_str.replace('-', ':').replace(
-                    'PM', ' PM').replace('AM', ' AM')
-
-                # Format date for better readability
-                date_formatted = date_str.replace('Sep', 'September').replace(
-                    'Oct', 'October').replace('Nov', 'November').replace(
-                    'Dec', 'December')
-                date_formatted = date_formatted.replace('Jan', 'January').replace(
-                    'Feb', 'February').replace('Mar', 'March').replace(
-                    'Apr', 'April')
-                date_formatted = date_formatted.replace('May', 'May').replace(
-                    'Jun', 'June').replace('Jul', 'July').replace(
-                    'Aug', 'August')
-
-                # Add day number
-                if len(date_formatted) > 3:
-                    day_num = date_formatted[3:]
-                    month_name = date_formatted[:3]
-                    date_formatted = f"{month_name} {day_num}"
-
-                return (
-                    "WoW Raid - %s %s %s - %s %s"
-                    % (raid_week, boss_name, pull_info, date_formatted, time_formatted)
-                )
-        except (IndexError, ValueError) as exc:
-            logging.warning(
-                "Could not create YouTube title from %s: %s", filename, exc
-            )
+            future = self.context.loop.spawn(coro)
+        except RuntimeError:
+            logging.warning("Pipeline is shutting down; leaving %s for the next run.", job["file_path"])
+            self._abandon(job)
+            return
+        future.add_done_callback(lambda done: self._on_stage_done(done, job))
 
-        # Fallback to original filename
-        return filename
+    def _on_stage_done(self, future, job):
+        if future.cancelled():
+            self._abandon(job)
 
-    def _process_video(self, file_path):
-        """Process a single video file with proper error handling."""
-        if self.max_uploads_per_run is not None and self.stats["uploaded"] >= self.max_uploads_per_run:
-            logging.info("Reached max uploads per run (%d). Skipping %s", self.max_uploads_per_run, file_path)
+    def _schedule_queued(self, pool, queue, stage, job):
+        """Queue job by policy; each pool slot runs the best job waiting when it frees up."""
+        job["queued_at"] = time.perf_counter()
+        queue.push(job)
+        try:
+            future = pool.submit(self._run_queued, queue, stage)
+        except RuntimeError:
+            logging.warning("Pipeline is shutting down; leaving %s for the next run.", job["file_path"])
+            self._abandon_queued(queue)
             return
-        logging.info("New file detected: %s", file_path)
-        self.stats["processed"] += 1
-
-        wait_for_file_stable(file_path)
+        future.add_done_callback(lambda done: self._on_queued_done(done, queue))
 
-        new_name = make_nice_name(file_path, self.pull_tracker)
-        save_pull_tracker(PULL_TRACKER_PATH, self.pull_tracker)
-        temp_path = os.path.join(WATCH_FOLDER, new_name)
+    def _on_queued_done(self, future, queue):
+        if future.cancelled():
+            self._abandon_queued(queue)
 
-        # Create backup of original file
-        backup_path = file_path + ".backup"
-        shutil.copy2(file_path, backup_path)
+    def _schedule_upload(self, job):
+        """Queue job for upload; a coroutine takes the best waiting job when a slot frees."""
+        queue = self.context.upload_queue
+        job["queued_at"] = time.perf_counter()
+        queue.push(job)
+        try:
+            future = self.context.loop.spawn(self._stage_upload())
+        except RuntimeError:
+            logging.warning("Pipeline is shutting down; leaving %s for the next run.", job["file_path"])
+            self._abandon_queued(queue)
+            return
+        future.add_done_callback(lambda done: self._on_queued_done(done, queue))
+
+    def _run_queued(self, queue, stage):
+        job = queue.pop()
+        if job is not None:
+            TRACER.complete("queued:%s" % queue.name, job["queued_at"], time.perf_counter(), job["track"])
+            stage(job)
+
+    def _abandon_queued(self, queue):
+        job = queue.pop()
+        if job is not None:
+            self._abandon(job)
+
+    def _abandon(self, job):
+        """Release a job the pipeline stopped before finishing."""
+        if job["upload_path"] is not None:
+            logging.warning("Pipeline stopped before uploading %s; queued for next run.", job["title"])
+            self._queue_pending(job)
+            self._discard_backup(job)
+        self._finish(job)
+
+    def _finish(self, job):
+        if job["thumbnail"] is not None and not job["uploaded"]:
+            job["thumbnail"].add_done_callback(_discard_thumbnail)
+        self.context.admission.release(job["file_path"])
+        if job["lease"] and self.context.leases is not None:
+            self.context.leases.release(job["lease"])
+        with self.lock:
+            self.processing_files.discard(job["file_path"])
+            self.reserved_titles.discard(job["title"])
+        self.coalescer.complete(job["file_path"], local_path=job["temp_path"])
+
+    async def _stage_stability(self, job):
+        loop = self.context.loop
+        pool = self.context.stability_pool
+        try:
+            if self._upload_limit_reached(job["file_path"]):
+                self._finish(job)
+                return
+            self._start_job(job)
+            started = time.perf_counter()
+            stable = await wait_for_file_stable_async(
+                job["file_path"],
+                loop,
+                pool,
+                self.config.stable_write_checks,
+                self.config.stable_write_interval_seconds,
+                self.config.min_file_age_seconds,
+            )
+            TRACER.complete("wait_for_file_stable", started, time.perf_counter(), job["track"])
+            if not stable:
+                # Shutting down; the next run's scan picks the file up.
+                self._finish(job)
+                return
+            claimed = await loop.run_blocking(pool, self._claim, job, track=job["track"])
+        except (OSError, ValueError) as exc:
+            logging.error("Failed to process video %s: %s", job["file_path"], exc)
+            self._finish(job)
+            return
+        if not claimed:
+            self._finish(job)
+            return
+        self._schedule_queued(self.context.compression_pool, self.context.prepare_queue, self._stage_prepare, job)
 
+    def _stage_prepare(self, job):
+        TRACER.set_track(job["track"])
+        try:
+            if not self._admit(job):
+                logging.warning("Pipeline is shutting down; leaving %s for the next run.", job["file_path"])
+                self._finish(job)
+                return
+            self._run_stage(job, self._prepare_job)
+        except (PendingUploadQueued, OSError, HttpError, ValueError) as exc:
+            logging.error("Failed to process video %s: %s", job["file_path"], exc)
+            self._finish(job)
+            self._retry_later(job)
+            return
+        if job["done"]:
+            self._finish(job)
+            return
+        self._start_thumbnail(job)
+        self._schedule_upload(job)
+
+    async def _stage_upload(self):
+        """Upload the best queued job once one of upload_workers slots is free."""
+        queue = self.context.upload_queue
+        loop = self.context.loop
+        if self._upload_slots is None:
+            self._upload_slots = asyncio.Semaphore(self.context.upload_workers)
+        if not await loop.acquire(self._upload_slots):
+            self._abandon_queued(queue)
+            return
         try:
-            # Move file to final location
-            shutil.move(file_path, temp_path)
+            job = queue.pop()
+            if job is None:
+                return
+            TRACER.complete("queued:%s" % queue.name, job["queued_at"], time.perf_counter(), job["track"])
+            await self._upload_stage_job(job)
+        finally:
+            self._upload_slots.release()
 
-            # Create a more descriptive YouTube title
-            youtube_title = self._create_youtube_title(new_name)
+    async def _upload_stage_job(self, job):
+        """_upload_job with the retry backoff awaited on the loop instead of slept on a thread."""
+        loop = self.context.loop
+        pool = self.context.upload_pool
+        track = job["track"]
+        try:
+            if await loop.run_blocking(pool, self._confirm_lease, job, track=track):
+                started = time.perf_counter()
+                sinks = []
+                try:
+                    if job["stream_encode"]:
+                        # Encodes during the upload, so there's no finished file to fan out.
+                        video_url = await loop.run_blocking(pool, self._upload_streaming, job, track=track)
+                    else:
+                        sinks = await loop.run_blocking(pool, self._fanout_sinks, job, track=track)
+                        if sinks:
+                            video_url = await loop.run_blocking(pool, self._upload_fanout, job, sinks, track=track)
+                        else:
+                            video_url = await upload_to_youtube_async(
+                                loop, pool, self.youtube, job["upload_path"], job["title"],
+                                job["upload_options"], self.config, track=track,
+                            )
+                except (HttpError, OSError) as exc:
+                    outcome = functools.partial(self._upload_failed, exc=exc)
+                else:
+                    outcome = functools.partial(
+                        self._upload_succeeded, video_url=video_url, elapsed=time.perf_counter() - started
+                    )
+                TRACER.complete("upload_to_youtube", started, time.perf_counter(), track, fanout=bool(sinks))
+                await loop.run_blocking(pool, self._run_stage, job, outcome, track=track)
+        except (PendingUploadQueued, OSError, HttpError, ValueError) as exc:
+            logging.error("Failed to process video %s: %s", job["file_path"], exc)
+        finally:
+            self._finish(job)
+        self._retry_later(job)
 
-            upload_path = temp_path
-            compressed = False
-            if not DRY_RUN:
-                upload_path, compressed = compress_video(temp_path)
+    def _lease_name(self, path, root):
+        return os.path.relpath(path, root.path) if root else os.path.basename(path)
 
-            if DRY_RUN:
-                logging.info("Dry run enabled; skipping upload and Drive sync.")
+    def _claim(self, job):
+        """Take this file's lease when several nodes share the watch folder."""
+        leases = self.context.leases
+        if leases is None:
+            return True
+        key = LeaseManager.key_for(os.stat(job["file_path"]))
+        if not leases.claim(key, self._lease_name(job["file_path"], job["root"])):
+            if leases.is_done(key):
+                logging.info("Already uploaded by another node: %s", job["file_path"])
             else:
-                if DUPLICATE_GUARD_MODE != "none":
-                    if DUPLICATE_GUARD_MODE == "title":
-                        if youtube_title in self.uploaded_cache["titles"]:
-                            if TITLE_COLLISION_SUFFIX == "auto":
-                                suffix = 2
-                                candidate = youtube_title
-                                while candidate in self.uploaded_cache["titles"]:
-                                    candidate = f"{youtube_title} ({suffix})"
-                                    suffix += 1
-                                youtube_title = candidate
-                            else:
-                                logging.info("Skipping duplicate title: %s", youtube_title)
-                                if DRIVE_SYNC_FOLDER:
-                                    move_to_drive(temp_path, DRIVE_SYNC_FOLDER, mode=DRIVE_SYNC_MODE)
-                                    if DELETE_AFTER_UPLOAD and DRIVE_SYNC_MODE == "copy":
-                                        if os.path.exists(temp_path):
-                                            os.remove(temp_path)
-                                self.stats["skipped_duplicate"] += 1
-                                return
-                    elif DUPLICATE_GUARD_MODE == "hash":
-                        duplicate_key = compute_file_hash(temp_path)
-                        if duplicate_key in self.uploaded_cache["hashes"]:
-                            logging.info("Skipping duplicate hash: %s", duplicate_key)
-                            if DRIVE_SYNC_FOLDER:
-                                move_to_drive(temp_path, DRIVE_SYNC_FOLDER, mode=DRIVE_SYNC_MODE)
-                                if DELETE_AFTER_UPLOAD and DRIVE_SYNC_MODE == "copy":
-                                    if os.path.exists(temp_path):
-                                        os.remove(temp_path)
-                            self.stats["skipped_duplicate"] += 1
-                            return
-                upload_succeeded = False
-                # Upload to YouTube
-                try:
-                    start_time = time.time()
-                    video_url = upload_to_youtube(
-                        self.youtube,
-                        upload_path,
-                        title=youtube_title,
-                        upload_options={
-                            "description": DEFAULT_DESCRIPTION,
-                            "playlist_id": YOUTUBE_PLAYLIST_ID,
-                            "tags": DEFAULT_TAGS,
-                            "privacy_status": YOUTUBE_PRIVACY,
-                        },
-                    )
-                    elapsed = time.time() - start_time
-                    logging.info("Uploaded %s (%s) in %.1fs", youtube_title, video_url, elapsed)
-                    upload_succeeded = True
-                    self.uploaded_cache["titles"][youtube_title] = {
-                        "url": video_url,
-                        "uploaded_at": datetime.datetime.now().isoformat(),
-                    }
-                    if DUPLICATE_GUARD_MODE == "hash":
-                        file_hash = compute_file_hash(temp_path)
-                        self.uploaded_cache["hashes"][file_hash] = {
-                            "url": video_url,
-                            "uploaded_at": datetime.datetime.now().isoformat(),
-                        }
-                    save_uploaded_titles(UPLOADED_TITLES_PATH, self.uploaded_cache)
-                    self.stats["uploaded"] += 1
-                except (HttpError, OSError) as exc:
-                    logging.error("Upload failed, adding to pending queue: %s", exc)
-                    pending = load_pending_uploads(PENDING_UPLOADS_PATH)
-                    pending.append({
-                        "file_path": upload_path,
-                        "original_path": temp_path,
-                        "cleanup_path": upload_path if compressed else None,
-                        "drive_sync_folder": DRIVE_SYNC_FOLDER,
-                        "drive_sync_mode": DRIVE_SYNC_MODE,
-                        "title": youtube_title,
-                        "upload_options": {
-                            "description": DEFAULT_DESCRIPTION,
-                            "playlist_id": YOUTUBE_PLAYLIST_ID,
-                            "tags": DEFAULT_TAGS,
-                            "privacy_status": YOUTUBE_PRIVACY,
-                        },
-                    })
-                    save_pending_uploads(PENDING_UPLOADS_PATH, pending)
-                    self.stats["queued"] += 1
-                    raise PendingUploadQueued(str(exc))
-                finally:
-                    if compressed and upload_succeeded and os.path.exists(upload_path):
-                        os.remove(upload_path)
-                    if compressed and not upload_succeeded and not COMPRESSION_KEEP_ORIGINAL:
-                        if os.path.exists(temp_path):
-                            os.remove(temp_path)
-
-                # Copy to Drive folder (optional)
-                if DRIVE_SYNC_FOLDER:
-                    move_to_drive(temp_path, DRIVE_SYNC_FOLDER, mode=DRIVE_SYNC_MODE)
-                    if DELETE_AFTER_UPLOAD and DRIVE_SYNC_MODE == "copy":
-                        if os.path.exists(temp_path):
-                            os.remove(temp_path)
-                            logging.info("Deleted local file after upload: %s", temp_path)
-                elif DELETE_AFTER_UPLOAD and os.path.exists(temp_path):
-                    os.remove(temp_path)
-                    logging.info("Deleted local file after upload: %s", temp_path)
-
-            # Clean up backup if everything succeeded
-            if os.path.exists(backup_path):
-                os.remove(backup_path)
+                logging.info("Claimed by another node: %s", job["file_path"])
+            return False
+        job["lease"] = key
+        return True
+
+    def _on_lease_expired(self, info):
+        """Re-run a crashed node's file if it is under one of our roots."""
+        name = info.get("path")
+        if not name:
+            return
+        for root in self.context.roots:
+            path = os.path.join(root.path, name)
+            if os.path.isfile(path):
+                logging.warning("Picking up %s from node %s after its lease expired.", path, info.get("node"))
+                self.submit(path)
+                return
+
+    def _admit(self, job):
+        """Wait until the volumes this job writes to have room for it."""
+        size = os.path.getsize(job["file_path"])
+        footprint = estimate_job_footprint(job["file_path"], size, self.config)
+        with TRACER.span("disk_admission"):
+            return self.context.admission.acquire(job["file_path"], footprint)
+
+    def _retry_later(self, job):
+        """Resubmit a job that ran out of disk once space may have been freed."""
+        if not job["retry"] or self.context.admission.closed:
+            return
+        logging.info("Retrying %s in %ds.", job["file_path"], self.config.disk_retry_seconds)
+        self.context.loop.call_later(self.config.disk_retry_seconds, self.submit, job["file_path"])
+
+    def _upload_limit_reached(self, file_path):
+        if self.max_uploads_per_run is None:
+            return False
+        with self.lock:
+            if self.stats["uploaded"] < self.max_uploads_per_run:
+                return False
+        logging.info("Reached max uploads per run (%d). Skipping %s", self.max_uploads_per_run, file_path)
+        return True
 
+    def _count(self, outcome):
+        with self.lock:
+            self.stats[outcome] += 1
+        METRICS.counter("uploader_files_total", "Files handled, by outcome").inc(outcome=outcome)
+
+    def _start_job(self, job):
+        logging.info("New file detected: %s", job["file_path"])
+        self._count("processed")
+
+    def _run_stage(self, job, stage):
+        """Run one pipeline stage, restoring the original file if it fails."""
+        try:
+            stage(job)
         except PendingUploadQueued as exc:
             logging.error("Processing failed after queuing pending upload: %s", exc)
-            if os.path.exists(backup_path):
-                os.remove(backup_path)
+            self._discard_backup(job)
             raise
         except (OSError, HttpError, ValueError) as exc:
+            if isinstance(exc, OSError) and exc.errno == errno.ENOSPC:
+                self._restore_out_of_space(job)
+                raise
+            if job["backup_path"] is None:
+                raise
             logging.error("Processing failed, restoring backup: %s", exc)
-            self.stats["failed"] += 1
-            # Restore original file if something went wrong
-            if os.path.exists(backup_path):
-                shutil.move(backup_path, file_path)
-            if FAILED_FOLDER:
-                os.makedirs(FAILED_FOLDER, exist_ok=True)
-                failed_path = os.path.join(FAILED_FOLDER, os.path.basename(file_path))
-                try:
-                    shutil.move(file_path, failed_path)
-                    logging.info("Moved failed file to %s", failed_path)
-                except OSError as move_exc:
-                    logging.warning("Failed to move file to failed folder: %s", move_exc)
+            self._restore_failed(job)
             raise
 
+    def _prepare_job(self, job):
+        """Rename, back up and optionally compress the file, then run the duplicate guard."""
+        file_path = job["file_path"]
+        if is_nice_name(file_path):
+            # Renamed by an interrupted run; keep its name and pull number.
+            new_name = os.path.basename(file_path)
+        else:
+            with self.lock:
+                new_name = make_nice_name(file_path, self.config.season_start_date, self.pull_tracker)
+                save_pull_tracker(self.config.pull_tracker_path, self.pull_tracker)
+        temp_path = os.path.join(os.path.dirname(file_path), new_name)
+        job["temp_path"] = temp_path
+
+        # Create backup of original file
+        backup_path = file_path + ".backup"
+        with TRACER.span("backup"):
+            if self.config.fanout_enabled and self.config.duplicate_guard_mode == "hash":
+                # Hash while writing the backup rather than reading the file twice.
+                results = FanOutReader(
+                    file_path,
+                    [FileCopySink(file_path, backup_path, name="backup"), HashSink()],
+                    chunk_size=self.config.fanout_chunk_bytes,
+                    queue_depth=self.config.fanout_queue_depth,
+                ).run()
+                if isinstance(results["backup"], Exception):
+                    raise results["backup"]
+                if not isinstance(results["hash"], Exception):
+                    job["file_hash"] = results["hash"]
+            else:
+                try:
+                    shutil.copy2(file_path, backup_path)
+                except OSError:
+                    if os.path.exists(backup_path):
+                        os.remove(backup_path)
+                    raise
+        job["backup_path"] = backup_path
+
+        # Move file to final location
+        if temp_path != file_path:
+            with TRACER.span("rename"):
+                shutil.move(file_path, temp_path)
+        if job["lease"]:
+            self.context.leases.update(job["lease"], self._lease_name(temp_path, job["root"]))
+
+        # Create a more descriptive YouTube title
+        youtube_title = create_youtube_title(new_name)
+
+        if self.config.dry_run:
+            logging.info("Dry run enabled; skipping upload and Drive sync.")
+            self._discard_backup(job)
+            self._mark_handled(job)
+            job["done"] = True
+            return
+
+        if self.config.stream_encode_upload and self.config.compression_enabled and _ffmpeg_available():
+            # Without a cached encode, _upload_streaming encodes during the upload.
+            upload_path, compressed = reuse_streamed_encode(temp_path, self.context)
+            job["stream_encode"] = not compressed
+        else:
+            with TRACER.span("compress_video"):
+                upload_path, compressed = compress_video(temp_path, self.context)
+        job["upload_path"] = upload_path
+        job["compressed"] = compressed
+
+        if self.config.duplicate_guard_mode == "title":
+            with self.lock:
+                if youtube_title in self.uploaded_cache["titles"] or youtube_title in self.reserved_titles:
+                    if self.config.title_collision_suffix != "auto":
+                        logging.info("Skipping duplicate title: %s", youtube_title)
+                        self._skip_duplicate(job)
+                        return
+                    youtube_title = next_free_title(self.uploaded_cache["title_counters"], youtube_title)
+                self.reserved_titles.add(youtube_title)
+                index_title(self.uploaded_cache["title_counters"], youtube_title)
+        elif self.config.duplicate_guard_mode == "hash":
+            if not job["file_hash"]:
+                with TRACER.span("hash"):
+                    job["file_hash"] = compute_file_hash(temp_path)
+            duplicate_key = job["file_hash"]
+            if duplicate_key in self.uploaded_cache["hashes"]:
+                logging.info("Skipping duplicate hash: %s", duplicate_key)
+                self._skip_duplicate(job)
+                return
+
+        job["title"] = youtube_title
+        root = job["root"]
+        job["upload_options"] = {
+            "description": self.config.default_description,
+            "playlist_id": (root.playlist_id if root and root.playlist_id else self.config.youtube_playlist_id),
+            "tags": self.config.default_tags,
+            "privacy_status": self.config.youtube_privacy,
+        }
+
+    def _skip_duplicate(self, job):
+        if job["compressed"] and os.path.exists(job["upload_path"]):
+            os.remove(job["upload_path"])
+        job["upload_path"] = None
+        self._sync_local_copy(job["temp_path"], uploaded=False)
+        self._count("skipped_duplicate")
+        self._discard_backup(job)
+        self._mark_handled(job)
+        job["done"] = True
+
+    def _upload_job(self, job):
+        """Upload the prepared file, record it and sync the local copy to Drive."""
+        if not self._confirm_lease(job):
+            return
+        start_time = time.time()
+        try:
+            sinks = [] if job["stream_encode"] else self._fanout_sinks(job)
+            with TRACER.span("upload_to_youtube", fanout=bool(sinks)):
+                if job["stream_encode"]:
+                    video_url = self._upload_streaming(job)
+                elif sinks:
+                    video_url = self._upload_fanout(job, sinks)
+                else:
+                    video_url = upload_to_youtube(
+                        self.youtube,
+                        job["upload_path"],
+                        title=job["title"],
+                        upload_options=job["upload_options"],
+                        config=self.config,
+                    )
+        except (HttpError, OSError) as exc:
+            self._upload_failed(job, exc)
+        self._upload_succeeded(job, video_url, time.time() - start_time)
+
+    def _confirm_lease(self, job):
+        """False (and the job is dropped) if another node took the file over."""
+        if not job["lease"] or self.context.leases.confirm(job["lease"]):
+            return True
+        logging.warning("Lost the lease on %s; leaving the upload to the other node.", job["temp_path"])
+        if job["compressed"] and os.path.exists(job["upload_path"]):
+            os.remove(job["upload_path"])
+        self._discard_backup(job)
+        job["done"] = True
+        return False
+
+    def _upload_failed(self, job, exc):
+        logging.error("Upload failed, adding to pending queue: %s", exc)
+        self._queue_pending(job)
+        temp_path = job["temp_path"]
+        if job["compressed"] and not self.config.compression_keep_original and os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise PendingUploadQueued(str(exc))
+
+    def _upload_succeeded(self, job, video_url, elapsed):
+        """Record the upload, then hand the local copy to Drive and drop the backup."""
+        temp_path = job["temp_path"]
+        upload_path = job["upload_path"]
+        youtube_title = job["title"]
+        logging.info("Uploaded %s (%s) in %.1fs", youtube_title, video_url, elapsed)
+        self._publish_thumbnail(job, video_url)
+        job["uploaded"] = True
+        if job["lease"]:
+            self.context.leases.complete(job["lease"], {"title": youtube_title, "url": video_url})
+        with self.lock:
+            self.uploaded_cache["titles"][youtube_title] = {
+                "url": video_url,
+                "uploaded_at": datetime.datetime.now().isoformat(),
+                "file": os.path.basename(job["temp_path"]),
+            }
+            if self.config.duplicate_guard_mode == "hash":
+                # Reuse the digest from the duplicate check instead of re-reading the file.
+                self.uploaded_cache["hashes"][job["file_hash"]] = {
+                    "url": video_url,
+                    "uploaded_at": datetime.datetime.now().isoformat(),
+                }
+            save_uploaded_titles(self.config.uploaded_titles_path, self.uploaded_cache)
+            self._count("uploaded")
+            self.publish_latencies.append(time.time() - job["detected_at"])
+            METRICS.histogram(
+                "uploader_time_to_published_seconds", "Seconds from detection to upload complete"
+            ).observe(self.publish_latencies[-1])
+        if job["compressed"] and os.path.exists(upload_path):
+            os.remove(upload_path)
+
+        # The frame grab reads temp_path; let it finish before Drive moves the file.
+        if job["thumbnail"] is not None:
+            concurrent.futures.wait([job["thumbnail"]])
+
+        # Copy to Drive folder (optional)
+        if not job["drive_synced"]:
+            self._sync_local_copy(temp_path)
+        elif (self.config.drive_sync_mode != "copy" or self.config.delete_after_upload) and os.path.exists(temp_path):
+            os.remove(temp_path)
+            logging.info("Removed local file already copied to Drive: %s", temp_path)
+
+        # Clean up backup if everything succeeded
+        self._discard_backup(job)
+        self._mark_handled(job)
+
+    def _start_thumbnail(self, job):
+        """Extract the thumbnail on the compression pool while the upload runs."""
+        if not self.config.thumbnail_enabled:
+            return
+        track = job["track"]
+        source = job["temp_path"]
+
+        def extract():
+            TRACER.set_track(track)
+            with TRACER.span("thumbnail"):
+                return extract_thumbnail(source, self.config)
+
+        try:
+            job["thumbnail"] = self.context.compression_pool.submit(extract)
+        except RuntimeError:
+            job["thumbnail"] = None
+
+    def _publish_thumbnail(self, job, video_url):
+        """Set the thumbnail once both the video ID and the frame exist."""
+        future = job["thumbnail"]
+        if future is None:
+            return
+        video_id = video_url.rsplit("/", 1)[-1]
+
+        def publish(done):
+            if done.cancelled() or done.exception() is not None:
+                return
+            image_path = done.result()
+            if not image_path:
+                return
+            try:
+                set_youtube_thumbnail(self.youtube, video_id, image_path)
+            except (HttpError, OSError) as exc:
+                # 403 here usually means the channel isn't verified for custom thumbnails.
+                logging.warning("Could not set thumbnail for %s: %s", video_id, exc)
+            finally:
+                if os.path.exists(image_path):
+                    os.remove(image_path)
+
+        # Runs on the extraction thread if the frame isn't ready yet, else here.
+        future.add_done_callback(publish)
+
+    def _fanout_sinks(self, job):
+        """Extra destinations to feed from the upload's own read, if any.
+
+        Only used for uncompressed uploads, where the uploaded bytes are the
+        local copy. Same-volume Drive moves are a rename and need no copy.
+        """
+        if not self.config.fanout_enabled or job["compressed"]:
+            return []
+        temp_path = job["temp_path"]
+        name = os.path.basename(temp_path)
+        sinks = []
+        if self.config.drive_sync_folder:
+            drive_probe = _existing_volume_path(self.config.drive_sync_folder)
+            if self.config.drive_sync_mode == "copy" or os.stat(drive_probe).st_dev != os.stat(temp_path).st_dev:
+                sinks.append(FileCopySink(temp_path, os.path.join(self.config.drive_sync_folder, name)))
+        if self.config.fanout_object_store_path:
+            sinks.append(LocalObjectSink(temp_path, self.config.fanout_object_store_path, name))
+        return sinks
+
+    def _upload_fanout(self, job, sinks):
+        """Upload while the same reads feed the Drive copy and other sinks."""
+        upload_path = job["upload_path"]
+        upload_sink = YouTubeUploadSink(
+            self.youtube,
+            upload_path,
+            job["title"],
+            job["upload_options"],
+            self.config,
+            size=os.path.getsize(upload_path),
+            chunksize=self.config.fanout_chunk_bytes,
+        )
+        results = FanOutReader(
+            upload_path,
+            [upload_sink] + sinks,
+            chunk_size=self.config.fanout_chunk_bytes,
+            queue_depth=self.config.fanout_queue_depth,
+        ).run()
+        for sink in sinks:
+            if isinstance(results[sink.name], Exception):
+                continue
+            logging.info("Fan-out wrote %s: %s", sink.name, results[sink.name])
+            if sink.name == "drive":
+                job["drive_synced"] = True
+        video_url = results[upload_sink.name]
+        if isinstance(video_url, Exception):
+            raise video_url
+        return video_url
+
+    def _upload_streaming(self, job):
+        """Upload while ffmpeg compresses; the encode becomes the job's upload_path."""
+        video_url, encode_path = stream_encode_and_upload(
+            self.youtube, job["upload_path"], job["title"], job["upload_options"], self.context
+        )
+        if encode_path:
+            job["upload_path"] = encode_path
+            job["compressed"] = True
+        return video_url
+
+    def _sync_local_copy(self, local_path, uploaded=True):
+        if self.config.drive_sync_folder:
+            self.context.drive_sync.submit(
+                local_path,
+                self.config.drive_sync_folder,
+                mode=self.config.drive_sync_mode,
+                delete_after=self.config.delete_after_upload,
+            )
+        elif uploaded and self.config.delete_after_upload and os.path.exists(local_path):
+            os.remove(local_path)
+            logging.info("Deleted local file after upload: %s", local_path)
+
+    def _queue_pending(self, job):
+        with self.lock:
+            pending = load_pending_uploads(self.config.pending_uploads_path)
+            pending.append({
+                "file_path": job["upload_path"],
+                "original_path": job["temp_path"],
+                "cleanup_path": job["upload_path"] if job["compressed"] else None,
+                "drive_sync_folder": self.config.drive_sync_folder,
+                "drive_sync_mode": self.config.drive_sync_mode,
+                "title": job["title"],
+                "upload_options": job["upload_options"],
+                "lease_key": job["lease"],
+            })
+            save_pending_uploads(self.config.pending_uploads_path, pending)
+            self._count("queued")
+        self._mark_handled(job)
+
+    def _mark_handled(self, job):
+        """Record the local copy in the scan index so --once runs skip it."""
+        temp_path = job["temp_path"]
+        if not temp_path or not os.path.exists(temp_path):
+            return
+        with self.lock:
+            mark_scanned(self.scan_index, temp_path)
+            save_scan_index(self.config.scan_index_path, self.scan_index)
+
+    def _discard_backup(self, job):
+        backup_path = job["backup_path"]
+        if backup_path and os.path.exists(backup_path):
+            os.remove(backup_path)
+
+    def _restore_out_of_space(self, job):
+        """Undo a job that hit ENOSPC without sending it to the failed folder."""
+        file_path = job["file_path"]
+        temp_path = job["temp_path"]
+        if job["uploaded"]:
+            logging.error("Disk full after upload; leaving %s in place.", temp_path)
+            self._discard_backup(job)
+            return
+        logging.error("Disk full while processing %s; leaving it for a retry.", file_path)
+        if job["compressed"] and os.path.exists(job["upload_path"]):
+            os.remove(job["upload_path"])
+        if temp_path and os.path.exists(temp_path) and not os.path.exists(file_path):
+            os.replace(temp_path, file_path)
+            self._discard_backup(job)
+        elif job["backup_path"] and os.path.exists(job["backup_path"]):
+            shutil.move(job["backup_path"], file_path)
+        job["retry"] = True
+
+    def _restore_failed(self, job):
+        file_path = job["file_path"]
+        self._count("failed")
+        # Restore original file if something went wrong
+        if os.path.exists(job["backup_path"]):
+            shutil.move(job["backup_path"], file_path)
+        if self.config.failed_folder:
+            os.makedirs(self.config.failed_folder, exist_ok=True)
+            failed_path = os.path.join(self.config.failed_folder, os.path.basename(file_path))
+            try:
+                shutil.move(file_path, failed_path)
+                logging.info("Moved failed file to %s", failed_path)
+            except OSError as move_exc:
+                logging.warning("Failed to move file to failed folder: %s", move_exc)
+
+    def _process_video(self, file_path, detected_at=None):
+        """Process a single video file synchronously, stage after stage.
+
+        Returns the renamed local path, which may no longer exist once it has
+        been moved to Drive or deleted.
+        """
+        if self._upload_limit_reached(file_path):
+            return None
+        job = self._new_job(file_path, detected_at=detected_at)
+        TRACER.set_track(job["track"])
+        self._start_job(job)
+
+        with TRACER.span("wait_for_file_stable"):
+            wait_for_file_stable(
+                file_path,
+                self.config.stable_write_checks,
+                self.config.stable_write_interval_seconds,
+                self.config.min_file_age_seconds,
+            )
+
+        try:
+            if not self._claim(job) or not self._admit(job):
+                return None
+            self._run_stage(job, self._prepare_job)
+            if not job["done"]:
+                self._start_thumbnail(job)
+                self._run_stage(job, self._upload_job)
+        finally:
+            self._finish(job)
+        return job["temp_path"]
+
 if __name__ == "__main__":
+    plan_only = False
+    metrics_json_path = CONFIG_DEFAULTS["metrics_json_path"]
     try:
         configure_logging()
         args = parse_args()
+        plan_only = args.plan
         config = load_config(args.config)
         validate_config(config)
         apply_config(config, args)
+        context = PipelineContext.from_config(config)
+        settings = context.config
+        metrics_json_path = settings.metrics_json_path
+        if settings.metrics_port:
+            METRICS.serve(settings.metrics_port)
+        if settings.trace_path:
+            TRACER.enable(settings.trace_path)
 
         # Validate configuration
-        if not os.path.exists(WATCH_FOLDER):
-            logging.error("Watch folder does not exist: %s", WATCH_FOLDER)
+        missing_roots = [root.path for root in context.roots if not os.path.exists(root.path)]
+        for path in missing_roots:
+            logging.error("Watch folder does not exist: %s", path)
+        if len(missing_roots) == len(context.roots):
             sys.exit(1)
+        context.roots = [root for root in context.roots if root.path not in missing_roots]
+
+        if args.backfill_index:
+            backfill_hash_index(context.roots, settings)
+            context.shutdown()
+            sys.exit(0)
+
+        if args.plan:
+            print_backlog_plan(
+                context, load_scan_index(settings.scan_index_path), load_uploaded_titles(settings.uploaded_titles_path)
+            )
+            context.shutdown()
+            sys.exit(0)
 
-        if not os.path.exists("credentials.json"):
+        if not settings.youtube_api_root_url and not os.path.exists("credentials.json"):
             logging.error("credentials.json not found. Please download it from "
                          "Google Cloud Console.")
             sys.exit(1)
 
         logging.info("Starting YouTube Uploader...")
-        youtube = authenticate_youtube()
-        process_pending_uploads(youtube)
-        event_handler = VideoHandler(youtube)
+        youtube = authenticate_youtube(settings)
+        if settings.remote_index_enabled:
+            refresh_remote_index(youtube, settings)
+        process_pending_uploads(youtube, settings, context.leases, context.drive_sync)
+        event_handler = VideoHandler(youtube, context)
+        resume_paths = recover_interrupted_work(event_handler) if settings.recovery_enabled else []
         if args.once:
+            sweep_retention(settings)
+            # The startup scan picks the resumed files up with everything else.
             process_existing_files(event_handler)
+            context.shutdown()
             log_summary(event_handler)
             logging.info("Finished --once run.")
             sys.exit(0)
-        observer = Observer()
-        observer.schedule(event_handler, WATCH_FOLDER, recursive=False)
+        observer = build_observer(settings)
+        for root in context.roots:
+            observer.schedule(event_handler, root.path, recursive=root.recursive)
         observer.start()
+        context.loop.spawn(run_retention_sweeper(context.loop, settings))
+        for path in resume_paths:
+            event_handler.submit(path)
 
-        pending_count = len(load_pending_uploads(PENDING_UPLOADS_PATH))
-        compression_status = "on" if COMPRESSION_ENABLED else "off"
+        pending_count = len(load_pending_uploads(settings.pending_uploads_path))
+        compression_status = "on" if settings.compression_enabled else "off"
         logging.info(
             "Watching %s | privacy=%s | compression=%s | pending=%d",
-            WATCH_FOLDER,
-            YOUTUBE_PRIVACY,
+            ", ".join(root.path for root in context.roots),
+            settings.youtube_privacy,
             compression_status,
             pending_count,
         )
@@ -1209,6 +5701,8 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         logging.info("Shutting down...")
         observer.stop()
+        event_handler.coalescer.close()
+        context.shutdown()
     except (OSError, HttpError) as exc:
         logging.error("Fatal error: %s", exc)
     finally:
@@ -1216,6 +5710,11 @@ if __name__ == "__main__":
             log_summary(event_handler)
         except NameError:
             pass
+        if not plan_only:
+            # --plan keeps the last real run's metrics (and measured speeds) on disk.
+            METRICS.dump_json(metrics_json_path, keep=THROUGHPUT_METRICS.values())
+        METRICS.close()
+        TRACER.write()
         try:
             observer.join()
         except NameError: